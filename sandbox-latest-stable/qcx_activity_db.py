@@ -0,0 +1,194 @@
+# qcx_activity_db.py
+# Persistent band activity store (SQLite, WAL mode)
+# Every scan / continuous-waterfall sample (time, frequency, S-value, audio power,
+# decoded text) is queued and written in batches by a background thread, so the
+# scanner never waits on the disk. Indexed on (band, freq, time) so questions like
+# "activity on 14.000-14.070 MHz over the last 7 days" come back in milliseconds.
+# Band occupancy (per band / 1 kHz bin / hour of day) is aggregated as rows are
+# ingested, so the heatmap never has to scan the raw samples.
+
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+BAND_EDGES = [
+    ("160m", 1.8e6, 2.0e6), ("80m", 3.5e6, 4.0e6), ("60m", 5.25e6, 5.45e6),
+    ("40m", 7.0e6, 7.3e6), ("30m", 10.1e6, 10.15e6), ("20m", 14.0e6, 14.35e6),
+    ("17m", 18.068e6, 18.168e6), ("15m", 21.0e6, 21.45e6), ("12m", 24.89e6, 24.99e6),
+    ("11m", 26.965e6, 27.405e6), ("10m", 28.0e6, 29.7e6), ("6m", 50.0e6, 54.0e6),
+]
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+OCC_BIN_HZ = 1000
+ACTIVE_S = 2            # a sample at or above this S-value (or with text) counts as activity
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts       REAL    NOT NULL,
+    band     TEXT    NOT NULL,
+    freq_hz  INTEGER NOT NULL,
+    s_val    INTEGER,
+    audio_db REAL,
+    text     TEXT
+);
+CREATE INDEX IF NOT EXISTS samples_band_freq_ts ON samples (band, freq_hz, ts);
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE TABLE IF NOT EXISTS occupancy (
+    band    TEXT    NOT NULL,
+    bin_hz  INTEGER NOT NULL,
+    hour    INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    active  INTEGER NOT NULL,
+    max_s   INTEGER NOT NULL,
+    PRIMARY KEY (band, bin_hz, hour)
+);
+"""
+
+
+OCC_UPSERT = """
+INSERT INTO occupancy (band, bin_hz, hour, samples, active, max_s) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (band, bin_hz, hour) DO UPDATE SET
+    samples = samples + excluded.samples,
+    active = active + excluded.active,
+    max_s = MAX(max_s, excluded.max_s)
+"""
+
+
+def band_for(freq_hz):
+    for band, lo, hi in BAND_EDGES:
+        if lo <= freq_hz <= hi:
+            return band
+    return "OOB"
+
+
+class ActivityDB:
+    def __init__(self, path="band_activity.db"):
+        self.path = path
+        self.queue = queue.Queue()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---- writing ----
+
+    def add(self, freq_hz, s_val=None, audio_db=None, text=None, ts=None):
+        # Cheap and thread-safe; the row is written by the background thread
+        freq_hz = int(freq_hz)
+        self.queue.put((ts or time.time(), band_for(freq_hz), freq_hz, s_val, audio_db, text or None))
+
+    def close(self):
+        self.running = False
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def _writer(self):
+        conn = self._connect()
+        while True:
+            rows = []
+            stop = False
+            deadline = time.time() + FLUSH_INTERVAL
+            while len(rows) < BATCH_SIZE:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                rows.append(item)
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?)", rows)
+                        conn.executemany(OCC_UPSERT, aggregate(rows))
+                except sqlite3.Error as e:
+                    print(f"Activity DB write error: {e}")
+            if stop:
+                break
+        conn.close()
+
+    # ---- queries ----
+
+    def query(self, f_lo_hz, f_hi_hz, since=None, until=None, band=None, min_s=None):
+        # Rows (ts, band, freq_hz, s_val, audio_db, text) ordered by time
+        until = until or time.time()
+        since = since or 0.0
+        bands = [band] if band else [b for b, lo, hi in BAND_EDGES if lo <= f_hi_hz and hi >= f_lo_hz] or ["OOB"]
+        sql = ("SELECT ts, band, freq_hz, s_val, audio_db, text FROM samples "
+               f"WHERE band IN ({','.join('?' * len(bands))}) AND freq_hz BETWEEN ? AND ? AND ts BETWEEN ? AND ?")
+        args = bands + [int(f_lo_hz), int(f_hi_hz), since, until]
+        if min_s is not None:
+            sql += " AND s_val >= ?"
+            args.append(min_s)
+        sql += " ORDER BY ts"
+        conn = self._connect()
+        try:
+            return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+    def activity(self, f_lo_hz, f_hi_hz, days=7, min_s=1):
+        # Convenience: samples at or above min_s in the last N days
+        return self.query(f_lo_hz, f_hi_hz, since=time.time() - days * 86400, min_s=min_s)
+
+    def hot_frequencies(self, band, hours=24, min_s=ACTIVE_S, limit=20):
+        # [(freq_hz, hits)] where activity was seen recently, busiest first
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT freq_hz, COUNT(*) FROM samples WHERE band = ? AND ts >= ? "
+                                "AND (s_val >= ? OR text IS NOT NULL) GROUP BY freq_hz "
+                                "ORDER BY COUNT(*) DESC LIMIT ?",
+                                (band, time.time() - hours * 3600, min_s, limit)).fetchall()
+        finally:
+            conn.close()
+
+    def occupancy(self, band):
+        # Aggregated rows (bin_hz, hour, samples, active, max_s) for one band
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT bin_hz, hour, samples, active, max_s FROM occupancy "
+                                "WHERE band = ? ORDER BY bin_hz, hour", (band,)).fetchall()
+        finally:
+            conn.close()
+
+    def rebuild_occupancy(self):
+        # One-off backfill for databases created before occupancy was tracked
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM occupancy")
+                cur = conn.execute("SELECT * FROM samples")
+                while True:
+                    rows = cur.fetchmany(10000)
+                    if not rows:
+                        break
+                    conn.executemany(OCC_UPSERT, aggregate(rows))
+        finally:
+            conn.close()
+
+
+def aggregate(rows):
+    # Collapse sample rows into occupancy increments (local hour of day)
+    acc = defaultdict(lambda: [0, 0, 0])
+    for ts, band, freq_hz, s_val, audio_db, text in rows:
+        key = (band, freq_hz // OCC_BIN_HZ * OCC_BIN_HZ, time.localtime(ts).tm_hour)
+        entry = acc[key]
+        entry[0] += 1
+        s = s_val or 0
+        if s >= ACTIVE_S or text:
+            entry[1] += 1
+        entry[2] = max(entry[2], s)
+    return [key + tuple(v) for key, v in acc.items()]
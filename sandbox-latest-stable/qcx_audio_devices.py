@@ -0,0 +1,139 @@
+# qcx_audio_devices.py
+# Shared audio device registry: one PortAudio instance for the whole process
+# The graphs, CW decoder, recorder and audio scanner used to create their own
+# pyaudio.PyAudio() (never terminated) and walk every device each time a window
+# opened. Here the device list is enumerated once, with the input sample rates each
+# device accepts, and cached until refresh() is called (Refresh buttons, or a
+# stream that fails to open because the device went away).
+
+import atexit
+import threading
+
+PROBE_RATES = (8000, 16000, 22050, 44100, 48000, 96000)
+
+_lock = threading.RLock()
+_pa = None
+_devices = None
+_streams = set()        # open streams; PortAudio can't be restarted under them
+
+
+class AudioDevice:
+    def __init__(self, index, name, inputs, outputs, default_rate, rates):
+        self.index = index
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.default_rate = default_rate
+        self.rates = rates          # supported input rates (empty for output-only devices)
+
+    def __repr__(self):
+        return f"AudioDevice({self.index}, {self.name!r}, in={self.inputs}, out={self.outputs})"
+
+
+def portaudio():
+    # The process-wide PyAudio instance (created on first use)
+    global _pa
+    with _lock:
+        if _pa is None:
+            import pyaudio
+            _pa = pyaudio.PyAudio()
+        return _pa
+
+
+def _enumerate(pa):
+    import pyaudio
+    found = []
+    for i in range(pa.get_device_count()):
+        info = pa.get_device_info_by_index(i)
+        inputs = int(info['maxInputChannels'])
+        rates = []
+        if inputs > 0:
+            for rate in PROBE_RATES:
+                try:
+                    if pa.is_format_supported(rate, input_device=i, input_channels=1,
+                                              input_format=pyaudio.paInt16):
+                        rates.append(rate)
+                except ValueError:
+                    pass
+        found.append(AudioDevice(i, info['name'], inputs, int(info['maxOutputChannels']),
+                                 int(info['defaultSampleRate']), rates))
+    return found
+
+
+def devices():
+    # Cached list of every device
+    global _devices
+    with _lock:
+        if _devices is None:
+            _devices = _enumerate(portaudio())
+        return _devices
+
+
+def input_devices(rate=None):
+    # Devices that can record (at the given rate, if one is given)
+    return [d for d in devices() if d.inputs > 0 and (rate is None or not d.rates or rate in d.rates)]
+
+
+def output_devices():
+    return [d for d in devices() if d.outputs > 0]
+
+
+def find(name):
+    # Input device index for a name shown in a device list, or None
+    return next((d.index for d in input_devices() if d.name == name), None)
+
+
+def refresh():
+    # Re-enumerate. PortAudio only notices added/removed hardware after a restart,
+    # which is done when no stream is open; otherwise the current view is re-read.
+    global _pa, _devices
+    with _lock:
+        if _pa is not None and not _streams:
+            _pa.terminate()
+            _pa = None
+        _devices = None
+        return devices()
+
+
+def _open(**kwargs):
+    import pyaudio
+    with _lock:
+        try:
+            stream = portaudio().open(format=pyaudio.paInt16, channels=1, **kwargs)
+        except OSError:
+            # Device list is stale (unplugged / re-plugged hardware): refresh and retry once
+            refresh()
+            stream = portaudio().open(format=pyaudio.paInt16, channels=1, **kwargs)
+        _streams.add(stream)
+        return stream
+
+
+def open_input(device_index=None, rate=48000, frames_per_buffer=1024):
+    # Mono 16-bit input stream; give it back with close(stream)
+    return _open(rate=rate, input=True, input_device_index=device_index, frames_per_buffer=frames_per_buffer)
+
+
+def open_output(rate=48000, frames_per_buffer=1024, device_index=None):
+    return _open(rate=rate, output=True, output_device_index=device_index, frames_per_buffer=frames_per_buffer)
+
+
+def close(stream):
+    with _lock:
+        _streams.discard(stream)
+    try:
+        stream.stop_stream()
+    except OSError:
+        pass
+    stream.close()
+
+
+@atexit.register
+def terminate():
+    global _pa, _devices
+    with _lock:
+        for stream in list(_streams):
+            close(stream)
+        if _pa is not None:
+            _pa.terminate()
+            _pa = None
+        _devices = None
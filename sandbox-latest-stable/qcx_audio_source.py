@@ -0,0 +1,125 @@
+# qcx_audio_source.py
+# Block sources for the audio decoders: a live input device or a recording
+# Every source returns (float32 block, time at the end of the block). Live input
+# uses the wall clock; files use the sample clock (samples read / rate), so the
+# decoder's timing is identical whether a file is paced at real time or read as
+# fast as the CPU allows. WAV files already at the wanted rate are read with the
+# wave module; anything else (MP3, other rates) is converted by a streaming
+# ffmpeg pipe, the same way the MP3 player does it.
+#
+#   python qcx_audio_source.py decode FILE [--realtime]   decode a recording, print metrics
+
+import shutil
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+import qcx_audio_devices
+
+
+class DeviceSource:
+    realtime = True
+
+    def __init__(self, device_index=None, rate=48000, chunk=1024):
+        self.rate = rate
+        self.chunk = chunk
+        self.stream = qcx_audio_devices.open_input(device_index, rate, chunk)
+
+    def read(self):
+        data = self.stream.read(self.chunk, exception_on_overflow=False)
+        return np.frombuffer(data, dtype=np.int16).astype(np.float32), time.time()
+
+    def close(self):
+        qcx_audio_devices.close(self.stream)
+
+
+class FileSource:
+    def __init__(self, path, rate=48000, chunk=1024, realtime=True):
+        self.path = path
+        self.rate = rate
+        self.chunk = chunk
+        self.realtime = realtime
+        self.samples = 0
+        self.started = None
+        self.wav = None
+        self.process = None
+        self.channels = 1
+        if path.lower().endswith(".wav"):
+            wav = wave.open(path, "rb")
+            if wav.getsampwidth() == 2 and wav.getframerate() == rate:
+                self.wav = wav
+                self.channels = wav.getnchannels()
+            else:
+                wav.close()
+        if self.wav is None:
+            if not shutil.which("ffmpeg"):
+                raise OSError(f"ffmpeg is needed to read this file (install ffmpeg or use a 16-bit WAV at {rate} Hz)")
+            cmd = ['ffmpeg', '-loglevel', 'error', '-i', path,
+                   '-f', 's16le', '-ac', '1', '-ar', str(rate), '-vn', 'pipe:1']
+            self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=1024*1024)
+
+    def _raw(self, frames):
+        if self.wav:
+            return self.wav.readframes(frames)
+        return self.process.stdout.read(frames * 2)
+
+    def read(self):
+        # (block, sample time) or (None, None) at the end of the file
+        data = self._raw(self.chunk)
+        block = np.frombuffer(data[:len(data) - len(data) % (2 * self.channels)], dtype=np.int16)
+        if self.channels > 1:
+            block = block.reshape(-1, self.channels).mean(axis=1)
+        if not len(block):
+            return None, None
+        self.samples += len(block)
+        now = self.samples / self.rate
+        if self.realtime:
+            if self.started is None:
+                self.started = time.perf_counter() - len(block) / self.rate
+            delay = self.started + now - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return block.astype(np.float32), now
+
+    def close(self):
+        if self.wav:
+            self.wav.close()
+        if self.process:
+            self.process.kill()
+            self.process.wait()
+
+
+def _decode(path, realtime):
+    import qcx_cw_engine
+    import qcx_metrics
+
+    source = FileSource(path, realtime=realtime)
+    decoder = qcx_cw_engine.CWDecoder(source.rate)
+    decoder.metrics = qcx_metrics.Metrics(enabled=True)
+    decoder.on_char = lambda char: print(char, end="", flush=True)
+    decoder.reset(now=0.0)
+    started = time.perf_counter()
+    try:
+        while True:
+            t0 = decoder.metrics.clock()
+            block, now = source.read()
+            decoder.metrics.lap("capture", t0)
+            if block is None:
+                break
+            decoder.process(block, now=now)
+    finally:
+        source.close()
+    elapsed = time.perf_counter() - started
+    audio = source.samples / source.rate
+    print(f"\n\n{audio:.1f} s of audio in {elapsed:.2f} s ({audio / elapsed if elapsed else 0:.0f}x real time)")
+    print(decoder.metrics.format())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "decode":
+        print("usage: python qcx_audio_source.py decode FILE [--realtime]")
+        sys.exit(1)
+    _decode(sys.argv[2], "--realtime" in sys.argv)
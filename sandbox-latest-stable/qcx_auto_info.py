@@ -0,0 +1,61 @@
+# qcx_auto_info.py
+# Push-mode CAT reader using the radio's Kenwood-style auto-information (AI2)
+# Unsolicited FA/IF/TB/... reports are parsed straight into the radio state, and
+# the poll scheduler stops polling the fields the radio pushes on every change
+# (the VFO frequencies), so tuning shows up as it happens. IF and TB reports
+# are pushed too, but not for S-meter changes or every decoded character, so they
+# stay polled.
+
+import qcx_cat_client
+
+PUSHED_ON_CHANGE = ('FA', 'FB')
+
+
+class AutoInfoReader:
+    def __init__(self, cat, state, scheduler=None):
+        # cat: qcx_cat_client.CATWorker, state: qcx_radio_state.RadioState,
+        # scheduler: qcx_poll_scheduler.PollScheduler (optional)
+        self.cat = cat
+        self.state = state
+        self.scheduler = scheduler
+        self.pushed = set()
+        self.active = False
+
+    def start(self):
+        # Returns False if the firmware doesn't support auto-information;
+        # polling then carries on exactly as before.
+        try:
+            supported = self.cat.call(self.cat.client.set_auto_info(True))
+        except Exception as e:
+            print(f"Auto-info error: {e}")
+            supported = False
+        if not supported:
+            return False
+        self.cat.client.add_listener(self._on_frame)
+        self.active = True
+        return True
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        self.cat.client.remove_listener(self._on_frame)
+        try:
+            self.cat.call(self.cat.client.set_auto_info(False), timeout=2)
+        except Exception as e:
+            print(f"Auto-info error: {e}")
+        self.pushed.clear()
+        if self.scheduler:
+            self.scheduler.set_skip(())
+
+    def _on_frame(self, frame):
+        # Runs on the CAT client's loop thread for every unsolicited frame
+        parsed = qcx_cat_client.parse_frame(frame)
+        if parsed is None:
+            return
+        self.state.apply(parsed)
+        cmd = frame[:2]
+        if cmd in PUSHED_ON_CHANGE and cmd not in self.pushed:
+            self.pushed.add(cmd)
+            if self.scheduler:
+                self.scheduler.set_skip(self.pushed)
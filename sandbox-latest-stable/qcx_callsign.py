@@ -0,0 +1,133 @@
+# qcx_callsign.py
+# Streaming callsign recognizer for decoded CW text
+# Text from the TB buffer or the audio decoder is fed in as it arrives. Complete
+# words are matched against one compiled callsign pattern, scored by CQ/DE context,
+# looked up in a sorted prefix table (bisect, longest prefix wins) for the DXCC
+# entity, and checked against the logbook so new / dupe / needed stations are
+# flagged immediately, without re-reading the text widget.
+
+import csv
+import os
+import re
+from bisect import bisect_left
+from collections import deque
+
+CALL_RE = re.compile(r'^(?:[A-Z0-9]{1,3}/)?(?:[0-9]?[A-Z]{1,2}|[A-Z][0-9])[0-9][A-Z]{1,4}(?:/[A-Z0-9]{1,3})?$')
+
+# Words that look like calls often enough to matter, or are never calls
+NOT_CALLS = {"5NN", "599", "579", "73", "88", "TU", "CQ", "DE", "QRZ", "QSL", "QTH", "RST", "K", "KN", "BK"}
+
+# A compact starter table; a fuller one can be loaded from cty.csv (prefix,entity)
+DEFAULT_PREFIXES = {
+    "K": "United States", "W": "United States", "N": "United States",
+    "AA": "United States", "AB": "United States", "AC": "United States", "AD": "United States",
+    "AE": "United States", "AF": "United States", "AG": "United States", "AI": "United States",
+    "AJ": "United States", "AK": "United States", "AL7": "Alaska", "KL7": "Alaska", "KH6": "Hawaii",
+    "KP4": "Puerto Rico", "VE": "Canada", "VA": "Canada", "VY": "Canada", "XE": "Mexico",
+    "G": "England", "M": "England", "2E": "England", "GM": "Scotland", "MM": "Scotland",
+    "GW": "Wales", "GI": "Northern Ireland", "EI": "Ireland", "F": "France", "DL": "Germany",
+    "DA": "Germany", "DJ": "Germany", "DK": "Germany", "DO": "Germany", "ON": "Belgium",
+    "PA": "Netherlands", "PD": "Netherlands", "HB9": "Switzerland", "OE": "Austria",
+    "I": "Italy", "IK": "Italy", "IZ": "Italy", "EA": "Spain", "CT": "Portugal",
+    "SM": "Sweden", "LA": "Norway", "OH": "Finland", "OZ": "Denmark", "SP": "Poland",
+    "SQ": "Poland", "OK": "Czech Republic", "OM": "Slovak Republic", "HA": "Hungary",
+    "YO": "Romania", "LZ": "Bulgaria", "SV": "Greece", "9A": "Croatia", "S5": "Slovenia",
+    "UA": "European Russia", "RA": "European Russia", "R": "European Russia", "UA9": "Asiatic Russia",
+    "UR": "Ukraine", "UT": "Ukraine", "4X": "Israel", "JA": "Japan", "JH": "Japan", "JR": "Japan",
+    "7K": "Japan", "HL": "South Korea", "BY": "China", "BV": "Taiwan", "VU": "India",
+    "VK": "Australia", "ZL": "New Zealand", "ZS": "South Africa", "PY": "Brazil", "LU": "Argentina",
+    "CE": "Chile", "CX": "Uruguay", "HK": "Colombia", "YV": "Venezuela", "CO": "Cuba",
+}
+
+
+class PrefixTable:
+    def __init__(self, table=None):
+        table = dict(table or DEFAULT_PREFIXES)
+        self.prefixes = sorted(table)
+        self.entities = [table[p] for p in self.prefixes]
+        self.max_len = max((len(p) for p in self.prefixes), default=0)
+
+    @classmethod
+    def from_csv(cls, path):
+        table = dict(DEFAULT_PREFIXES)
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and row[0] and not row[0].startswith("#"):
+                    table[row[0].strip().upper()] = row[1].strip()
+        return cls(table)
+
+    def lookup(self, call):
+        # Longest matching prefix -> entity name, or None
+        base = call.split("/")
+        # A portable prefix like F/AJ6BC decides the entity
+        call = base[0] if len(base) > 1 and len(base[0]) <= 3 and not base[0].isdigit() else max(base, key=len)
+        for length in range(min(len(call), self.max_len), 0, -1):
+            i = bisect_left(self.prefixes, call[:length])
+            if i < len(self.prefixes) and self.prefixes[i] == call[:length]:
+                return self.entities[i]
+        return None
+
+
+class CallEvent:
+    def __init__(self, call, context, entity, worked, dupe, needed):
+        self.call = call
+        self.context = context      # "cq", "de" or "plain"
+        self.entity = entity
+        self.worked = worked        # worked before on any band
+        self.dupe = dupe            # worked on this band already
+        self.needed = needed        # entity not in the log yet
+
+    def __repr__(self):
+        flags = [f for f in ("worked", "dupe", "needed") if getattr(self, f)]
+        return f"CallEvent({self.call}, {self.context}, {self.entity}, {','.join(flags) or 'new'})"
+
+
+class CallsignRecognizer:
+    def __init__(self, logbook=None, prefixes=None):
+        self.logbook = logbook
+        self.prefixes = prefixes or (PrefixTable.from_csv("cty.csv") if os.path.exists("cty.csv") else PrefixTable())
+        self.partial = ""               # incomplete word at the end of the stream
+        self.recent = deque(maxlen=4)   # previous words, for CQ/DE context
+        self.worked_entities = set()
+        if logbook:
+            for call in logbook.by_call:
+                entity = self.prefixes.lookup(call)
+                if entity:
+                    self.worked_entities.add(entity)
+
+    def add_worked(self, call):
+        # Call after logging a QSO so "needed" stays current
+        entity = self.prefixes.lookup(call.upper())
+        if entity:
+            self.worked_entities.add(entity)
+
+    def feed(self, text, band=None):
+        # Returns a list of CallEvents for calls completed by this text
+        events = []
+        data = self.partial + text.upper()
+        words = data.split()
+        if data and not data[-1].isspace():
+            self.partial = words.pop() if words else ""
+        else:
+            self.partial = ""
+        for word in words:
+            event = self._word(word, band)
+            if event:
+                events.append(event)
+            self.recent.append(word)
+        return events
+
+    def _word(self, word, band):
+        if word in NOT_CALLS or len(word) < 3 or len(word) > 12 or not CALL_RE.match(word):
+            return None
+        if "CQ" in self.recent:
+            context = "cq"
+        elif self.recent and self.recent[-1] == "DE":
+            context = "de"
+        else:
+            context = "plain"
+        entity = self.prefixes.lookup(word)
+        worked = bool(self.logbook and self.logbook.worked_before(word))
+        dupe = bool(self.logbook and band and self.logbook.is_dupe(word, band, "CW"))
+        needed = entity is not None and entity not in self.worked_entities
+        return CallEvent(word, context, entity, worked, dupe, needed)
@@ -0,0 +1,338 @@
+# qcx_cat_client.py
+# Asyncio CAT client for QCX-mini / QMX / QMX+ (Kenwood TS-480 style commands)
+# One connection that the GUI, the scanner and headless tools can all share.
+# Queries are pipelined: several can be in flight at once and each reply is
+# matched back to its command by the two-letter prefix, so a full status poll
+# costs one round trip instead of five blocking read_until() calls.
+
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+QUERY_TIMEOUT = 1.0
+MAX_IN_FLIGHT = 8
+LATE_GRACE = 5.0        # seconds a reply to a timed-out query may still turn up
+STATUS_QUERIES = ('FA', 'FB', 'IF', 'FT', 'TB')
+
+# Name of the thread that issued the current request (for the CAT trace)
+caller = contextvars.ContextVar("caller", default=None)
+
+
+# ---- parsed responses ----
+
+@dataclass
+class VfoFreq:
+    vfo: str          # "A" or "B"
+    freq_hz: int
+
+    @property
+    def mhz(self):
+        return self.freq_hz / 1e6
+
+
+@dataclass
+class IFStatus:
+    freq_hz: int
+    rit_hz: int
+    s_meter: int
+    tx: bool
+    raw: str
+
+
+@dataclass
+class SplitMode:
+    mode: int         # 0 = VFO A, 1 = VFO B, 2 = SPLIT
+
+    @property
+    def name(self):
+        return {0: "VFO A", 1: "VFO B", 2: "SPLIT"}.get(self.mode, "?")
+
+
+@dataclass
+class DecodeText:
+    text: str         # empty when the TB buffer held nothing new
+
+
+def is_query(cmd):
+    # Bare two-letter commands read a value; anything with parameters sets one
+    # and the radio sends no reply.
+    return len(cmd) == 2 and cmd.isalpha()
+
+
+def parse_frame(frame):
+    # Turn one response (without the trailing ';') into a typed object, or None
+    # if it isn't one of the responses we understand.
+    try:
+        if frame.startswith('FA') or frame.startswith('FB'):
+            return VfoFreq(frame[1], int(frame[2:13]))
+        if frame.startswith('IF') and len(frame) >= 32:
+            rit = int(frame[18:23]) if frame[18:23].strip() else 0
+            s_meter = int(frame[29]) if frame[29].isdigit() else 0
+            return IFStatus(int(frame[2:13]), rit, s_meter, frame[28] == '1', frame)
+        if frame in ('FT0', 'FT1', 'FT2'):
+            return SplitMode(int(frame[2]))
+        if frame.startswith('TB'):
+            decoded = frame[2:].strip() if len(frame) > 4 else ""
+            if not decoded or decoded == "000" or decoded.isdigit():
+                decoded = ""
+            return DecodeText(decoded)
+    except ValueError:
+        return None
+    return None
+
+
+# ---- transports ----
+
+class SerialTransport:
+    # Blocking pyserial port; the client drives it from its own threads.
+    def __init__(self, port, baud=38400):
+        self.port = port
+        self.baud = baud
+        self.ser = None
+        self.rx = bytearray()           # received bytes not yet split into frames
+
+    def open(self):
+        import serial
+        self.ser = serial.Serial(self.port, self.baud, timeout=0.1)
+        self.rx.clear()
+
+    def write(self, data):
+        self.ser.write(data)
+
+    def read_frame(self):
+        # Returns one frame without the ';', or None if no complete frame arrived
+        # yet. A partial frame stays in the buffer until the rest of it comes in.
+        end = self.rx.find(b';')
+        if end < 0:
+            self.rx += self.ser.read(self.ser.in_waiting or 1)
+            end = self.rx.find(b';')
+            if end < 0:
+                return None
+        frame = bytes(self.rx[:end])
+        del self.rx[:end + 1]
+        return frame.decode(errors="replace").strip()
+
+    def close(self):
+        if self.ser:
+            self.ser.close()
+            self.ser = None
+
+
+# ---- client ----
+
+class CATClient:
+    def __init__(self, transport, timeout=QUERY_TIMEOUT):
+        self.transport = transport
+        self.timeout = timeout
+        self.loop = None
+        self.pending = deque()          # (prefix, future) in send order
+        self.expired = deque()          # (prefix, deadline) of timed-out queries
+        self.listeners = []             # called with every unsolicited frame
+        self.running = False
+        self.reader_thread = None
+        self.writer = ThreadPoolExecutor(max_workers=1)   # keeps writes in order
+        self.in_flight = None
+        self.trace = None               # optional qcx_cat_trace.TraceRecorder
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        await self.loop.run_in_executor(self.writer, self.transport.open)
+        self.running = True
+        self.reader_thread = threading.Thread(target=self._reader, daemon=True)
+        self.reader_thread.start()
+
+    async def close(self):
+        self.running = False
+        if self.reader_thread:
+            await self.loop.run_in_executor(None, self.reader_thread.join, 1.0)
+        await self.loop.run_in_executor(self.writer, self.transport.close)
+        while self.pending:
+            _, fut = self.pending.popleft()
+            if not fut.done():
+                fut.set_result(None)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _reader(self):
+        while self.running:
+            try:
+                frame = self.transport.read_frame()
+            except Exception as e:
+                print(f"CAT reader error: {e}")
+                time.sleep(0.1)
+                continue
+            if frame:
+                self.loop.call_soon_threadsafe(self._dispatch, frame)
+
+    def _dispatch(self, frame):
+        # '?' is the radio's error reply; it belongs to the oldest outstanding query
+        if frame == '?':
+            if self.pending:
+                _, fut = self.pending.popleft()
+                if not fut.done():
+                    fut.set_result('?')
+            return
+        prefix = frame[:2]
+        for entry in self.pending:
+            if entry[0] == prefix:
+                self.pending.remove(entry)
+                if not entry[1].done():
+                    entry[1].set_result(frame)
+                return
+        # A late reply to a query that already timed out is stale, not a push
+        now = self.loop.time()
+        while self.expired and self.expired[0][1] < now:
+            self.expired.popleft()
+        for entry in self.expired:
+            if entry[0] == prefix:
+                self.expired.remove(entry)
+                return
+        if self.trace:
+            self.trace.record("u", None, frame, None)
+        for callback in list(self.listeners):
+            try:
+                callback(frame)
+            except Exception as e:
+                print(f"CAT listener error: {e}")
+
+    async def write(self, cmd):
+        t0 = time.perf_counter()
+        await self.loop.run_in_executor(self.writer, self.transport.write, (cmd + ';').encode())
+        if self.trace and not is_query(cmd):
+            self.trace.record("w", cmd, None, time.perf_counter() - t0, caller.get())
+
+    async def query(self, cmd):
+        # Returns the raw reply (without ';'), '?' on a radio error, None on timeout
+        async with self.in_flight:
+            fut = self.loop.create_future()
+            entry = (cmd[:2], fut)
+            self.pending.append(entry)
+            t0 = time.perf_counter()
+            await self.write(cmd)
+            try:
+                resp = await asyncio.wait_for(fut, self.timeout)
+            except asyncio.TimeoutError:
+                if entry in self.pending:
+                    self.pending.remove(entry)
+                    self.expired.append((entry[0], self.loop.time() + LATE_GRACE))
+                resp = None
+            if self.trace:
+                self.trace.record("q", cmd, resp, time.perf_counter() - t0, caller.get())
+            return resp
+
+    async def command(self, cmd):
+        if is_query(cmd):
+            return await self.query(cmd)
+        await self.write(cmd)
+        return ""
+
+    # ---- typed queries ----
+
+    async def get_vfo(self, vfo="A"):
+        return parse_frame(await self.query('F' + vfo) or "")
+
+    async def get_if(self):
+        return parse_frame(await self.query('IF') or "")
+
+    async def get_split(self):
+        return parse_frame(await self.query('FT') or "")
+
+    async def get_decode(self):
+        return parse_frame(await self.query('TB') or "")
+
+    async def read_presets(self):
+        # Preset frequencies reported by PS, as a list of Hz. Firmware that
+        # doesn't report presets this way gives an empty list.
+        resp = await self.query('PS')
+        if not resp or resp == '?':
+            return []
+        return [int(f) for f in re.findall(r'\d{11}', resp[2:]) if int(f) > 0]
+
+    async def poll(self, queries=STATUS_QUERIES):
+        # All queries go out back-to-back; returns {cmd: parsed object or None}
+        replies = await asyncio.gather(*(self.query(q) for q in queries))
+        return {q: parse_frame(r) if r else None for q, r in zip(queries, replies)}
+
+    # ---- typed setters ----
+
+    async def set_freq(self, freq_hz, vfo="A"):
+        await self.write(f'F{vfo}{str(int(freq_hz)).zfill(11)}')
+
+    async def set_split(self, mode):
+        await self.write(f'FT{int(mode)}')
+
+    async def rit_adjust(self, step_hz):
+        await self.write(f'RD{abs(step_hz):04d}' if step_hz < 0 else f'RU{step_hz:04d}')
+
+    async def rit_zero(self):
+        await self.write('RU0')
+
+    async def set_speed(self, wpm):
+        await self.write(f'KS{int(wpm):02d}')
+
+    async def send_text(self, msg):
+        await self.write(f'KY {msg}')
+
+    async def set_tx(self, on):
+        await self.write('TQ1' if on else 'TQ0')
+
+    async def set_auto_info(self, on):
+        # Kenwood auto-information: AI2 asks the radio to push FA/IF/... reports
+        # on its own. Returns True if the radio confirms the new setting.
+        await self.write('AI2' if on else 'AI0')
+        resp = await self.query('AI')
+        return resp == ('AI2' if on else 'AI0')
+
+
+class CATWorker:
+    # Runs a CATClient on a private event-loop thread so Tk callbacks and plain
+    # worker threads (scanner, waterfall) can use it with blocking calls.
+    def __init__(self, transport, timeout=QUERY_TIMEOUT):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client = CATClient(transport, timeout)
+        try:
+            self.call(self.client.start())
+        except Exception:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            raise
+
+    def call(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(self._as_caller(coro, threading.current_thread().name),
+                                                self.loop).result(timeout)
+
+    async def _as_caller(self, coro, name):
+        # Tags the request with the calling thread for the CAT trace
+        caller.set(name)
+        return await coro
+
+    def send_cmd(self, cmd):
+        # Same contract as the GUI's old send_cmd: reply text, "" for set commands,
+        # "?" on error or timeout
+        resp = self.call(self.client.command(cmd))
+        return "?" if resp is None else resp
+
+    def poll(self, queries=STATUS_QUERIES):
+        return self.call(self.client.poll(queries))
+
+    def close(self):
+        try:
+            self.call(self.client.close(), timeout=3)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def open_serial(port, baud=38400):
+    return CATWorker(SerialTransport(port, baud))
@@ -0,0 +1,209 @@
+# qcx_cat_replay.py
+# Replay transport: a recorded CAT trace (qcx_cat_trace NDJSON) standing in for the radio
+# Drop-in for SerialTransport, so the GUI, the poll scheduler, the scanner and the
+# continuous waterfall run unchanged against a field trace. Queries are answered
+# from the trace: at real time or N x speed the reply is the one the radio gave at
+# that point of the recording, after the recorded latency; at speed 0 (as fast as
+# possible) the recorded replies for each command are handed out in order with no
+# delay. Pushed (auto-information) frames are played back on the same clock.
+#
+# In the main window, enter "replay:<trace file>" (or "replay:<trace file>@<speed>")
+# as the COM port. From the command line, benchmark polls and scan sweeps:
+#
+#   python qcx_cat_replay.py cat_trace.ndjson [--speed 0] [--polls 500] [--sweeps 5]
+
+import heapq
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+import qcx_cat_client
+import qcx_cat_trace
+
+READ_TIMEOUT = 0.1      # same as the serial port's
+
+
+class ReplayTransport:
+    def __init__(self, path, speed=1.0, loop=True):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.replies = defaultdict(list)    # cmd -> [(trace offset, reply, latency s)]
+        self.times = {}                     # cmd -> [trace offset], for bisect
+        self.pushes = []                    # [(trace offset, frame)]
+        self.cursor = defaultdict(int)      # speed 0: next reply per command
+        self.outbox = []                    # heap of (due, seq, frame)
+        self.seq = 0
+        self.last_due = 0.0                 # replies leave in command order, like a real radio
+        self.cond = threading.Condition()
+        self.start = None
+        self.push_index = 0
+        self.answered = 0
+        self.unknown = 0
+        self.duration = 0.0
+        self._load()
+
+    def _load(self):
+        t0 = None
+        for e in qcx_cat_trace.load(self.path):
+            t0 = e["ts"] if t0 is None else t0
+            offset = e["ts"] - t0
+            self.duration = offset
+            if e["dir"] == qcx_cat_trace.QUERY and e["resp"] is not None:
+                latency = (e["latency_ms"] or 0.0) / 1000
+                self.replies[e["cmd"]].append((offset, e["resp"], latency))
+            elif e["dir"] == qcx_cat_trace.PUSH and e["resp"]:
+                self.pushes.append((offset, e["resp"]))
+        self.times = {cmd: [r[0] for r in rows] for cmd, rows in self.replies.items()}
+
+    # ---- transport interface ----
+
+    def open(self):
+        self.start = time.time()
+
+    def close(self):
+        with self.cond:
+            self.outbox.clear()
+            self.cond.notify_all()
+
+    def write(self, data):
+        for cmd in data.decode(errors="replace").split(';'):
+            cmd = cmd.strip()
+            if cmd and qcx_cat_client.is_query(cmd):
+                self._answer(cmd)
+
+    def read_frame(self):
+        deadline = time.time() + READ_TIMEOUT
+        with self.cond:
+            while True:
+                self._queue_pushes()
+                now = time.time()
+                if self.outbox and self.outbox[0][0] <= now:
+                    return heapq.heappop(self.outbox)[2]
+                wait = deadline - now
+                if self.outbox:
+                    wait = min(wait, self.outbox[0][0] - now)
+                if wait <= 0:
+                    return None
+                self.cond.wait(wait)
+
+    # ---- playback ----
+
+    def clock(self):
+        # Current position in the trace (seconds from its start)
+        elapsed = (time.time() - self.start) * self.speed
+        if self.loop and self.duration > 0:
+            return elapsed % self.duration
+        return elapsed
+
+    def _answer(self, cmd):
+        rows = self.replies.get(cmd)
+        if not rows:
+            self.unknown += 1
+            self._emit('?', 0.0)
+            return
+        if self.speed > 0:
+            i = max(0, bisect_right(self.times[cmd], self.clock()) - 1)
+            _, reply, latency = rows[i]
+            delay = latency / self.speed
+        else:
+            i = self.cursor[cmd]
+            self.cursor[cmd] = (i + 1) % len(rows) if self.loop else min(i + 1, len(rows) - 1)
+            _, reply, _ = rows[i]
+            delay = 0.0
+        self.answered += 1
+        self._emit(reply, delay)
+
+    def _emit(self, frame, delay):
+        with self.cond:
+            self.last_due = max(time.time() + delay, self.last_due)
+            heapq.heappush(self.outbox, (self.last_due, self.seq, frame))
+            self.seq += 1
+            self.cond.notify_all()
+
+    def _queue_pushes(self):
+        # Hand out pushed frames whose time has come (all of them at once at speed 0)
+        n = len(self.pushes)
+        repeat = self.loop and self.speed > 0 and self.duration > 0
+        while n and (self.push_index < n or repeat):
+            lap, i = divmod(self.push_index, n)
+            offset, frame = self.pushes[i]
+            if self.speed > 0 and (time.time() - self.start) * self.speed < lap * self.duration + offset:
+                return
+            heapq.heappush(self.outbox, (0.0, self.seq, frame))
+            self.seq += 1
+            self.push_index += 1
+
+
+def open_replay(path, speed=1.0, loop=True):
+    return qcx_cat_client.CATWorker(ReplayTransport(path, speed, loop))
+
+
+def parse_port(port):
+    # "replay:trace.ndjson" or "replay:trace.ndjson@4" -> (path, speed); None for a real port
+    if not port.lower().startswith("replay:"):
+        return None
+    spec = port[len("replay:"):]
+    path, sep, speed = spec.rpartition("@")
+    if sep:
+        try:
+            return path, float(speed.lower().rstrip("x"))
+        except ValueError:
+            pass
+    return spec, 1.0
+
+
+def benchmark(path, speed=0.0, polls=500, sweeps=5):
+    import qcx_radio_state
+    import qcx_scanner
+
+    worker = open_replay(path, speed)
+    state = qcx_radio_state.RadioState()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(polls):
+            for parsed in worker.poll().values():
+                if parsed:
+                    state.apply(parsed)
+        poll_s = time.perf_counter() - t0
+        print(f"poll_status: {polls} polls in {poll_s:.3f} s ({polls / poll_s:.0f}/s, "
+              f"{poll_s / polls * 1000:.2f} ms each)")
+
+        # No quiet hold-off: every step tunes and queries, so steps/s is CAT throughput
+        engine = qcx_scanner.ScanEngine(worker, state, settle=0.0, active_dwell=0.0, sample_interval=0.0,
+                                        quiet_sweeps=10 ** 9)
+        engine.running = True
+        grid = qcx_scanner.scan_grid(7.030, 25, 5)
+        steps = 0
+        t0 = time.perf_counter()
+        for _ in range(sweeps):
+            engine.sweep(grid)
+            steps += engine.fresh
+        scan_s = time.perf_counter() - t0
+        print(f"scan_loop:   {steps} steps in {scan_s:.3f} s ({steps / scan_s:.0f} steps/s)")
+
+        frames = [r[1] for rows in worker.client.transport.replies.values() for r in rows]
+        t0 = time.perf_counter()
+        for frame in frames:
+            qcx_cat_client.parse_frame(frame)
+        parse_s = time.perf_counter() - t0
+        if frames:
+            print(f"parse_frame: {len(frames)} frames in {parse_s * 1000:.1f} ms "
+                  f"({parse_s / len(frames) * 1e6:.1f} us each)")
+        transport = worker.client.transport
+        print(f"answered {transport.answered}, unknown commands {transport.unknown}")
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python qcx_cat_replay.py TRACE [--speed N] [--polls N] [--sweeps N]")
+        sys.exit(1)
+
+    def opt(name, default):
+        return float(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+    benchmark(sys.argv[1], opt("--speed", 0.0), int(opt("--polls", 500)), int(opt("--sweeps", 5)))
@@ -0,0 +1,164 @@
+# qcx_cat_trace.py
+# Low-overhead CAT traffic trace recorder (NDJSON)
+# The CAT client hands every transaction (time, direction, command, response,
+# latency, thread) to record(), which only appends a tuple to a ring buffer. A
+# background writer drains the ring to an NDJSON file when tracing to disk is on.
+# Per-command latency histograms are kept live, and the command line tool replays
+# or summarizes a saved trace:
+#
+#   python qcx_cat_trace.py stats  cat_trace.ndjson
+#   python qcx_cat_trace.py replay cat_trace.ndjson [--speed 4]
+
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+# Histogram bucket upper edges in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf"))
+
+# Directions
+QUERY = "q"         # command sent, reply received
+WRITE = "w"         # set command, no reply expected
+PUSH = "u"          # unsolicited frame from the radio
+
+
+class TraceRecorder:
+    def __init__(self, capacity=100000, flush_interval=0.5):
+        self.ring = deque(maxlen=capacity)
+        self.flush_interval = flush_interval
+        self.histograms = defaultdict(lambda: [0] * len(BUCKETS_MS))
+        self.recent = deque(maxlen=1000)     # last entries drained, for the debug console
+        self.file = None
+        self.path = None
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def record(self, direction, cmd, resp, latency, thread=None):
+        # Hot path: one tuple append (deque.append is thread-safe)
+        self.ring.append((time.time(), direction, cmd, resp, latency, thread or threading.current_thread().name))
+
+    def open(self, path):
+        with self.lock:
+            self._close_file()
+            self.file = open(path, "a", encoding="utf-8")
+            self.path = path
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=2)
+        self._drain()
+        with self.lock:
+            self._close_file()
+
+    def _close_file(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            self.path = None
+
+    def _writer(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            self._drain()
+
+    def _drain(self):
+        with self.lock:
+            entries = []
+            while self.ring:
+                try:
+                    entries.append(self.ring.popleft())
+                except IndexError:
+                    break
+            if not entries:
+                return
+            for entry in entries:
+                self._histogram(entry)
+            self.recent.extend(entries)
+            if self.file:
+                self.file.write("".join(json.dumps(to_dict(e)) + "\n" for e in entries))
+                self.file.flush()
+
+    def _histogram(self, entry):
+        _, direction, cmd, _, latency, _ = entry
+        if direction != QUERY or latency is None:
+            return
+        ms = latency * 1000
+        hist = self.histograms[(cmd or "")[:2]]
+        for i, edge in enumerate(BUCKETS_MS):
+            if ms <= edge:
+                hist[i] += 1
+                break
+
+    def snapshot(self):
+        return [to_dict(e) for e in self.recent]
+
+    def stop_file(self):
+        self._drain()
+        with self.lock:
+            self._close_file()
+
+
+def to_dict(entry):
+    ts, direction, cmd, resp, latency, thread = entry
+    return {"ts": round(ts, 6), "dir": direction, "cmd": cmd, "resp": resp,
+            "latency_ms": None if latency is None else round(latency * 1000, 3), "thread": thread}
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def histograms_from(entries):
+    hists = defaultdict(lambda: [0] * len(BUCKETS_MS))
+    for e in entries:
+        if e["dir"] != QUERY or e["latency_ms"] is None:
+            continue
+        hist = hists[(e["cmd"] or "")[:2]]
+        for i, edge in enumerate(BUCKETS_MS):
+            if e["latency_ms"] <= edge:
+                hist[i] += 1
+                break
+    return hists
+
+
+def format_histograms(hists):
+    labels = [f"<={int(b)}" if b != float("inf") else ">1000" for b in BUCKETS_MS]
+    lines = ["cmd   count  " + " ".join(f"{l:>6}" for l in labels)]
+    for cmd in sorted(hists):
+        counts = hists[cmd]
+        lines.append(f"{cmd:<5} {sum(counts):>6}  " + " ".join(f"{c:>6}" for c in counts))
+    return "\n".join(lines)
+
+
+def replay(path, speed=1.0):
+    # Print the trace with its original timing (speed 0 = as fast as possible)
+    start_trace = start_wall = None
+    for e in load(path):
+        if start_trace is None:
+            start_trace, start_wall = e["ts"], time.time()
+        elif speed > 0:
+            delay = (e["ts"] - start_trace) / speed - (time.time() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        latency = "" if e["latency_ms"] is None else f"{e['latency_ms']:.1f} ms"
+        arrow = {QUERY: ">", WRITE: ">>", PUSH: "<<"}.get(e["dir"], "?")
+        print(f"{e['ts'] - start_trace:10.3f}  {arrow:2} {e['cmd'] or '':<16} {e['resp'] or '':<40} {latency:>10}  {e['thread']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("stats", "replay"):
+        print("usage: python qcx_cat_trace.py stats|replay FILE [--speed N]")
+        sys.exit(1)
+    if sys.argv[1] == "stats":
+        print(format_histograms(histograms_from(load(sys.argv[2]))))
+    else:
+        speed = float(sys.argv[sys.argv.index("--speed") + 1]) if "--speed" in sys.argv else 1.0
+        replay(sys.argv[2], speed)
@@ -1,21 +1,23 @@
 # qcx_cw_decoder.py - v14 (based on working v12, fixes applied)
 # Functions defined before buttons (fixes NameError)
-# Trainer audio switched to sounddevice (fixes SystemError)
+# Trainer and MP3 playback go through qcx_audio_devices (one PortAudio instance)
 # Tuned thresholds for better decoding
 # Complete file - no deletions, all features preserved
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext, filedialog, messagebox
-import pyaudio
+from tkinter import ttk, filedialog, messagebox
 import numpy as np
 import threading
 import time
-import math
 import random
-from collections import deque
 import subprocess
-import sounddevice as sd
 import statistics  # for median
+import qcx_text_pane
+import qcx_audio_devices
+import qcx_audio_source
+import qcx_cw_engine
+import qcx_metrics
+from qcx_cw_engine import MORSE_DICT
 
 # Simple sine wave generator for trainer audio tones
 def generate_tone(freq=700, duration=0.1, sample_rate=48000, amplitude=0.5):
@@ -23,21 +25,6 @@ def generate_tone(freq=700, duration=0.1, sample_rate=48000, amplitude=0.5):
     tone = amplitude * np.sin(2 * np.pi * freq * t)
     return (tone * 32767).astype(np.int16).tobytes()
 
-def goertzel(data, rate, freq):
-    N = len(data)
-    k = int(0.5 + N * freq / rate)
-    w = 2 * math.pi * k / N
-    cosine = math.cos(w)
-    coeff = 2 * cosine
-    q0 = q1 = q2 = 0.0
-    for sample in data:
-        q0 = coeff * q1 - q2 + sample
-        q2 = q1
-        q1 = q0
-    real = q1 - q2 * cosine
-    imag = q2 * math.sin(w)
-    return math.sqrt(real*real + imag*imag)
-
 def open_cw_decoder(main_app):
     win = tk.Toplevel(main_app.root)
     win.title("CW Decoder - Live from Audio Input")
@@ -74,25 +61,36 @@ def open_cw_decoder(main_app):
 
     text_frame = tk.Frame(win)
     text_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
-    text_area = scrolledtext.ScrolledText(text_frame, font=("Courier", 14), bg="#000000", fg="#00ff00")
+    text_area = qcx_text_pane.BoundedTextPane(text_frame, max_lines=2000, font=("Courier", 14), bg="#000000", fg="#00ff00")
     text_area.pack(fill=tk.BOTH, expand=True)
 
     ctrl_frame = tk.Frame(win, bg="#1a1a1a")
     ctrl_frame.pack(fill=tk.X, pady=20, padx=20)
 
     tk.Label(ctrl_frame, text="Input:", fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=15)
-    audio = pyaudio.PyAudio()
-    devices = []
-    for i in range(audio.get_device_count()):
-        info = audio.get_device_info_by_index(i)
-        if info['maxInputChannels'] > 0:
-            devices.append((info['name'], i))
+    devices = [d.name for d in qcx_audio_devices.input_devices()]
     device_var = tk.StringVar()
+    # Shared with the main window, so the recorder and audio scan use the same input
+    device_var.trace_add("write", lambda *args: setattr(main_app, "audio_input", device_var.get()))
     if devices:
-        device_var.set(devices[0][0])
-        ttk.Combobox(ctrl_frame, textvariable=device_var, values=[n for n, i in devices], width=40, state="readonly").pack(side=tk.LEFT, padx=10)
-    else:
-        tk.Label(ctrl_frame, text="No audio devices!", fg="red", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
+        device_var.set(main_app.audio_input if main_app.audio_input in devices else devices[0])
+    device_combo = ttk.Combobox(ctrl_frame, textvariable=device_var, values=devices, width=40, state="readonly")
+    device_combo.pack(side=tk.LEFT, padx=10)
+    no_devices_label = tk.Label(ctrl_frame, text="No audio devices!", fg="red", bg="#1a1a1a")
+    if not devices:
+        no_devices_label.pack(side=tk.LEFT, padx=10)
+
+    def refresh_devices():
+        names = [d.name for d in qcx_audio_devices.refresh() if d.inputs > 0]
+        device_combo.config(values=names)
+        if device_var.get() not in names:
+            device_var.set(names[0] if names else "")
+        if names:
+            no_devices_label.pack_forget()
+        else:
+            no_devices_label.pack(side=tk.LEFT, padx=10)
+
+    tk.Button(ctrl_frame, text="Refresh", command=refresh_devices, bg="#333333", fg="white").pack(side=tk.LEFT)
 
     thresh_frame = tk.Frame(ctrl_frame, bg="#1a1a1a")
     thresh_frame.pack(fill=tk.X, pady=15)
@@ -124,51 +122,30 @@ def open_cw_decoder(main_app):
     chunk = 1024
     rate = 48000
     decoding_state = [False]  # mutable
-    key_state_state = [False]  # mutable
-    last_transition_state = [time.time()]  # mutable
-    last_char_time_state = [time.time()]  # mutable
-    current_tone_state = [700]  # mutable
-    current_symbol_state = [""]  # mutable
-
-    element_times = deque(maxlen=50)
-    noise_floor = deque(maxlen=100)
-
-    MORSE_DICT = {
-        '.-': 'A', '-...': 'B', '-.-.': 'C', '-..': 'D', '.': 'E',
-        '..-.': 'F', '--.': 'G', '....': 'H', '..': 'I', '.---': 'J',
-        '-.-': 'K', '.-..': 'L', '--': 'M', '-.': 'N', '---': 'O',
-        '.--.': 'P', '--.-': 'Q', '.-.': 'R', '...': 'S', '-': 'T',
-        '..-': 'U', '...-': 'V', '.--': 'W', '-..-': 'X', '-.--': 'Y',
-        '--..': 'Z', '.----': '1', '..---': '2', '...--': '3', '....-': '4',
-        '.....': '5', '-....': '6', '--...': '7', '---..': '8', '----.': '9',
-        '-----': '0',
-        '.-.-.': '<AR>', '...-.-': '<SK>', '-...-': '<BT>', '-...-.-': 'BK',
-        '-.--.': '<KN>', '.-...': '<AS>', '-.-...': '<CL>', '......': '<HH>',
-        '...---...': '<SOS>', '-.-': '<K>',
-        '.-.-.-': '.', '.-.-.': '+', '.----.': '\'', '--..--': ',', '..--..': '?',
-        '-..-.': '/', '---...': ':', '-.-.-.': ';', '-.--.-': '(', '-.--.-': ')',
-        '.-..-.': '"', '-...-': '=', '..--.-': '@', '----..': '$'
-    }
-
-    def decode_char():
-        if current_symbol_state[0]:
-            decoded_symbol = current_symbol_state[0]
-            char = MORSE_DICT.get(decoded_symbol, '?')
-            if char == '?' and all(c == '.' for c in decoded_symbol):
-                if len(decoded_symbol) == 1:
-                    char = 'E'
-                elif len(decoded_symbol) == 4:
-                    char = 'H'
-                elif len(decoded_symbol) == 5:
-                    char = '5'
-                print(f"DEBUG: All-dot fallback - decoded: {char} (symbol: {decoded_symbol})")
-            text_area.insert(tk.END, char)
-            text_area.see(tk.END)
-            text_area.update()
-            time.sleep(0.01)
-            print(f"DEBUG: Inserted '{char}' into text area (symbol was: {decoded_symbol})")
-            current_symbol_state[0] = ""
-            symbol_label.config(text="")
+
+    decoder = qcx_cw_engine.CWDecoder(rate)
+    decoder.debug = True
+    element_times = decoder.element_times
+    metrics = qcx_metrics.Metrics()
+    decoder.metrics = metrics
+    ui_after = metrics.wrap_ui(win.after)
+
+    def on_char(char):
+        if char == " ":
+            main_app.on_decoded_text(" ", "AUDIO")
+            text_area.append("  ")
+            return
+        text_area.append(char)
+        main_app.on_decoded_text(char, "AUDIO")
+
+    def on_symbol(symbol, key_down):
+        ui_after(0, lambda: symbol_label.config(text=symbol + (" [on]" if key_down else "")))
+
+    decoder.on_char = on_char
+    decoder.on_symbol = on_symbol
+    decoder.on_tone = lambda f, s: ui_after(0, lambda: (tone_label.config(text=f"{int(f)} Hz"), snr_label.config(text=f"{s:.1f} dB")))
+    decoder.on_timing = lambda text: ui_after(0, lambda: timing_label.config(text=text))
+    decoder.on_wpm = lambda wpm: ui_after(0, lambda: wpm_label.config(text=f"{int(wpm)}"))
 
     def calibrate_wpm():
         if len(element_times) < 5:
@@ -186,134 +163,84 @@ def open_cw_decoder(main_app):
         print(f"DEBUG: Calibrated WPM = {int(wpm)} (avg dot = {avg_dot:.3f}s)")
 
     def launch_ft8_decoder():
-        try:
-            messagebox.showinfo("FT8 Launch", "Launching WSJT-X (or your FT8 decoder). Ensure audio input is routed.")
-            subprocess.Popen(["wsjtx"])
-        except Exception as e:
-            messagebox.showerror("FT8 Error", f"Could not launch FT8 decoder: {e}")
-
-    def audio_decoder():
-        current_symbol_local = ""
+        # Goes through the main window so WSJT-X uses the rigctld bridge, not the serial port
+        messagebox.showinfo("FT8 Launch", "Launching WSJT-X (or your FT8 decoder). Ensure audio input is routed.")
+        main_app.launch_wsjtx()
 
+    def audio_decoder(file_path=None):
+        # Live input, or a recording through the same pipeline (timed by its sample clock)
         try:
-            name = device_var.get()
-            idx = next(i for n, i in devices if n == name)
-            print(f"DEBUG: Opening audio device: {name} (index {idx})")
-            stream = audio.open(format=pyaudio.paInt16, channels=1, rate=rate,
-                                input=True, input_device_index=idx, frames_per_buffer=chunk)
-            print("DEBUG: Audio stream opened successfully")
+            if file_path:
+                source = qcx_audio_source.FileSource(file_path, rate, chunk, realtime=not unthrottled_var.get())
+                print(f"DEBUG: Decoding file: {file_path}")
+            else:
+                name = device_var.get()
+                idx = qcx_audio_devices.find(name)
+                if idx is None:
+                    raise OSError("No input device selected")
+                print(f"DEBUG: Opening audio device: {name} (index {idx})")
+                source = qcx_audio_source.DeviceSource(idx, rate, chunk)
+                print("DEBUG: Audio stream opened successfully")
         except Exception as e:
             print(f"DEBUG: CRITICAL audio open error: {e}")
-            win.after(0, lambda: messagebox.showerror("Audio Error", f"Cannot open input:\n{e}"))
+            win.after(0, lambda err=e: messagebox.showerror("Audio Error", f"Cannot open input:\n{err}"))
+            win.after(0, stop_decoder)
             return
 
-        test_freqs = np.arange(400, 1101, 20)
-
+        decoder.reset(now=0.0 if file_path else None)
         while decoding_state[0]:
             try:
-                data = np.frombuffer(stream.read(chunk, exception_on_overflow=False), dtype=np.int16).astype(np.float32)
-
-                mags = [goertzel(data, rate, f) for f in test_freqs]
-                max_idx = np.argmax(mags)
-                tone_freq = test_freqs[max_idx]
-                tone_mag = mags[max_idx]
-
-                noise_mag = np.mean(mags[:5] + mags[-5:])
-                noise_floor.append(noise_mag)
-                avg_noise = np.mean(noise_floor) if noise_floor else noise_mag
-
-                snr = 20 * math.log10((tone_mag + 1e-10) / (avg_noise + 1e-10))
-
-                win.after(0, lambda f=tone_freq, s=snr: (tone_label.config(text=f"{int(f)} Hz"), snr_label.config(text=f"{s:.1f} dB")))
-                current_tone_state[0] = tone_freq
-
-                multiplier = multiplier_var.get()
-                open_thresh = avg_noise * multiplier
-                close_thresh = avg_noise * (multiplier * 0.875)
-
-                if key_state_state[0]:
-                    key_down = tone_mag > close_thresh
-                else:
-                    key_down = tone_mag > open_thresh
-
-                now = time.time()
-
-                if key_down != key_state_state[0]:
-                    duration = now - last_transition_state[0]
-                    if duration > 0.01:
-                        element_times.append(duration)
-
-                    if key_down:
-                        win.after(0, lambda: symbol_label.config(text=current_symbol_state[0] + " [on]"))
-                        win.after(0, lambda d=duration: timing_label.config(text=f"{d:.3f}s [start]"))
-                    else:
-                        if element_times:
-                            avg_dot = statistics.median(element_times) if element_times else 0.1
-                            print(f"DEBUG: avg_dot (median): {avg_dot:.3f}s, ratio used: 1.5")
-                            if duration < avg_dot * 1.5:
-                                current_symbol_state[0] += "."
-                                win.after(0, lambda d=duration: timing_label.config(text=f"{d:.3f}s [dot]"))
-                            else:
-                                current_symbol_state[0] += "-"
-                                win.after(0, lambda d=duration: timing_label.config(text=f"{d:.3f}s [dash]"))
-                            win.after(0, lambda: symbol_label.config(text=current_symbol_state[0]))
-                            if len(current_symbol_state[0]) > 5:
-                                print("DEBUG: Hard symbol limit (15) reached - forcing decode")
-                                decode_char()
-                                current_symbol_state[0] = ""
-
-                    key_state_state[0] = key_down
-                    last_transition_state[0] = now
-                    last_char_time_state[0] = now
-
-                if not key_down and current_symbol_state[0]:
-                    char_space_threshold = max(0.02, statistics.median(element_times) * 0.6 if element_times else 0.02)
-                    silence_time = now - last_char_time_state[0]
-                    if silence_time > char_space_threshold:
-                        print(f"DEBUG: Inter-character space detected ({silence_time:.3f}s > {char_space_threshold:.3f}s) - decoding: {current_symbol_state[0]}")
-                        decode_char()
-                        current_symbol_state[0] = ""
-                    last_char_time_state[0] = now
-                    win.after(0, lambda: timing_label.config(text="char space"))
-
-                if not key_down and (now - last_transition_state[0]) > 0.5:
-                    if current_symbol_state[0]:
-                        decode_char()
-                    current_symbol_state[0] = ""
-                    spacing = statistics.median(element_times) * 7 if element_times else 0.7
-                    if farnsworth_var.get() and element_times:
-                        avg_wpm = 1.2 / statistics.median(element_times)
-                        if avg_wpm < 18:
-                            spacing *= (18 / avg_wpm)
-                    if (now - last_transition_state[0]) > spacing:
-                        win.after(0, lambda: text_area.insert(tk.END, "  "))
-                        win.after(0, lambda: text_area.see(tk.END))
-                        win.after(0, lambda: timing_label.config(text="word space"))
-
-                if element_times:
-                    avg = statistics.median(element_times)
-                    wpm = 1.2 / avg if avg > 0 else 0
-                    win.after(0, lambda w=int(wpm): wpm_label.config(text=f"{w}"))
-
+                t0 = metrics.clock()
+                data, now = source.read()
+                metrics.lap("capture", t0)
+                if data is None:
+                    text_area.append("\n=== END OF FILE ===\n")
+                    win.after(0, stop_decoder)
+                    break
+                decoder.multiplier = multiplier_var.get()
+                decoder.farnsworth = farnsworth_var.get()
+                decoder.process(data, now=now)
             except Exception as e:
                 print(f"DEBUG: Loop error: {e}")
                 continue
 
-        stream.stop_stream()
-        stream.close()
+        source.close()
+
+    def stop_decoder():
+        decoding_state[0] = False
+        btn.config(text="START DECODER", bg="#00ff88")
+
+    def start_decoder(file_path=None):
+        decoding_state[0] = True
+        btn.config(text="STOP DECODER", bg="#ff4444")
+        threading.Thread(target=audio_decoder, args=(file_path,), daemon=True).start()
 
     def toggle_decoder():
         if decoding_state[0]:
-            decoding_state[0] = False
-            btn.config(text="START DECODER", bg="#00ff88")
+            stop_decoder()
         else:
-            decoding_state[0] = True
-            btn.config(text="STOP DECODER", bg="#ff4444")
-            threading.Thread(target=audio_decoder, daemon=True).start()
+            start_decoder()
+
+    def decode_file():
+        if decoding_state[0]:
+            messagebox.showinfo("Decode File", "Stop the decoder first.")
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("Audio files", "*.wav *.mp3 *.flac *.ogg"), ("All files", "*")])
+        if file_path:
+            text_area.append(f"\n=== FILE: {file_path} ===\n")
+            start_decoder(file_path)
 
     btn = tk.Button(ctrl_frame, text="START DECODER", command=toggle_decoder,
                     bg="#00ff88", fg="black", font=("Arial", 14, "bold"))
     btn.pack(pady=20)
+    file_frame = tk.Frame(ctrl_frame, bg="#1a1a1a")
+    file_frame.pack(pady=5)
+    tk.Button(file_frame, text="Decode File...", command=decode_file, bg="#00aaff", fg="white").pack(side=tk.LEFT, padx=5)
+    unthrottled_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(file_frame, text="Unthrottled (as fast as the CPU allows)", variable=unthrottled_var,
+                   fg="white", bg="#1a1a1a", selectcolor="#333333").pack(side=tk.LEFT, padx=5)
+    tk.Button(file_frame, text="Metrics", command=lambda: qcx_metrics.open_metrics_panel(win, metrics),
+              bg="#333333", fg="white").pack(side=tk.LEFT, padx=5)
 
     # CW Trainer
     def cw_trainer():
@@ -336,13 +263,9 @@ def open_cw_decoder(main_app):
         elif mode == "Custom Text":
             text = custom_text_var.get()
 
-        text_area.insert(tk.END, f"\n\n=== TRAINER START ({mode}, {wpm} WPM) ===\n")
-        text_area.see(tk.END)
+        text_area.append(f"\n\n=== TRAINER START ({mode}, {wpm} WPM) ===\n")
 
-        p = pyaudio.PyAudio() if trainer_play_var.get() else None
-        stream = None
-        if p:
-            stream = p.open(format=pyaudio.paInt16, channels=1, rate=rate, output=True, frames_per_buffer=chunk)
+        stream = qcx_audio_devices.open_output(rate, chunk) if trainer_play_var.get() else None
 
         for char in text.upper():
             if char == ' ':
@@ -359,18 +282,13 @@ def open_cw_decoder(main_app):
                         time.sleep(0.05 * (20 / wpm))  # inter-element
                 time.sleep(0.15 * (20 / wpm))  # inter-character
 
-            text_area.insert(tk.END, char)
-            text_area.see(tk.END)
+            text_area.append(char)
             time.sleep(0.05)
 
-        text_area.insert(tk.END, "\n=== TRAINER END ===\n\n")
-        text_area.see(tk.END)
+        text_area.append("\n=== TRAINER END ===\n\n")
 
         if stream:
-            stream.stop_stream()
-            stream.close()
-        if p:
-            p.terminate()
+            qcx_audio_devices.close(stream)
 
     trainer_btn = tk.Button(ctrl_frame, text="Start Trainer", 
                             command=lambda: threading.Thread(target=cw_trainer, daemon=True).start(),
@@ -383,7 +301,7 @@ def open_cw_decoder(main_app):
         if not file_path:
             return
 
-        print(f"Playing MP3 file with ffmpeg + sounddevice: {file_path}")
+        print(f"Playing MP3 file with ffmpeg: {file_path}")
         try:
             cmd = [
                 'ffmpeg',
@@ -391,23 +309,18 @@ def open_cw_decoder(main_app):
                 '-f', 's16le', '-ac', '1', '-ar', str(rate), '-vn', 'pipe:1'
             ]
 
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=1024*1024)
-
-            sd.default.samplerate = rate
-            sd.default.channels = 1
-            sd.default.dtype = 'int16'
-
-            def callback(outdata, frames, time_info, status):
-                data = process.stdout.read(frames * 2)
-                if len(data) == 0:
-                    raise sd.CallbackAbort
-                outdata[:] = np.frombuffer(data, dtype=np.int16).reshape(-1, 1)
-
-            with sd.OutputStream(callback=callback, blocksize=chunk):
-                while process.poll() is None:
-                    time.sleep(0.1)
-
-            process.terminate()
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=1024*1024)
+            stream = qcx_audio_devices.open_output(rate, chunk)
+            try:
+                while True:
+                    data = process.stdout.read(chunk * 2)
+                    if not data:
+                        break
+                    stream.write(data)
+            finally:
+                qcx_audio_devices.close(stream)
+                process.kill()
+                process.wait()
             print("MP3 playback finished")
         except Exception as e:
             print(f"Error playing MP3: {e}")
@@ -451,13 +364,6 @@ def open_cw_decoder(main_app):
         wpm_cal_label.config(text=f"{int(wpm)} WPM")
         print(f"DEBUG: Calibrated WPM = {int(wpm)} (avg dot = {avg_dot:.3f}s)")
 
-    def launch_ft8_decoder():
-        try:
-            messagebox.showinfo("FT8 Launch", "Launching WSJT-X (or your FT8 decoder). Ensure audio input is routed.")
-            subprocess.Popen(["wsjtx"])
-        except Exception as e:
-            messagebox.showerror("FT8 Error", f"Could not launch FT8 decoder: {e}")
-
     def on_closing():
         decoding_state[0] = False
         win.destroy()
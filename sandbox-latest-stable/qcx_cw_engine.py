@@ -0,0 +1,240 @@
+# qcx_cw_engine.py
+# Tk-free CW decoder core, shared by the CW Decoder window and the headless daemon
+# Each audio block goes through a bank of Goertzel filters (400-1100 Hz, 20 Hz
+# apart); every bin has its own noise floor (NoiseFloor), the bin with the best
+# SNR is compared with its floor using open/close hysteresis, key-down/up
+# durations are classified as dots and dashes against the running median element
+# length, and silences end characters and words. Results come out through optional callbacks, so the caller decides
+# whether they go to Tk labels or to files.
+
+import math
+import statistics
+import time
+from collections import deque
+
+import numpy as np
+
+MORSE_DICT = {
+    '.-': 'A', '-...': 'B', '-.-.': 'C', '-..': 'D', '.': 'E',
+    '..-.': 'F', '--.': 'G', '....': 'H', '..': 'I', '.---': 'J',
+    '-.-': 'K', '.-..': 'L', '--': 'M', '-.': 'N', '---': 'O',
+    '.--.': 'P', '--.-': 'Q', '.-.': 'R', '...': 'S', '-': 'T',
+    '..-': 'U', '...-': 'V', '.--': 'W', '-..-': 'X', '-.--': 'Y',
+    '--..': 'Z', '.----': '1', '..---': '2', '...--': '3', '....-': '4',
+    '.....': '5', '-....': '6', '--...': '7', '---..': '8', '----.': '9',
+    '-----': '0',
+    '.-.-.': '<AR>', '...-.-': '<SK>', '-...-': '<BT>', '-...-.-': 'BK',
+    '-.--.': '<KN>', '.-...': '<AS>', '-.-...': '<CL>', '......': '<HH>',
+    '...---...': '<SOS>', '-.-': '<K>',
+    '.-.-.-': '.', '.-.-.': '+', '.----.': '\'', '--..--': ',', '..--..': '?',
+    '-..-.': '/', '---...': ':', '-.-.-.': ';', '-.--.-': '(', '-.--.-': ')',
+    '.-..-.': '"', '-...-': '=', '..--.-': '@', '----..': '$'
+}
+
+TEST_FREQS = np.arange(400, 1101, 20)
+
+
+def goertzel(data, rate, freq):
+    N = len(data)
+    k = int(0.5 + N * freq / rate)
+    w = 2 * math.pi * k / N
+    cosine = math.cos(w)
+    coeff = 2 * cosine
+    q0 = q1 = q2 = 0.0
+    for sample in data:
+        q0 = coeff * q1 - q2 + sample
+        q2 = q1
+        q1 = q0
+    real = q1 - q2 * cosine
+    imag = q2 * math.sin(w)
+    return math.sqrt(real*real + imag*imag)
+
+
+class GoertzelBank:
+    # Same magnitudes as goertzel() for every frequency, as one matrix product
+    # (the per-sample Python loop is too slow for a Raspberry Pi)
+    def __init__(self, rate, freqs, n):
+        self.rate = rate
+        self.n = n
+        k = np.floor(0.5 + n * np.asarray(freqs, dtype=np.float64) / rate)
+        w = 2 * np.pi * k / n
+        self.kernel = np.exp(-1j * np.outer(w, np.arange(n))).astype(np.complex64)
+
+    def magnitudes(self, data):
+        return np.abs(self.kernel @ np.asarray(data, dtype=np.float32))
+
+
+class NoiseFloor:
+    # Per-bin noise estimate: a low percentile of each bin's last `depth` blocks,
+    # held in one (depth, bins) ring. Keyed CW sits in a bin at most ~60% of the
+    # time, so the 20th percentile stays on the noise even on the signal's own bin
+    # or with a signal at the band edge. The ring is re-partitioned every
+    # `update_every` blocks (np.partition along the block axis, no per-call lists).
+    def __init__(self, bins, depth=100, percentile=20, update_every=4, rayleigh=True):
+        self.ring = np.zeros((depth, bins), dtype=np.float32)
+        self.pos = 0
+        self.filled = 0
+        self.count = 0
+        self.percentile = percentile
+        self.update_every = update_every
+        # Scale the percentile of Rayleigh-distributed noise magnitudes up to their
+        # mean, so thresholds keep meaning "n times the average noise"
+        p = percentile / 100
+        self.scale = math.sqrt(math.pi / 2) / math.sqrt(-2 * math.log(1 - p)) if rayleigh else 1.0
+        self.floor = None
+
+    def update(self, values):
+        self.ring[self.pos] = values
+        self.pos = (self.pos + 1) % len(self.ring)
+        self.filled = min(self.filled + 1, len(self.ring))
+        self.count += 1
+        if self.floor is None or self.count % self.update_every == 0 or self.filled < len(self.ring):
+            k = (self.filled - 1) * self.percentile // 100
+            self.floor = np.partition(self.ring[:self.filled], k, axis=0)[k] * self.scale
+        return self.floor
+
+
+class CWDecoder:
+    def __init__(self, rate=48000, multiplier=4.0, farnsworth=False, freqs=TEST_FREQS):
+        self.rate = rate
+        self.multiplier = multiplier
+        self.farnsworth = farnsworth
+        self.freqs = np.asarray(freqs)
+        self.bank = None
+        self.debug = False
+        self.metrics = None         # qcx_metrics.Metrics, timed per stage when enabled
+
+        # Optional hooks (called from the audio thread)
+        self.on_char = None         # (char), " " for a word space
+        self.on_tone = None         # (tone_hz, snr_db) every block
+        self.on_symbol = None       # (dots and dashes so far, key_down)
+        self.on_timing = None       # (description of the last transition)
+        self.on_wpm = None          # (wpm) estimated from the element lengths
+
+        self.element_times = deque(maxlen=50)
+        self.noise = NoiseFloor(len(self.freqs))
+        self.reset()
+
+    def reset(self, now=None):
+        now = time.time() if now is None else now
+        self.key_down = False
+        self.last_transition = now
+        self.last_char_time = now
+        self.symbol = ""
+        self.tone_hz = 700
+        self.word_space_sent = True
+
+    def _emit(self, hook, *args):
+        if hook:
+            hook(*args)
+
+    def wpm(self):
+        if not self.element_times:
+            return 0
+        avg = statistics.median(self.element_times)
+        return 1.2 / avg if avg > 0 else 0
+
+    def decode_char(self):
+        if not self.symbol:
+            return None
+        m = self.metrics
+        t0 = m.clock() if m else 0.0
+        decoded_symbol = self.symbol
+        char = MORSE_DICT.get(decoded_symbol, '?')
+        if char == '?' and all(c == '.' for c in decoded_symbol):
+            if len(decoded_symbol) == 1:
+                char = 'E'
+            elif len(decoded_symbol) == 4:
+                char = 'H'
+            elif len(decoded_symbol) == 5:
+                char = '5'
+            if self.debug:
+                print(f"DEBUG: All-dot fallback - decoded: {char} (symbol: {decoded_symbol})")
+        self.symbol = ""
+        self._emit(self.on_char, char)
+        self._emit(self.on_symbol, "", False)
+        if m:
+            m.lap("decode", t0)
+        return char
+
+    def process(self, data, now=None):
+        # One block of int16/float samples; now = time at the end of the block
+        now = time.time() if now is None else now
+        m = self.metrics
+        start = m.clock() if m else 0.0
+        if self.bank is None or self.bank.n != len(data):
+            self.bank = GoertzelBank(self.rate, self.freqs, len(data))
+        mags = self.bank.magnitudes(data)
+        floor = self.noise.update(mags) + 1e-10
+        max_idx = int(np.argmax(mags / floor))
+        tone_freq = self.freqs[max_idx]
+        tone_mag = mags[max_idx]
+        avg_noise = floor[max_idx]
+
+        snr = 20 * math.log10((tone_mag + 1e-10) / avg_noise)
+        t0 = m.lap("dsp", start) if m else 0.0
+        self.tone_hz = tone_freq
+        self._emit(self.on_tone, tone_freq, snr)
+
+        open_thresh = avg_noise * self.multiplier
+        close_thresh = avg_noise * (self.multiplier * 0.875)
+        key_down = tone_mag > (close_thresh if self.key_down else open_thresh)
+
+        if key_down != self.key_down:
+            self._transition(key_down, now)
+
+        if not key_down and self.symbol:
+            char_space_threshold = max(0.02, statistics.median(self.element_times) * 0.6 if self.element_times else 0.02)
+            silence_time = now - self.last_char_time
+            if silence_time > char_space_threshold:
+                if self.debug:
+                    print(f"DEBUG: Inter-character space detected ({silence_time:.3f}s > {char_space_threshold:.3f}s) - decoding: {self.symbol}")
+                self.decode_char()
+            self.last_char_time = now
+            self._emit(self.on_timing, "char space")
+
+        if not key_down and (now - self.last_transition) > 0.5:
+            if self.symbol:
+                self.decode_char()
+            spacing = statistics.median(self.element_times) * 7 if self.element_times else 0.7
+            if self.farnsworth and self.element_times:
+                avg_wpm = 1.2 / statistics.median(self.element_times)
+                if avg_wpm < 18:
+                    spacing *= (18 / avg_wpm)
+            if not self.word_space_sent and (now - self.last_transition) > spacing:
+                # One space per gap, however long the gap is
+                self.word_space_sent = True
+                self._emit(self.on_char, " ")
+                self._emit(self.on_timing, "word space")
+
+        if self.element_times:
+            self._emit(self.on_wpm, self.wpm())
+
+        if m and start:
+            m.block(len(data) / self.rate, m.lap("keying", t0) - start)
+
+    def _transition(self, key_down, now):
+        duration = now - self.last_transition
+        if duration > 0.01:
+            self.element_times.append(duration)
+
+        if key_down:
+            self.word_space_sent = False
+            self._emit(self.on_symbol, self.symbol, True)
+            self._emit(self.on_timing, f"{duration:.3f}s [start]")
+        elif self.element_times:
+            avg_dot = statistics.median(self.element_times)
+            if duration < avg_dot * 1.5:
+                self.symbol += "."
+                self._emit(self.on_timing, f"{duration:.3f}s [dot]")
+            else:
+                self.symbol += "-"
+                self._emit(self.on_timing, f"{duration:.3f}s [dash]")
+            self._emit(self.on_symbol, self.symbol, False)
+            if len(self.symbol) > 5:
+                # No character is longer than this: decode what we have
+                self.decode_char()
+
+        self.key_down = key_down
+        self.last_transition = now
+        self.last_char_time = now
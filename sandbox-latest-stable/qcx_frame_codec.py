@@ -0,0 +1,104 @@
+# qcx_frame_codec.py
+# Compact spectrum/waterfall frames for streaming over slow links
+# Each frame is quantized to uint8 steps (0.5 dB for spectra, 0.1 S for waterfall
+# rows), subtracted from the previous quantized frame (mod 256, so successive
+# spectra that barely change become runs of zeros) and compressed with zlib at
+# level 1. Every keyframe_interval frames, and whenever the column count changes,
+# a keyframe is sent instead of a delta so a client that joins late or loses a
+# frame resynchronises within about a second.
+#
+#   header  <BHff  flags (1 = keyframe), frame number, value of step 0, step size
+#   payload zlib(uint8 deltas, or uint8 levels for a keyframe)
+#
+#   python qcx_frame_codec.py bench [bins] [frames]
+
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+HEADER = struct.Struct("<BHff")
+FLAG_KEY = 1
+
+# (lowest value, step) for the streams the app sends
+SPECTRUM_SCALE = (-127.5, 0.5)      # dB, peak-normalized spectra are <= 0
+WATERFALL_SCALE = (0.0, 0.1)        # S units
+
+
+class FrameEncoder:
+    def __init__(self, lo=SPECTRUM_SCALE[0], step=SPECTRUM_SCALE[1], keyframe_interval=20, level=1):
+        self.lo = lo
+        self.step = step
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.prev = None
+        self.number = 0
+
+    def encode(self, values):
+        levels = np.clip(np.rint((np.asarray(values, dtype=np.float32) - self.lo) / self.step), 0, 255).astype(np.uint8)
+        key = self.prev is None or len(levels) != len(self.prev) or self.number % self.keyframe_interval == 0
+        body = levels if key else levels - self.prev        # uint8 wraps around
+        self.prev = levels
+        out = HEADER.pack(FLAG_KEY if key else 0, self.number & 0xFFFF, self.lo, self.step) + zlib.compress(body.tobytes(), self.level)
+        self.number += 1
+        return out
+
+
+class FrameDecoder:
+    def __init__(self):
+        self.prev = None
+        self.number = None
+
+    def decode(self, data):
+        # float32 array, or None while waiting for a keyframe after a gap
+        flags, number, lo, step = HEADER.unpack_from(data)
+        body = np.frombuffer(zlib.decompress(data[HEADER.size:]), dtype=np.uint8)
+        if flags & FLAG_KEY:
+            levels = body
+        elif self.prev is not None and number == (self.number + 1) & 0xFFFF and len(body) == len(self.prev):
+            levels = self.prev + body
+        else:
+            self.prev = None
+            return None
+        self.prev = levels
+        self.number = number
+        return lo + levels.astype(np.float32) * step
+
+
+def _bench(bins=128, frames=500):
+    # Synthetic peak-normalized spectra: noise floor with a few drifting carriers
+    rng = np.random.default_rng(1)
+    x = np.arange(bins)
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    raw = packed = 0
+    encode_time = decode_time = 0.0
+    worst = 0.0
+    for i in range(frames):
+        spectrum = -60 + 3 * rng.standard_normal(bins)
+        for centre in (bins * 0.3 + i * 0.05, bins * 0.7):
+            spectrum = np.maximum(spectrum, -10 * np.abs(x - centre))
+        spectrum -= spectrum.max()
+        t0 = time.perf_counter()
+        data = encoder.encode(spectrum)
+        t1 = time.perf_counter()
+        values = decoder.decode(data)
+        t2 = time.perf_counter()
+        encode_time += t1 - t0
+        decode_time += t2 - t1
+        raw += bins * 4
+        packed += len(data)
+        worst = max(worst, float(np.max(np.abs(values - np.clip(spectrum, SPECTRUM_SCALE[0], None)))))
+    print(f"{frames} frames x {bins} bins: float32 {raw / frames:.0f} B/frame, codec {packed / frames:.0f} B/frame "
+          f"({raw / packed:.1f}x), max error {worst:.2f} dB")
+    print(f"encode {encode_time / frames * 1e6:.0f} us/frame, decode {decode_time / frames * 1e6:.0f} us/frame; "
+          f"at 20 fps {packed / frames * 20 / 1024:.1f} KB/s instead of {raw / frames * 20 / 1024:.1f} KB/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "bench":
+        print("usage: python qcx_frame_codec.py bench [bins] [frames]")
+        sys.exit(1)
+    _bench(*(int(a) for a in sys.argv[2:4]))
@@ -3,12 +3,34 @@
 # Now properly synced with main app data
 
 import tkinter as tk
-from tkinter import ttk
-import pyaudio
+from tkinter import ttk, messagebox
 import numpy as np
 from scipy.fft import fft
 import threading
 import time
+import qcx_audio_devices
+
+def compute_spectrum(data, rate, max_freq=3000, normalize=True):
+    # FFT magnitude in dB up to max_freq; normalized to 0 dB peak for display,
+    # or left absolute so different blocks can be compared (audio scanning)
+    n = len(data)
+    yf = fft(data)
+    mag = np.abs(yf[:n//2])
+    mag_db = 20 * np.log10(mag + 1e-10)
+    if normalize:
+        mag_db -= np.max(mag_db)
+    freqs = np.linspace(0, rate/2, n//2)
+    mask = freqs <= max_freq
+    return freqs[mask], mag_db[mask]
+
+def bin_powers(data, rate, lo=300, hi=2700, bin_hz=200):
+    # Mean power (dB) in bin_hz wide bins across the lo..hi audio passband
+    xf, mag_db = compute_spectrum(data, rate, max_freq=hi, normalize=False)
+    edges = np.arange(lo, hi + 1, bin_hz)
+    idx = np.searchsorted(xf, edges)
+    power = 10 ** (mag_db / 10)
+    # Averaged as power, not dB, so a narrow carrier isn't diluted by the quiet bins around it
+    return np.array([10 * np.log10(power[a:b].mean()) if b > a else -200.0 for a, b in zip(idx[:-1], idx[1:])])
 
 def open_graphs(main_app):
     win = tk.Toplevel(main_app.root)
@@ -31,28 +53,40 @@ def open_graphs(main_app):
     tk.Scale(calib_frame, from_=0, to=9, orient=tk.HORIZONTAL, variable=min_s, length=150).pack(side=tk.LEFT, padx=10)
     tk.Label(calib_frame, text="Max S:", fg="white", bg="#1a1a1a").pack(side=tk.LEFT)
     tk.Scale(calib_frame, from_=0, to=9, orient=tk.HORIZONTAL, variable=max_s, length=150).pack(side=tk.LEFT, padx=10)
+    tk.Button(calib_frame, text="BAND HEATMAP", command=lambda: open_heatmap(main_app),
+              bg="#00aaff", fg="white").pack(side=tk.LEFT, padx=10)
 
     # Audio Spectrum
     spec_frame = tk.LabelFrame(win, text="AUDIO SPECTRUM ANALYZER (Real-time from PC Microphone)", fg="cyan", bg="#1a1a1a")
     spec_frame.pack(pady=15, fill=tk.X, padx=20)
 
-    audio = pyaudio.PyAudio()
-    devices = []
-    for i in range(audio.get_device_count()):
-        info = audio.get_device_info_by_index(i)
-        if info['maxInputChannels'] > 0:
-            devices.append((info['name'], i))
+    devices = [d.name for d in qcx_audio_devices.input_devices()]
     device_var = tk.StringVar()
+    # Shared with the main window, so the recorder and audio scan use the same input
+    device_var.trace_add("write", lambda *args: setattr(main_app, "audio_input", device_var.get()))
     if devices:
-        device_var.set(devices[0][0])
+        device_var.set(main_app.audio_input if main_app.audio_input in devices else devices[0])
 
     ctrl_frame = tk.Frame(spec_frame, bg="#1a1a1a")
     ctrl_frame.pack(pady=5)
     tk.Label(ctrl_frame, text="Input Device:", fg="white", bg="#1a1a1a").pack(side=tk.LEFT)
-    if devices:
-        ttk.Combobox(ctrl_frame, textvariable=device_var, values=[n for n, i in devices], width=40, state="readonly").pack(side=tk.LEFT, padx=10)
-    else:
-        tk.Label(ctrl_frame, text="No input devices found!", fg="red", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
+    device_combo = ttk.Combobox(ctrl_frame, textvariable=device_var, values=devices, width=40, state="readonly")
+    device_combo.pack(side=tk.LEFT, padx=10)
+    no_devices_label = tk.Label(ctrl_frame, text="No input devices found!", fg="red", bg="#1a1a1a")
+    if not devices:
+        no_devices_label.pack(side=tk.LEFT, padx=10)
+
+    def refresh_devices():
+        names = [d.name for d in qcx_audio_devices.refresh() if d.inputs > 0]
+        device_combo.config(values=names)
+        if device_var.get() not in names:
+            device_var.set(names[0] if names else "")
+        if names:
+            no_devices_label.pack_forget()
+        else:
+            no_devices_label.pack(side=tk.LEFT, padx=10)
+
+    tk.Button(ctrl_frame, text="Refresh", command=refresh_devices, bg="#333333", fg="white").pack(side=tk.LEFT)
 
     spec_canvas = tk.Canvas(spec_frame, width=600, height=250, bg="#000000")
     spec_canvas.pack(pady=5)
@@ -74,27 +108,28 @@ def open_graphs(main_app):
         min_val = min_s.get()
         max_val = max_s.get() if max_s.get() > min_val else min_val + 1
 
+        # Wideband (audio) scan rows have many more columns than a plain scan
+        cols = max(len(row) for row in data)
+        col_w = min(pixel_size, wf_canvas.winfo_width() / cols)
         for row_idx, values in enumerate(reversed(data)):
             for col, s in enumerate(values):
                 norm = max(0, min(1, (s - min_val) / (max_val - min_val)))
                 colors = ["#000000", "#00008b", "#0000ff", "#00bfff", "#00ff00", "#7fff00", "#ffff00", "#ff7f00", "#ff0000", "#ff0000"]
                 color = colors[int(norm * 9)]
-                x0 = col * pixel_size
+                x0 = col * col_w
                 y0 = row_idx * row_h
-                wf_canvas.create_rectangle(x0, y0, x0 + pixel_size, y0 + row_h, fill=color, outline="")
+                wf_canvas.create_rectangle(x0, y0, x0 + col_w, y0 + row_h, fill=color, outline="")
 
-        if main_app.continuous_waterfall and hasattr(main_app, 'vfoa_label'):
-            current_text = main_app.vfoa_label.cget("text")
-            if "VFO A:" in current_text:
-                freq = current_text.split("VFO A:")[1].strip().split(" ")[0]
-                x = wf_canvas.winfo_width() // 2
-                y = wf_canvas.winfo_height() - 10
-                wf_canvas.create_text(x, y, text=f"Current: {freq} MHz", fill="yellow", font=("Arial", 10, "bold"))
+        if main_app.continuous_waterfall and main_app.radio_state.vfo_a is not None:
+            freq = main_app.radio_state.vfo_a / 1e6
+            x = wf_canvas.winfo_width() // 2
+            y = wf_canvas.winfo_height() - 10
+            wf_canvas.create_text(x, y, text=f"Current: {freq:.6f} MHz", fill="yellow", font=("Arial", 10, "bold"))
         elif main_app.scan_steps > 0:
             step = max(1, main_app.scan_steps // 10)
             for col in range(0, main_app.scan_steps, step):
                 freq = main_app.scan_center + (col - main_app.scan_steps // 2) * main_app.scan_step_khz / 1000
-                x = col * pixel_size + pixel_size / 2
+                x = col * col_w + col_w / 2
                 y = wf_canvas.winfo_height() - 10
                 wf_canvas.create_text(x, y, text=f"{freq:.3f}", fill="white", font=("Arial", 8))
 
@@ -110,30 +145,25 @@ def open_graphs(main_app):
     def spectrum_loop():
         nonlocal spectrum_active
         try:
-            name = device_var.get()
-            idx = next(i for n, i in devices if n == name)
-            stream = audio.open(format=pyaudio.paInt16, channels=1, rate=rate, input=True, input_device_index=idx, frames_per_buffer=chunk)
+            idx = qcx_audio_devices.find(device_var.get())
+            if idx is None:
+                raise OSError("No input device selected")
+            stream = qcx_audio_devices.open_input(idx, rate, chunk)
         except Exception as e:
-            win.after(0, lambda: messagebox.showerror("Audio Error", str(e)))
+            win.after(0, lambda err=e: messagebox.showerror("Audio Error", str(err)))
             return
 
         while spectrum_active:
             try:
                 data = np.frombuffer(stream.read(chunk, exception_on_overflow=False), dtype=np.int16)
-                yf = fft(data)
-                mag = np.abs(yf[:chunk//2])
-                mag_db = 20 * np.log10(mag + 1e-10)
-                mag_db -= np.max(mag_db)
-                freqs = np.linspace(0, rate/2, chunk//2)
-                mask = freqs <= 3000
-                xf = freqs[mask]
-                mag_db = mag_db[mask]
+                xf, mag_db = compute_spectrum(data, rate)
                 win.after(0, lambda x=xf, m=mag_db: draw_spectrum(x, m))
+                if main_app.api:
+                    main_app.api.publish_spectrum(mag_db, float(xf[0]), float(xf[1] - xf[0]))
                 time.sleep(0.05)
             except:
                 break
-        stream.stop_stream()
-        stream.close()
+        qcx_audio_devices.close(stream)
 
     def draw_spectrum(xf, mag_db):
         spec_canvas.delete("all")
@@ -169,4 +199,66 @@ def open_graphs(main_app):
             threading.Thread(target=spectrum_loop, daemon=True).start()
 
     btn = tk.Button(ctrl_frame, text="START SPECTRUM", command=toggle_spectrum, bg="#00ff88", fg="black", font=("Arial", 12, "bold"))
-    btn.pack(side=tk.LEFT, padx=20)
\ No newline at end of file
+    btn.pack(side=tk.LEFT, padx=20)
+
+HEAT_COLORS = ["#000000", "#00008b", "#0000ff", "#00bfff", "#00ff00", "#7fff00", "#ffff00", "#ff7f00", "#ff0000", "#ff0000"]
+
+def open_heatmap(main_app):
+    # Band occupancy by frequency and hour of day, from the pre-aggregated
+    # occupancy table (opens instantly regardless of how much history is stored)
+    import qcx_activity_db
+
+    win = tk.Toplevel(main_app.root)
+    win.title("Band Occupancy Heatmap")
+    win.geometry("800x420")
+    win.configure(bg="#1a1a1a")
+
+    ctrl = tk.Frame(win, bg="#1a1a1a")
+    ctrl.pack(pady=10)
+    tk.Label(ctrl, text="Band:", fg="white", bg="#1a1a1a").pack(side=tk.LEFT)
+    band_var = tk.StringVar(value=main_app.scan_band_var.get())
+    bands = [b for b, lo, hi in qcx_activity_db.BAND_EDGES]
+    combo = ttk.Combobox(ctrl, textvariable=band_var, values=bands, width=6, state="readonly")
+    combo.pack(side=tk.LEFT, padx=10)
+    info_label = tk.Label(ctrl, text="", fg="yellow", bg="#1a1a1a")
+    info_label.pack(side=tk.LEFT, padx=20)
+
+    width, row_h = 720, 12
+    canvas = tk.Canvas(win, width=width + 40, height=24 * row_h + 30, bg="#000000", highlightthickness=0)
+    canvas.pack(padx=20)
+    image = tk.PhotoImage(width=width, height=24)
+
+    def render(event=None):
+        band = band_var.get()
+        edges = {b: (lo, hi) for b, lo, hi in qcx_activity_db.BAND_EDGES}
+        if band not in edges:
+            return
+        lo, hi = edges[band]
+        rows = main_app.activity_db.occupancy(band)
+
+        # occupancy ratio per (hour, pixel column); a column keeps its busiest bin
+        heat = np.zeros((24, width))
+        total = 0
+        if rows:
+            data = np.array(rows, dtype=float)
+            cols = ((data[:, 0] - lo) / (hi - lo) * width).astype(int).clip(0, width - 1)
+            hours = data[:, 1].astype(int)
+            ratio = data[:, 3] / np.maximum(data[:, 2], 1)
+            np.maximum.at(heat, (hours, cols), ratio)
+            total = int(data[:, 2].sum())
+
+        levels = (heat * (len(HEAT_COLORS) - 1)).astype(int)
+        image.put(" ".join("{" + " ".join(HEAT_COLORS[v] for v in row) + "}" for row in levels), to=(0, 0))
+        canvas.delete("all")
+        canvas.image_ref = image.zoom(1, row_h)
+        canvas.create_image(30, 0, image=canvas.image_ref, anchor="nw")
+        for hour in range(0, 24, 3):
+            canvas.create_text(15, hour * row_h + row_h / 2, text=f"{hour:02d}", fill="white", font=("Arial", 8))
+        for i in range(5):
+            f = lo + (hi - lo) * i / 4
+            canvas.create_text(30 + width * i / 4, 24 * row_h + 15, text=f"{f / 1e6:.3f}", fill="white", font=("Arial", 8))
+        info_label.config(text=f"{total} samples ({len(rows)} bin/hour cells)")
+
+    combo.bind("<<ComboboxSelected>>", render)
+    tk.Button(ctrl, text="REFRESH", command=render, bg="#00ff88", fg="black").pack(side=tk.LEFT, padx=10)
+    render()
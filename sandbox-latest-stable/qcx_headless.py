@@ -0,0 +1,412 @@
+# qcx_headless.py
+# Headless station: CAT polling, scanning, CW decoding and logging without Tk
+# For a Raspberry Pi (or any box without a display) at a remote site. Everything
+# is configured from an INI file; the CAT connection runs on its own event loop
+# (qcx_cat_client.CATWorker) and the scheduler, scanner and decoder are worker
+# threads. Output goes to files in the output directory:
+#   decoded.txt  timestamped decoded text (TB buffer and audio decoder)
+#   smeter.csv   S-meter readings (time, frequency, S)
+#   spots.csv    callsigns recognized in the decoded text
+#   band_activity.db  scan / activity history (same database as the GUI)
+#
+#   python qcx_headless.py [qcx_headless.ini]
+# A default config file is written on first run.
+
+import configparser
+import csv
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import qcx_activity_db
+import qcx_auto_info
+import qcx_callsign
+import qcx_cat_client
+import qcx_cat_replay
+import qcx_logbook
+import qcx_metrics
+import qcx_poll_scheduler
+import qcx_radio_state
+import qcx_rigctld
+import qcx_scanner
+import qcx_ws_server
+
+DEFAULT_CONFIG = {
+    "cat": {
+        "port": "/dev/ttyUSB0",         # or replay:<trace file>[@speed]
+        "baud": "38400",
+        "poll_scale": "1.0",            # poll interval multiplier (higher = less CAT traffic)
+        "auto_info": "yes",
+    },
+    "scan": {
+        "mode": "off",                  # off, grid or memory
+        "center_mhz": "7.030",
+        "width_khz": "25",
+        "step_khz": "5",
+        "threshold": "3",
+        "dwell": "2.0",
+    },
+    "decoder": {
+        "enabled": "no",
+        "device": "",                   # input device name or index; empty = default
+        "rate": "48000",
+        "multiplier": "4.0",
+        "farnsworth": "no",
+        "metrics": "no",                # write decoder_metrics.prom (qcx_metrics) every 10 s
+    },
+    "api": {
+        "enabled": "no",                # WebSocket API (qcx_ws_server) for remote front-ends
+        "host": "127.0.0.1",
+        "port": "8765",
+    },
+    "rigctld": {
+        "enabled": "no",                # Hamlib NET rigctl bridge (qcx_rigctld) for WSJT-X, loggers
+        "host": "127.0.0.1",
+        "port": "4532",
+    },
+    "output": {
+        "dir": "qcx_output",
+        "flush_interval": "2.0",
+        "activity_db": "band_activity.db",
+        "decoded": "decoded.txt",
+        "smeter": "smeter.csv",
+        "spots": "spots.csv",
+        "logbook": "qsl_log.csv",
+        "log": "qcx_headless.log",
+    },
+}
+
+log = logging.getLogger("qcx_headless")
+
+
+def load_config(path):
+    config = configparser.ConfigParser()
+    config.read_dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        config.read(path)
+    else:
+        with open(path, "w") as f:
+            config.write(f)
+        print(f"Wrote default config to {path}")
+    return config
+
+
+def utc_stamp(ts=None):
+    return datetime.fromtimestamp(ts or time.time(), timezone.utc).strftime("%Y-%m-%d %H:%M:%SZ")
+
+
+class OutputFiles:
+    # Buffers decoded text, S-meter rows and spots in memory and appends them to
+    # their files every flush_interval, so the SD card sees a few writes a minute
+    def __init__(self, out_dir, names, flush_interval=2.0):
+        os.makedirs(out_dir, exist_ok=True)
+        self.paths = {key: os.path.join(out_dir, names[key]) for key in ("decoded", "smeter", "spots")}
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.text = {}          # source -> [freq_hz, started, text] for the line in progress
+        self.lines = []         # finished decoded lines
+        self.smeter = []
+        self.spots = []
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def add_text(self, source, freq_hz, text):
+        with self.lock:
+            entry = self.text.get(source)
+            if entry is None or entry[0] != freq_hz:
+                if entry:
+                    self._end_line(source)
+                entry = self.text[source] = [freq_hz, time.time(), ""]
+            entry[2] += text
+
+    def add_smeter(self, freq_hz, s_val):
+        with self.lock:
+            self.smeter.append((round(time.time(), 2), freq_hz or "", s_val))
+
+    def add_spot(self, freq_hz, event):
+        flags = ",".join(f for f in ("worked", "dupe", "needed") if getattr(event, f)) or "new"
+        with self.lock:
+            self.spots.append((utc_stamp(), event.call, freq_hz or "", event.context, event.entity or "", flags))
+
+    def _end_line(self, source):
+        # Caller holds the lock; finished lines are kept until the next flush
+        freq_hz, started, text = self.text.pop(source)
+        if text.strip():
+            freq = f"{freq_hz / 1e6:.6f}" if freq_hz else "?"
+            self.lines.append(f"{utc_stamp(started)}  {freq}  {source:<5} {' '.join(text.split())}\n")
+
+    def flush(self):
+        with self.lock:
+            for source in list(self.text):
+                self._end_line(source)
+            lines, self.lines = self.lines, []
+            smeter, self.smeter = self.smeter, []
+            spots, self.spots = self.spots, []
+        if lines:
+            with open(self.paths["decoded"], "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        self._append_csv(self.paths["smeter"], ["Time", "Frequency", "S"], smeter)
+        self._append_csv(self.paths["spots"], ["DateTime", "Callsign", "Frequency", "Context", "Entity", "Flags"], spots)
+
+    def _append_csv(self, path, header, rows):
+        if not rows:
+            return
+        new = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(header)
+            writer.writerows(rows)
+
+    def _loop(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                log.error("Output write failed: %s", e)
+
+
+class HeadlessStation:
+    def __init__(self, config):
+        self.config = config
+        out = config["output"]
+        self.out_dir = out["dir"]
+        self.files = OutputFiles(self.out_dir, out, out.getfloat("flush_interval"))
+        self.activity_db = qcx_activity_db.ActivityDB(os.path.join(self.out_dir, out["activity_db"]))
+        self.logbook = qcx_logbook.Logbook(os.path.join(self.out_dir, out["logbook"]))
+        self.recognizers = {}   # source -> CallsignRecognizer, so TB and audio text don't interleave
+        self.state = qcx_radio_state.RadioState()
+        self.state.subscribe(self.on_state_change)
+        self.cat = None
+        self.scheduler = None
+        self.auto_info = None
+        self.scan_engine = None
+        self.api = None
+        self.rigctld = None
+        self.running = False
+        self.activity_detected = False
+        self.threads = []
+
+    # ---- lifecycle ----
+
+    def start(self):
+        cat_cfg = self.config["cat"]
+        port = cat_cfg["port"]
+        replay = qcx_cat_replay.parse_port(port)
+        self.cat = qcx_cat_replay.open_replay(*replay) if replay else qcx_cat_client.open_serial(port, cat_cfg.getint("baud"))
+        log.info("CAT connected on %s", port)
+        self.cat.send_cmd('QU1')
+        self.cat.send_cmd('TB1')
+        self.scheduler = qcx_poll_scheduler.PollScheduler(self.cat, self.state)
+        self.scheduler.set_scale(cat_cfg.getfloat("poll_scale"))
+        self.scheduler.start()
+        if cat_cfg.getboolean("auto_info"):
+            self.auto_info = qcx_auto_info.AutoInfoReader(self.cat, self.state, self.scheduler)
+            if self.auto_info.start():
+                log.info("Auto-information push mode active")
+            else:
+                self.auto_info = None
+
+        api_cfg = self.config["api"]
+        if api_cfg.getboolean("enabled"):
+            self.api = qcx_ws_server.APIServer(self.state, api_cfg["host"], api_cfg.getint("port"))
+            self.api.start()
+            self.api.attach(self.cat, self.scheduler)
+            log.info("Network API on ws://%s:%s", api_cfg["host"], self.api.port)
+        rig_cfg = self.config["rigctld"]
+        if rig_cfg.getboolean("enabled"):
+            self.rigctld = qcx_rigctld.RigctlBridge(self.state, rig_cfg["host"], rig_cfg.getint("port"))
+            self.rigctld.start()
+            self.rigctld.attach(self.cat, self.scheduler)
+            log.info("rigctld bridge on %s:%s", rig_cfg["host"], self.rigctld.port)
+
+        self.files.start()
+        self.running = True
+        mode = self.config["scan"]["mode"].strip().lower()
+        if mode in ("grid", "memory"):
+            self._spawn(self.scan_loop, mode)
+        if self.config["decoder"].getboolean("enabled"):
+            self._spawn(self.decoder_loop)
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=self._guard, args=(target,) + args, name=target.__name__, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _guard(self, target, *args):
+        try:
+            target(*args)
+        except Exception:
+            log.exception("%s stopped", target.__name__)
+
+    def stop(self):
+        self.running = False
+        if self.scan_engine:
+            self.scan_engine.stop()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        if self.api:
+            self.api.stop()
+        if self.rigctld:
+            self.rigctld.stop()
+        if self.auto_info:
+            self.auto_info.stop()
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.cat:
+            self.cat.close()
+        self.files.stop()
+        self.activity_db.close()
+        self.logbook.close()
+        log.info("Stopped")
+
+    # ---- radio state ----
+
+    def on_state_change(self, field, value):
+        freq_hz = self.state.vfo_a
+        if field == 's_meter':
+            self.files.add_smeter(freq_hz, value)
+        elif field == 'tb_text':
+            if freq_hz:
+                self.activity_db.add(freq_hz, self.state.s_meter, text=value)
+            self.on_decoded_text(value)
+            self.activity_detected = True
+
+    def on_decoded_text(self, text, source="TB"):
+        freq_hz = self.state.vfo_a
+        self.files.add_text(source, freq_hz, text)
+        if self.api:
+            self.api.publish_decode(text, source)
+        band = qcx_activity_db.band_for(freq_hz) if freq_hz else None
+        recognizer = self.recognizers.get(source)
+        if recognizer is None:
+            recognizer = self.recognizers[source] = qcx_callsign.CallsignRecognizer(self.logbook)
+        for event in recognizer.feed(text, band):
+            self.files.add_spot(freq_hz, event)
+            log.info("Spot %s %s", event.call, event)
+
+    # ---- scanner ----
+
+    def scan_loop(self, mode):
+        cfg = self.config["scan"]
+        engine = qcx_scanner.ScanEngine(self.cat, self.state, threshold=cfg.getint("threshold"),
+                                        active_dwell=cfg.getfloat("dwell"))
+        engine.on_step = lambda freq_hz: setattr(self, "activity_detected", False)
+        engine.on_activity = lambda freq_hz, s_val, text: log.info("Activity %.6f MHz S%s %s", freq_hz / 1e6, s_val, text)
+        engine.on_sample = self.activity_db.add
+        engine.activity_hook = lambda: self.activity_detected
+        engine.running = True
+        self.scan_engine = engine
+        center = cfg.getfloat("center_mhz")
+
+        if mode == "memory":
+            memory = qcx_scanner.MemoryScanner(engine)
+            memory.load_presets()
+            memory.load_user_channels()
+            memory.load_recent_activity(self.activity_db, qcx_activity_db.band_for(center * 1e6))
+            if not memory.channels:
+                log.error("Memory scan: no channels (add some to memory_channels.csv)")
+                return
+            log.info("Memory scan over %d channels", len(memory.channels))
+            while self.running and engine.running:
+                row = memory.cycle()
+                if self.api and row:
+                    self.api.publish_waterfall(row, min(memory.channels), 0.0)
+        else:
+            grid = qcx_scanner.scan_grid(center, cfg.getfloat("width_khz"), cfg.getfloat("step_khz"))
+            log.info("Grid scan %.3f MHz +/- %s kHz, %d steps", center, cfg["width_khz"], len(grid))
+            step_hz = cfg.getfloat("step_khz") * 1000
+            while self.running and engine.running:
+                row = engine.sweep(grid)
+                if self.api and row:
+                    self.api.publish_waterfall(row, grid[0], step_hz)
+
+    # ---- audio decoder ----
+
+    def decoder_loop(self):
+        import numpy as np
+        import qcx_audio_devices
+        import qcx_cw_engine
+
+        cfg = self.config["decoder"]
+        rate = cfg.getint("rate")
+        device = cfg["device"].strip()
+        if device.isdigit():
+            index = int(device)
+        elif device:
+            index = qcx_audio_devices.find(device)
+            if index is None:
+                log.error("Audio device %r not found; inputs: %s", device,
+                          [d.name for d in qcx_audio_devices.input_devices()])
+                return
+        else:
+            index = None
+
+        decoder = qcx_cw_engine.CWDecoder(rate, cfg.getfloat("multiplier"), cfg.getboolean("farnsworth"))
+        decoder.on_char = lambda char: self.on_decoded_text(char, "AUDIO")
+        metrics = decoder.metrics = qcx_metrics.Metrics(enabled=cfg.getboolean("metrics"))
+        metrics_path = os.path.join(self.out_dir, "decoder_metrics.prom")
+        next_dump = time.time() + 10
+        chunk = 1024
+        stream = qcx_audio_devices.open_input(index, rate, chunk)
+        log.info("Audio decoder running (device %s, %d Hz)", device or "default", rate)
+        try:
+            while self.running:
+                t0 = metrics.clock()
+                raw = stream.read(chunk, exception_on_overflow=False)
+                metrics.lap("capture", t0)
+                decoder.process(np.frombuffer(raw, dtype=np.int16).astype(np.float32))
+                if metrics.enabled and time.time() >= next_dump:
+                    # Written whole and renamed, for the node_exporter textfile collector
+                    with open(metrics_path + ".tmp", "w") as f:
+                        f.write(metrics.prometheus())
+                    os.replace(metrics_path + ".tmp", metrics_path)
+                    next_dump = time.time() + 10
+        finally:
+            qcx_audio_devices.close(stream)
+
+    # ---- main ----
+
+    def run(self):
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *args: stop.set())
+        try:
+            self.start()
+        except Exception as e:
+            log.error("Start failed: %s", e)
+            self.stop()
+            return 1
+        while not stop.wait(60):
+            log.info("Alive: %s", {k: v for k, v in self.state.snapshot().items() if k != 'tb_text'})
+        self.stop()
+        return 0
+
+
+def main(argv):
+    config = load_config(argv[1] if len(argv) > 1 else "qcx_headless.ini")
+    out = config["output"]
+    os.makedirs(out["dir"], exist_ok=True)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s",
+                        handlers=[logging.FileHandler(os.path.join(out["dir"], out["log"])), logging.StreamHandler()])
+    return HeadlessStation(config).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
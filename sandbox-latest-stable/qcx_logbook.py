@@ -0,0 +1,206 @@
+# qcx_logbook.py
+# Append-only QSO logbook with a persistent index
+# The log stays the same qsl_log.csv the QSL window always wrote, but the file is
+# kept open for appends and every record's byte offset, callsign, band and date go
+# to a sidecar index (qsl_log.csv.idx). On start only the index is read (plus any
+# records appended since), so worked-before / dupe checks are dict lookups, the
+# last N entries are read by seeking straight to their offsets, and ADIF/Cabrillo
+# exports stream the file without loading it.
+
+import csv
+import io
+import os
+import threading
+from collections import defaultdict
+
+from qcx_activity_db import band_for
+
+FIELDS = ["DateTime", "Callsign", "Frequency", "Mode", "RST Sent", "RST Received"]
+
+
+def _band(freq_mhz):
+    try:
+        return band_for(float(freq_mhz) * 1e6)
+    except ValueError:
+        return "?"
+
+
+class Logbook:
+    def __init__(self, path="qsl_log.csv"):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.lock = threading.Lock()
+        self.offsets = []                       # record offsets in file order
+        self.by_call = defaultdict(list)        # CALL -> [offset]
+        self.by_band = defaultdict(list)        # band -> [offset]
+        self.by_date = defaultdict(list)        # YYYY-MM-DD -> [offset]
+        self.worked = set()                     # (CALL, band, mode)
+        self.indexed_to = 0                     # file size covered by the index
+        self._load_index()
+        self._catch_up()
+        self.file = open(self.path, "ab")
+        self.index_file = open(self.index_path, "a", encoding="utf-8")
+
+    # ---- index ----
+
+    def _add_to_index(self, offset, call, band, date, mode):
+        call = call.upper()
+        self.offsets.append(offset)
+        self.by_call[call].append(offset)
+        self.by_band[band].append(offset)
+        self.by_date[date].append(offset)
+        self.worked.add((call, band, mode.upper()))
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 6:
+                    continue
+                offset, end, call, band, date, mode = parts
+                self._add_to_index(int(offset), call, band, date, mode)
+                self.indexed_to = int(end)
+
+    def _catch_up(self):
+        # Index records written by older versions or other tools since the last run
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size < self.indexed_to:
+            # Log was replaced: start the index over
+            self._reset_index()
+            open(self.index_path, "w").close()
+        if size == self.indexed_to:
+            return
+        with open(self.path, "rb") as f, open(self.index_path, "a", encoding="utf-8") as idx:
+            f.seek(self.indexed_to)
+            offset = self.indexed_to
+            for raw in iter(f.readline, b""):
+                end = offset + len(raw)
+                row = next(csv.reader([raw.decode("utf-8", errors="replace")]), [])
+                if len(row) >= 4 and row[0] != "DateTime":
+                    entry = dict(zip(FIELDS, row))
+                    self._index_entry(idx, offset, end, entry)
+                offset = end
+            self.indexed_to = offset
+
+    def _reset_index(self):
+        self.offsets.clear()
+        self.by_call.clear()
+        self.by_band.clear()
+        self.by_date.clear()
+        self.worked.clear()
+        self.indexed_to = 0
+
+    def _index_entry(self, idx, offset, end, entry):
+        call = entry["Callsign"].strip().upper()
+        band = _band(entry["Frequency"])
+        date = entry["DateTime"][:10]
+        mode = entry.get("Mode", "") or ""
+        self._add_to_index(offset, call, band, date, mode)
+        idx.write(f"{offset}\t{end}\t{call}\t{band}\t{date}\t{mode.upper()}\n")
+
+    # ---- writing ----
+
+    def append(self, entry):
+        # entry: dict with the FIELDS keys; returns True if it was already worked
+        # on this band and mode
+        dupe = self.is_dupe(entry["Callsign"], _band(entry["Frequency"]), entry.get("Mode", ""))
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        with self.lock:
+            if self.file.tell() == 0:
+                writer.writerow(FIELDS)
+            writer.writerow([entry.get(k, "") for k in FIELDS])
+            data = buf.getvalue().encode("utf-8")
+            offset = self.file.tell()
+            if offset == 0:
+                header_len = data.index(b"\n") + 1
+                offset, data_end = header_len, len(data)
+            else:
+                data_end = offset + len(data)
+            self.file.write(data)
+            self.file.flush()
+            self._index_entry(self.index_file, offset, data_end, entry)
+            self.index_file.flush()
+            self.indexed_to = data_end
+        return dupe
+
+    def close(self):
+        self.file.close()
+        self.index_file.close()
+
+    # ---- lookups ----
+
+    def worked_before(self, call):
+        return call.strip().upper() in self.by_call
+
+    def is_dupe(self, call, band, mode="CW"):
+        return (call.strip().upper(), band, (mode or "").upper()) in self.worked
+
+    def count(self):
+        return len(self.offsets)
+
+    def _read_at(self, offsets):
+        rows = []
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                row = next(csv.reader([f.readline().decode("utf-8", errors="replace")]), [])
+                rows.append(dict(zip(FIELDS, row)))
+        return rows
+
+    def tail(self, n=10):
+        return self._read_at(self.offsets[-n:])
+
+    def lookup(self, call):
+        return self._read_at(self.by_call.get(call.strip().upper(), []))
+
+    # ---- export ----
+
+    def iter_entries(self):
+        # Streams the whole log in file order
+        with open(self.path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield row
+
+    def export_adif(self, out_path):
+        count = 0
+        with open(out_path, "w", encoding="utf-8") as out:
+            out.write("QCX ULTIMATE QSO log export\n<ADIF_VER:5>3.1.4\n<PROGRAMID:12>QCX-ULTIMATE\n<EOH>\n")
+            for e in self.iter_entries():
+                dt = e.get("DateTime", "")
+                fields = {
+                    "CALL": e.get("Callsign", "").upper(),
+                    "QSO_DATE": dt[:10].replace("-", ""),
+                    "TIME_ON": dt[11:19].replace(":", ""),
+                    "FREQ": e.get("Frequency", ""),
+                    "BAND": _band(e.get("Frequency", "0")).upper(),
+                    "MODE": e.get("Mode", "").upper(),
+                    "RST_SENT": e.get("RST Sent", ""),
+                    "RST_RCVD": e.get("RST Received", ""),
+                }
+                out.write("".join(f"<{k}:{len(v)}>{v} " for k, v in fields.items() if v) + "<EOR>\n")
+                count += 1
+        return count
+
+    def export_cabrillo(self, out_path, mycall, contest="DX"):
+        count = 0
+        with open(out_path, "w", encoding="utf-8") as out:
+            out.write(f"START-OF-LOG: 3.0\nCALLSIGN: {mycall}\nCONTEST: {contest}\nCREATED-BY: QCX-ULTIMATE\n")
+            for e in self.iter_entries():
+                try:
+                    khz = int(float(e.get("Frequency", "0")) * 1000)
+                except ValueError:
+                    khz = 0
+                dt = e.get("DateTime", "")
+                mode = e.get("Mode", "CW").upper()
+                mode = mode if mode in ("CW", "PH", "FM", "RY", "DG") else "DG"
+                out.write(f"QSO: {khz:5d} {mode} {dt[:10]} {dt[11:16].replace(':', '')} "
+                          f"{mycall:<13} {e.get('RST Sent', ''):<3} "
+                          f"{e.get('Callsign', '').upper():<13} {e.get('RST Received', ''):<3}\n")
+                count += 1
+            out.write("END-OF-LOG:\n")
+        return count
@@ -0,0 +1,187 @@
+# qcx_metrics.py
+# Per-stage latency metrics for the audio decoder pipeline
+# Stages are timed with perf_counter and kept as counters plus a fixed-bucket
+# histogram each (no per-sample lists), so an enabled Metrics costs a few hundred
+# nanoseconds per stage per block. When disabled, clock() returns 0 and lap()
+# returns at once, so the hooks can stay in the audio loop permanently.
+#
+#   capture   waiting in stream.read (or the file source) for the next block
+#   dsp       Goertzel bank + noise floor
+#   keying    threshold, dot/dash classification and spacing (includes decode)
+#   decode    symbol -> character lookup and the character callback
+#   ui        delay between scheduling a Tk update (win.after) and it running
+#
+# Real-time factor = busy time (everything but capture and ui) / audio duration;
+# an overrun is a block whose busy time exceeded its own duration.
+# prometheus() gives the text exposition format, snapshot() a JSON-able dict.
+
+import bisect
+import json
+import time
+
+# Upper bounds in seconds (10 us .. 50 ms, then everything slower)
+BUCKETS = (10e-6, 20e-6, 50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, float("inf"))
+STAGES = ("capture", "dsp", "keying", "decode", "ui")
+BUSY_STAGES = ("dsp", "keying")
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th sample
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound if bound != float("inf") else self.max
+        return self.max
+
+
+class Metrics:
+    def __init__(self, prefix="qcx_decoder", enabled=False):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.stages = {name: StageStats() for name in STAGES}
+        self.audio_seconds = 0.0
+        self.blocks = 0
+        self.overruns = 0
+        self.started = time.time()
+
+    def clock(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, stage, t0):
+        # Records now - t0 under stage and returns now, for chaining stages
+        if not self.enabled or not t0:
+            return 0.0
+        now = time.perf_counter()
+        self.stages[stage].add(now - t0)
+        return now
+
+    def block(self, audio_seconds, busy_seconds):
+        # One processed block: audio duration and the time spent on it
+        if not self.enabled:
+            return
+        self.blocks += 1
+        self.audio_seconds += audio_seconds
+        if busy_seconds > audio_seconds:
+            self.overruns += 1
+
+    def wrap_ui(self, schedule):
+        # Wraps a Tk after()-style function so each callback records its dispatch delay
+        def timed(delay, callback):
+            if not self.enabled:
+                return schedule(delay, callback)
+            t0 = time.perf_counter()
+
+            def run():
+                self.lap("ui", t0)
+                callback()
+            return schedule(delay, run)
+        return timed
+
+    def rtf(self):
+        busy = sum(self.stages[name].total for name in BUSY_STAGES)
+        return busy / self.audio_seconds if self.audio_seconds else 0.0
+
+    def snapshot(self):
+        return {
+            "enabled": self.enabled,
+            "uptime": time.time() - self.started,
+            "blocks": self.blocks,
+            "audio_seconds": self.audio_seconds,
+            "overruns": self.overruns,
+            "rtf": self.rtf(),
+            "stages": {name: {"count": s.count, "total": s.total, "mean": s.total / s.count if s.count else 0.0,
+                              "p50": s.quantile(0.5), "p95": s.quantile(0.95), "max": s.max}
+                       for name, s in self.stages.items()},
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def prometheus(self):
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_seconds Time per block spent in each decoder stage",
+                 f"# TYPE {p}_stage_seconds histogram"]
+        for name, s in self.stages.items():
+            cumulative = 0
+            for bound, n in zip(BUCKETS, s.buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {s.total:.9f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {s.count}')
+        lines += [f"# TYPE {p}_audio_seconds_total counter", f"{p}_audio_seconds_total {self.audio_seconds:.3f}",
+                  f"# TYPE {p}_blocks_total counter", f"{p}_blocks_total {self.blocks}",
+                  f"# TYPE {p}_overruns_total counter", f"{p}_overruns_total {self.overruns}",
+                  f"# TYPE {p}_realtime_factor gauge", f"{p}_realtime_factor {self.rtf():.6f}"]
+        return "\n".join(lines) + "\n"
+
+    def format(self):
+        # Plain-text table for the metrics panel and the console
+        out = [f"{'stage':<8} {'count':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}"]
+        for name, s in self.stages.items():
+            mean = s.total / s.count if s.count else 0.0
+            out.append(f"{name:<8} {s.count:>8} " + " ".join(f"{v * 1e6:>7.0f}us" for v in
+                                                           (mean, s.quantile(0.5), s.quantile(0.95), s.max)))
+        out.append(f"RTF {self.rtf():.4f}   blocks {self.blocks}   overruns {self.overruns}   audio {self.audio_seconds:.1f} s")
+        return "\n".join(out)
+
+
+def open_metrics_panel(parent, metrics, title="Decoder Metrics"):
+    # Small Tk window refreshed twice a second; the checkbox switches collection
+    import tkinter as tk
+    from tkinter import filedialog
+
+    win = tk.Toplevel(parent)
+    win.title(title)
+    win.configure(bg="#1a1a1a")
+    enabled_var = tk.BooleanVar(value=metrics.enabled)
+
+    def toggle():
+        metrics.enabled = enabled_var.get()
+
+    bar = tk.Frame(win, bg="#1a1a1a")
+    bar.pack(fill=tk.X, padx=10, pady=5)
+    tk.Checkbutton(bar, text="Collect", variable=enabled_var, command=toggle,
+                   bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT)
+    tk.Button(bar, text="Reset", command=metrics.reset, bg="#333333", fg="white").pack(side=tk.LEFT, padx=5)
+
+    def save():
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom")])
+        if path:
+            with open(path, "w") as f:
+                f.write(metrics.prometheus() if path.endswith(".prom") else metrics.to_json())
+
+    tk.Button(bar, text="Save...", command=save, bg="#333333", fg="white").pack(side=tk.LEFT)
+    label = tk.Label(win, font=("Courier", 11), fg="#00ff00", bg="#000000", justify=tk.LEFT, anchor="w")
+    label.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+    def update():
+        if not win.winfo_exists():
+            return
+        label.config(text=metrics.format())
+        win.after(500, update)
+
+    update()
+    return win
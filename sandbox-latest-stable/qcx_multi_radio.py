@@ -0,0 +1,421 @@
+# qcx_multi_radio.py
+# Several QCX/QMX radios from one process
+# Each RadioSession owns its own CAT worker (one event-loop thread per serial port),
+# poll scheduler and RadioState, so a slow or busy radio never holds up the others
+# and every radio gets its full serial budget. RadioManager keeps the sessions and
+# a combined snapshot for the dashboard. CoordinatedScan splits a channel plan
+# across the radios that cover each band (least-loaded first), runs one
+# ScanEngine thread per radio and merges their readings into one waterfall row,
+# so a sweep takes roughly 1/N of the time with N radios.
+#
+# Radios can be listed in an INI file, one section per radio:
+#   [radio:40m]
+#   port = /dev/ttyUSB0        (or replay:<trace file>[@speed])
+#   device = QMX
+#   variant = Low
+#
+#   python qcx_multi_radio.py radios.ini [center_mhz width_khz step_khz]
+# prints the radios' state, or runs a coordinated scan and prints merged rows.
+
+import configparser
+import sys
+import threading
+import time
+
+import qcx_activity_db
+import qcx_auto_info
+import qcx_cat_client
+import qcx_cat_replay
+import qcx_poll_scheduler
+import qcx_radio_state
+import qcx_scanner
+
+ALL_BANDS = [band for band, lo, hi in qcx_activity_db.BAND_EDGES]
+QMX_BANDS = {
+    "Low": ["80m", "60m", "40m", "30m", "20m"],
+    "Mid": ["60m", "40m", "30m", "20m", "17m", "15m"],
+    "High": ["20m", "17m", "15m", "12m", "11m", "10m"],
+}
+
+
+def device_bands(device, variant="Low"):
+    # Bands a radio model can tune; QCX and QMX+ cover everything we list
+    if device == "QMX":
+        return list(QMX_BANDS.get(variant, ALL_BANDS))
+    return list(ALL_BANDS)
+
+
+class RadioSession:
+    def __init__(self, name, port, baud=38400, device="QCX", variant="Low", poll_scale=1.0, auto_info=True):
+        self.name = name
+        self.port = port
+        self.baud = baud
+        self.device = device
+        self.bands = device_bands(device, variant)
+        self.poll_scale = poll_scale
+        self.use_auto_info = auto_info
+        self.state = qcx_radio_state.RadioState()
+        self.cat = None
+        self.scheduler = None
+        self.auto_info = None
+        self.error = None
+
+    @property
+    def connected(self):
+        return self.cat is not None
+
+    def covers(self, freq_hz):
+        return qcx_activity_db.band_for(freq_hz) in self.bands
+
+    def start(self):
+        replay = qcx_cat_replay.parse_port(self.port)
+        try:
+            self.cat = qcx_cat_replay.open_replay(*replay) if replay else qcx_cat_client.open_serial(self.port, self.baud)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        self.error = None
+        self.cat.send_cmd('QU1')
+        self.cat.send_cmd('TB1')
+        self.scheduler = qcx_poll_scheduler.PollScheduler(self.cat, self.state)
+        self.scheduler.set_scale(self.poll_scale)
+        self.scheduler.start()
+        if self.use_auto_info:
+            self.auto_info = qcx_auto_info.AutoInfoReader(self.cat, self.state, self.scheduler)
+            if not self.auto_info.start():
+                self.auto_info = None
+
+    def stop(self):
+        if self.auto_info:
+            self.auto_info.stop()
+            self.auto_info = None
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler = None
+        if self.cat:
+            self.cat.close()
+            self.cat = None
+
+    def summary(self):
+        values = self.state.snapshot()
+        age = self.state.age('vfo_a')
+        return {"name": self.name, "port": self.port, "device": self.device, "connected": self.connected,
+                "error": self.error, "vfo_a": values['vfo_a'], "s_meter": values['s_meter'],
+                "tx": bool(values['tx']), "split": values['split'], "age": age}
+
+
+class RadioManager:
+    def __init__(self):
+        self.sessions = {}          # name -> RadioSession, in the order they were added
+        self.lock = threading.Lock()
+
+    def add(self, session):
+        with self.lock:
+            if session.name in self.sessions:
+                raise ValueError(f"radio {session.name!r} already exists")
+            self.sessions[session.name] = session
+        return session
+
+    def remove(self, name):
+        with self.lock:
+            session = self.sessions.pop(name, None)
+        if session:
+            session.stop()
+
+    def connected(self):
+        with self.lock:
+            return [s for s in self.sessions.values() if s.connected]
+
+    def start_all(self):
+        # Returns {name: error} for the radios that failed to connect
+        failed = {}
+        for session in list(self.sessions.values()):
+            if session.connected:
+                continue
+            try:
+                session.start()
+            except Exception as e:
+                failed[session.name] = str(e)
+        return failed
+
+    def stop_all(self):
+        for session in list(self.sessions.values()):
+            session.stop()
+
+    def dashboard(self):
+        with self.lock:
+            return [s.summary() for s in self.sessions.values()]
+
+    def load(self, path):
+        config = configparser.ConfigParser()
+        if not config.read(path):
+            raise FileNotFoundError(path)
+        for section in config.sections():
+            if not section.startswith("radio:"):
+                continue
+            cfg = config[section]
+            self.add(RadioSession(section[len("radio:"):], cfg["port"], cfg.getint("baud", 38400),
+                                  cfg.get("device", "QCX"), cfg.get("variant", "Low"),
+                                  cfg.getfloat("poll_scale", 1.0), cfg.getboolean("auto_info", True)))
+        return self
+
+
+def split_plan(freqs_hz, sessions):
+    # {session name: [freqs]}, each channel going to the least-loaded radio that
+    # covers it; channels no radio can tune are left out
+    shares = {s.name: [] for s in sessions}
+    for freq_hz in freqs_hz:
+        able = [s for s in sessions if s.covers(freq_hz)]
+        if able:
+            shares[min(able, key=lambda s: len(shares[s.name])).name].append(freq_hz)
+    return shares
+
+
+class CoordinatedScan:
+    def __init__(self, manager, freqs_hz, threshold=3, active_dwell=2.0):
+        self.manager = manager
+        self.freqs = list(freqs_hz)
+        self.threshold = threshold
+        self.active_dwell = active_dwell
+        self.latest = dict.fromkeys(self.freqs, 0)
+        self.owner = {}             # freq -> session name scanning it
+        self.engines = {}
+        self.threads = []
+        self.lock = threading.Lock()
+        self.passed = set()         # sessions that finished a sweep since the last merged row
+        self.fresh = False          # any of those sweeps measured something
+        self.running = False
+
+        # Optional hooks (called from the scan threads)
+        self.on_row = None          # (row of S-values in plan order, freqs) once every radio finishes a sweep
+        self.on_sample = None       # (freq_hz, s_val, audio_db, text), e.g. ActivityDB.add
+        self.on_activity = None     # (session name, freq_hz, s_val, text)
+
+    def start(self):
+        sessions = self.manager.connected()
+        if not sessions:
+            raise RuntimeError("no radios connected")
+        shares = split_plan(self.freqs, sessions)
+        self.running = True
+        for session in sessions:
+            share = shares[session.name]
+            if not share:
+                continue
+            for freq_hz in share:
+                self.owner[freq_hz] = session.name
+            engine = qcx_scanner.ScanEngine(session.cat, session.state, threshold=self.threshold,
+                                            active_dwell=self.active_dwell)
+            engine.on_sample = self._sample
+            engine.on_activity = lambda f, s, t, name=session.name: self._activity(name, f, s, t)
+            engine.running = True
+            self.engines[session.name] = engine
+        # Every engine is registered before any thread can complete a pass
+        for name, engine in self.engines.items():
+            thread = threading.Thread(target=self._run, args=(name, engine, shares[name]),
+                                      name=f"scan-{name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return shares
+
+    def stop(self):
+        self.running = False
+        for engine in self.engines.values():
+            engine.stop()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+        self.engines = {}
+
+    def row(self):
+        with self.lock:
+            return [self.latest[f] for f in self.freqs]
+
+    def _sample(self, freq_hz, s_val, audio_db, text):
+        with self.lock:
+            self.latest[freq_hz] = s_val
+        if self.on_sample:
+            self.on_sample(freq_hz, s_val, audio_db, text)
+
+    def _activity(self, name, freq_hz, s_val, text):
+        if self.on_activity:
+            self.on_activity(name, freq_hz, s_val, text)
+
+    def _run(self, name, engine, share):
+        while self.running:
+            try:
+                fresh = engine.sweep(share)
+            except Exception as e:
+                print(f"Coordinated scan error: {e}")
+                time.sleep(1.0)
+                continue
+            # One merged row per coverage period: emitted by whichever radio completes it
+            with self.lock:
+                self.passed.add(name)
+                self.fresh = self.fresh or fresh is not None
+                if not self.passed.issuperset(self.engines):
+                    continue
+                emit = self.fresh
+                self.passed = set()
+                self.fresh = False
+            if emit and self.running and self.on_row:
+                self.on_row(self.row(), self.freqs)
+
+
+def open_multi_radio(main_app):
+    # Dashboard window: one row per radio, connect/disconnect, coordinated scan.
+    # Merged rows go to the main waterfall (and the API) like a single-radio scan.
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+
+    manager = getattr(main_app, "radio_manager", None)
+    if manager is None:
+        manager = main_app.radio_manager = RadioManager()
+
+    win = tk.Toplevel(main_app.root)
+    win.title("QCX Multi-Radio")
+    win.geometry("760x480")
+    win.configure(bg="#1a1a1a")
+
+    columns = ("port", "device", "freq", "s", "tx", "age")
+    tree = ttk.Treeview(win, columns=columns, height=8)
+    tree.heading("#0", text="Radio")
+    for col, title, width in zip(columns, ("Port", "Device", "VFO A (MHz)", "S", "TX", "Age"), (150, 60, 110, 40, 40, 60)):
+        tree.heading(col, text=title)
+        tree.column(col, width=width, anchor=tk.CENTER)
+    tree.column("#0", width=120)
+    tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    add_frame = tk.LabelFrame(win, text="ADD RADIO", fg="cyan", bg="#1a1a1a")
+    add_frame.pack(fill=tk.X, padx=10)
+    name_var = tk.StringVar(value=f"rig{len(manager.sessions) + 1}")
+    port_var = tk.StringVar(value="/dev/ttyUSB1")
+    device_var = tk.StringVar(value="QCX")
+    variant_var = tk.StringVar(value="Low")
+    for label, var, width in (("Name", name_var, 8), ("Port", port_var, 22)):
+        tk.Label(add_frame, text=label, fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=(8, 2))
+        tk.Entry(add_frame, textvariable=var, width=width).pack(side=tk.LEFT)
+    ttk.Combobox(add_frame, textvariable=device_var, values=["QCX", "QMX", "QMX+"], width=6).pack(side=tk.LEFT, padx=5)
+    ttk.Combobox(add_frame, textvariable=variant_var, values=["Low", "Mid", "High"], width=5).pack(side=tk.LEFT)
+
+    def add_radio():
+        session = RadioSession(name_var.get().strip(), port_var.get().strip(), device=device_var.get(),
+                               variant=variant_var.get(), poll_scale=main_app.poll_interval / 1000)
+        try:
+            manager.add(session)
+            session.start()
+        except Exception as e:
+            messagebox.showerror("Multi-Radio", f"Cannot connect {session.name}:\n{e}")
+        name_var.set(f"rig{len(manager.sessions) + 1}")
+        refresh()
+
+    def remove_radio():
+        for name in tree.selection():
+            manager.remove(name)
+        refresh()
+
+    tk.Button(add_frame, text="CONNECT", command=add_radio, bg="#00aa00", fg="white").pack(side=tk.LEFT, padx=8)
+    tk.Button(add_frame, text="REMOVE", command=remove_radio, bg="#aa0000", fg="white").pack(side=tk.LEFT)
+
+    scan_frame = tk.LabelFrame(win, text="COORDINATED SCAN", fg="cyan", bg="#1a1a1a")
+    scan_frame.pack(fill=tk.X, padx=10, pady=10)
+    center_var = tk.StringVar(value="7.030")
+    width_var = tk.StringVar(value="50")
+    step_var = tk.StringVar(value="5")
+    for label, var in (("Center MHz", center_var), ("± kHz", width_var), ("Step kHz", step_var)):
+        tk.Label(scan_frame, text=label, fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=(8, 2))
+        tk.Entry(scan_frame, textvariable=var, width=8).pack(side=tk.LEFT)
+    scan_status = tk.Label(scan_frame, text="", fg="yellow", bg="#1a1a1a")
+    scan = [None]
+
+    def toggle_scan():
+        if scan[0]:
+            scan[0].stop()
+            scan[0] = None
+            scan_button.config(text="START", bg="#00aaff")
+            scan_status.config(text="")
+            return
+        try:
+            step_khz = float(step_var.get())
+            freqs = qcx_scanner.scan_grid(float(center_var.get()), float(width_var.get()), step_khz)
+            coordinated = CoordinatedScan(manager, freqs, threshold=main_app.activity_threshold_var.get(),
+                                          active_dwell=main_app.scan_delay_var.get())
+            coordinated.on_sample = main_app.activity_db.add
+            coordinated.on_row = lambda row, f: main_app.root.after(
+                0, lambda: main_app.add_waterfall_row(row, f[0], step_khz * 1000))
+            shares = coordinated.start()
+        except Exception as e:
+            messagebox.showerror("Multi-Radio", f"Cannot start scan:\n{e}")
+            return
+        scan[0] = coordinated
+        scan_button.config(text="STOP", bg="#ff0000")
+        scan_status.config(text=", ".join(f"{name}: {len(share)} ch" for name, share in shares.items()))
+
+    scan_button = tk.Button(scan_frame, text="START", command=toggle_scan, bg="#00aaff", fg="white")
+    scan_button.pack(side=tk.LEFT, padx=8)
+    scan_status.pack(side=tk.LEFT)
+
+    def refresh():
+        rows = manager.dashboard()
+        names = {row["name"] for row in rows}
+        for item in tree.get_children():
+            if item not in names:
+                tree.delete(item)
+        for row in rows:
+            values = (row["port"], row["device"],
+                      f"{row['vfo_a'] / 1e6:.6f}" if row["vfo_a"] else "-",
+                      row["s_meter"] if row["s_meter"] is not None else "-",
+                      "TX" if row["tx"] else "",
+                      f"{row['age']:.1f}s" if row["age"] is not None else (row["error"] or "off"))
+            if tree.exists(row["name"]):
+                tree.item(row["name"], values=values)
+            else:
+                tree.insert("", tk.END, iid=row["name"], text=row["name"], values=values)
+
+    def update():
+        if not win.winfo_exists():
+            return
+        refresh()
+        win.after(500, update)
+
+    def on_closing():
+        # Radios stay connected in main_app.radio_manager; only the scan stops
+        if scan[0]:
+            scan[0].stop()
+        win.destroy()
+
+    win.protocol("WM_DELETE_WINDOW", on_closing)
+    update()
+
+
+def _main(argv):
+    manager = RadioManager().load(argv[1])
+    failed = manager.start_all()
+    for name, error in failed.items():
+        print(f"{name}: {error}")
+    scan = None
+    try:
+        if len(argv) < 5:
+            time.sleep(2.0)
+            for row in manager.dashboard():
+                print(row)
+            return 0
+        freqs = qcx_scanner.scan_grid(float(argv[2]), float(argv[3]), float(argv[4]))
+        scan = CoordinatedScan(manager, freqs)
+        scan.on_row = lambda row, f: print(f"{time.strftime('%H:%M:%S')} {' '.join(str(s) for s in row)}")
+        for name, share in scan.start().items():
+            print(f"{name}: {len(share)} channels")
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if scan:
+            scan.stop()
+        manager.stop_all()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python qcx_multi_radio.py radios.ini [center_mhz width_khz step_khz]")
+        sys.exit(1)
+    sys.exit(_main(sys.argv))
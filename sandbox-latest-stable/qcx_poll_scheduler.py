@@ -0,0 +1,141 @@
+# qcx_poll_scheduler.py
+# Adaptive CAT poll scheduler with per-query rates
+# Each status query has its own fastest/slowest interval. A query backs off while
+# its value stays the same, snaps back to its fastest rate when the value changes,
+# after user interaction (tuning, band change) or when activity is seen, and all
+# queries together stay inside a serial bandwidth budget.
+
+import threading
+import time
+
+# cmd: (fastest interval s, slowest interval s, approx bytes on the wire per poll)
+DEFAULT_RATES = {
+    'IF': (0.25, 2.0, 41),    # S-meter, RIT, TX
+    'TB': (0.25, 1.0, 40),    # decode buffer
+    'FA': (0.5, 5.0, 17),
+    'FB': (2.0, 30.0, 17),
+    'FT': (2.0, 30.0, 7),
+}
+
+BACKOFF = 1.5
+TICK = 0.05
+
+
+class PollEntry:
+    def __init__(self, cmd, fastest, slowest, cost):
+        self.cmd = cmd
+        self.fastest = fastest
+        self.slowest = slowest
+        self.cost = cost
+        self.interval = fastest
+        self.next_due = 0.0
+        self.boost_until = 0.0
+
+
+class PollScheduler:
+    def __init__(self, cat, state, rates=None, budget=600, on_poll=None):
+        # cat: qcx_cat_client.CATWorker, state: qcx_radio_state.RadioState
+        # budget: serial bytes per second all polling together may use
+        self.cat = cat
+        self.state = state
+        self.entries = {cmd: PollEntry(cmd, *r) for cmd, r in (rates or DEFAULT_RATES).items()}
+        self.budget = budget
+        self.tokens = budget
+        self.scale = 1.0
+        self.skip = set()
+        self.on_poll = on_poll
+        self.running = False
+        self.thread = None
+        self.wake = threading.Event()
+        self.state.subscribe(self._on_state_change)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.state.unsubscribe(self._on_state_change)
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    # ---- tuning knobs ----
+
+    def set_scale(self, scale):
+        # Multiplies every interval (the GUI's Polling spinbox, 1.0 = default rates)
+        self.scale = max(0.1, scale)
+        self.wake.set()
+
+    def set_skip(self, cmds):
+        # Queries that are pushed by the radio and need not be polled
+        self.skip = set(cmds)
+
+    def boost(self, seconds=5.0, cmds=None):
+        # Poll at the fastest rate for a while, e.g. after the user tunes
+        now = time.time()
+        for cmd in (cmds or self.entries):
+            entry = self.entries.get(cmd)
+            if entry:
+                entry.boost_until = max(entry.boost_until, now + seconds)
+                entry.interval = entry.fastest
+                entry.next_due = min(entry.next_due, now)
+        self.wake.set()
+
+    def poll_now(self):
+        for entry in self.entries.values():
+            entry.next_due = 0.0
+        self.wake.set()
+
+    def _on_state_change(self, field, value):
+        # A new signal or decoded text speeds up the fast fields
+        if field in ('s_meter', 'tb_text'):
+            self.boost(seconds=3.0, cmds=('IF', 'TB'))
+
+    # ---- loop ----
+
+    def _loop(self):
+        last = time.time()
+        while self.running:
+            now = time.time()
+            self.tokens = min(self.budget, self.tokens + (now - last) * self.budget)
+            last = now
+
+            due = sorted((e for e in self.entries.values() if e.cmd not in self.skip and now >= e.next_due),
+                         key=lambda e: e.next_due)
+            batch = []
+            for entry in due:
+                if entry.cost > self.tokens:
+                    break
+                self.tokens -= entry.cost
+                batch.append(entry)
+
+            if batch:
+                self._poll(batch)
+            self.wake.wait(TICK)
+            self.wake.clear()
+
+    def _poll(self, batch):
+        try:
+            results = self.cat.poll(tuple(e.cmd for e in batch))
+        except Exception as e:
+            print(f"Poll error: {e}")
+            results = {}
+        now = time.time()
+        for entry in batch:
+            parsed = results.get(entry.cmd)
+            changed = self.state.apply(parsed) if parsed else []
+            if changed or now < entry.boost_until:
+                entry.interval = entry.fastest
+            else:
+                entry.interval = min(entry.interval * BACKOFF, entry.slowest)
+            entry.next_due = now + entry.interval * self.scale
+        if self.on_poll:
+            self.on_poll(results)
+
+    def rates(self):
+        # Current effective interval per query, for display/debugging
+        return {cmd: e.interval * self.scale for cmd, e in self.entries.items() if cmd not in self.skip}
@@ -0,0 +1,112 @@
+# qcx_radio_state.py
+# In-memory model of the radio's state (VFO A/B, RIT, S-meter, split, TX, TB text)
+# Fed from parsed CAT responses; listeners are told only about fields that actually
+# changed, so the GUI stops re-configuring every label on every poll and other code
+# reads typed values here instead of scraping label text.
+
+import threading
+import time
+
+import qcx_cat_client
+
+FIELDS = ('vfo_a', 'vfo_b', 'rit', 's_meter', 'split', 'tx', 'tb_text')
+
+
+class RadioState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = dict.fromkeys(FIELDS)
+        self.updated = dict.fromkeys(FIELDS, 0.0)   # last time a value was received
+        self.changed = dict.fromkeys(FIELDS, 0.0)   # last time a value differed
+        self.listeners = []
+
+    # ---- reading ----
+
+    def get(self, field, default=None):
+        value = self.values[field]
+        return default if value is None else value
+
+    @property
+    def vfo_a(self):
+        return self.values['vfo_a']
+
+    @property
+    def vfo_b(self):
+        return self.values['vfo_b']
+
+    @property
+    def rit(self):
+        return self.get('rit', 0)
+
+    @property
+    def s_meter(self):
+        return self.get('s_meter', 0)
+
+    @property
+    def split(self):
+        return self.values['split']
+
+    @property
+    def tx(self):
+        return self.get('tx', False)
+
+    def age(self, field):
+        # Seconds since the field was last received from the radio
+        stamp = self.updated[field]
+        return time.time() - stamp if stamp else None
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    # ---- listeners ----
+
+    def subscribe(self, callback):
+        # callback(field, value) runs on the thread that applied the update
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    # ---- updating ----
+
+    def set(self, field, value, always_notify=False):
+        # Returns True if the value changed (or always_notify was given)
+        now = time.time()
+        with self.lock:
+            self.updated[field] = now
+            if self.values[field] == value and not always_notify:
+                return False
+            self.values[field] = value
+            self.changed[field] = now
+        for callback in list(self.listeners):
+            try:
+                callback(field, value)
+            except Exception as e:
+                print(f"RadioState listener error: {e}")
+        return True
+
+    def apply(self, parsed):
+        # Accepts one object from qcx_cat_client.parse_frame(); returns the
+        # names of the fields that changed
+        changed = []
+        if isinstance(parsed, qcx_cat_client.VfoFreq):
+            field = 'vfo_a' if parsed.vfo == 'A' else 'vfo_b'
+            if self.set(field, parsed.freq_hz):
+                changed.append(field)
+        elif isinstance(parsed, qcx_cat_client.IFStatus):
+            for field, value in (('rit', parsed.rit_hz), ('s_meter', parsed.s_meter), ('tx', parsed.tx)):
+                if self.set(field, value):
+                    changed.append(field)
+        elif isinstance(parsed, qcx_cat_client.SplitMode):
+            if self.set('split', parsed.mode):
+                changed.append('split')
+        elif isinstance(parsed, qcx_cat_client.DecodeText):
+            # Each TB chunk is new text even if it repeats the previous one
+            if parsed.text and self.set('tb_text', parsed.text, always_notify=True):
+                changed.append('tb_text')
+        return changed
+
+    def apply_frame(self, frame):
+        return self.apply(qcx_cat_client.parse_frame(frame))
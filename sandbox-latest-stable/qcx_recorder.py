@@ -0,0 +1,220 @@
+# qcx_recorder.py
+# Rolling audio recorder with pre-trigger buffer
+# Keeps the last few seconds of the radio's audio in a fixed-size ring in memory.
+# When activity is detected, the pre-trigger audio plus the live audio that follows
+# is written to a compressed clip by a background writer thread, and the clip is
+# indexed (time / frequency / S-meter) in clips_index.csv for offline decoding.
+
+import os
+import csv
+import gzip
+import queue
+import shutil
+import subprocess
+import threading
+import wave
+from datetime import datetime
+
+import numpy as np
+
+import qcx_audio_devices
+
+
+class ActivityRecorder:
+    def __init__(self, device_index=None, rate=48000, chunk=1024,
+                 pre_seconds=5.0, post_seconds=10.0, clip_dir="clips"):
+        self.device_index = device_index
+        self.rate = rate
+        self.chunk = chunk
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.clip_dir = clip_dir
+        self.index_file = os.path.join(clip_dir, "clips_index.csv")
+
+        # Ring buffer of the most recent pre_seconds of audio
+        self.ring = np.zeros(int(rate * pre_seconds), dtype=np.int16)
+        self.ring_pos = 0
+        self.ring_filled = False
+
+        self.running = False
+        self.capture_thread = None
+        self.writer_thread = None
+        self.lock = threading.Lock()
+        self.clip_queue = None      # live audio for the clip being written
+        self.clip_frames_left = 0
+        self.jobs = queue.Queue()
+
+        self.stream = None
+
+    # ---- control ----
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(self.clip_dir, exist_ok=True)
+        self.stream = qcx_audio_devices.open_input(self.device_index, self.rate, self.chunk)
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            if self.clip_queue is not None:
+                self.clip_queue.put(None)
+                self.clip_queue = None
+        self.jobs.put(None)
+        if self.capture_thread:
+            self.capture_thread.join(timeout=2)
+        if self.stream:
+            qcx_audio_devices.close(self.stream)
+            self.stream = None
+        # Clips already triggered are finished and indexed before stop() returns
+        if self.writer_thread:
+            self.writer_thread.join()
+            self.writer_thread = None
+
+    def trigger(self, freq_mhz, s_val):
+        # Start a new clip, or extend the one in progress if activity continues
+        if not self.running:
+            return
+        post_frames = int(self.rate * self.post_seconds)
+        with self.lock:
+            if self.clip_queue is not None:
+                self.clip_frames_left = max(self.clip_frames_left, post_frames)
+                return
+            pre_audio = self._ring_snapshot()
+            self.clip_queue = queue.Queue()
+            self.clip_frames_left = post_frames
+            self.jobs.put({
+                "time": datetime.now(),
+                "freq": freq_mhz,
+                "s_val": s_val,
+                "pre": pre_audio,
+                "live": self.clip_queue,
+            })
+
+    # ---- capture side ----
+
+    def _ring_snapshot(self):
+        # Oldest sample first
+        if not self.ring_filled:
+            return self.ring[:self.ring_pos].copy()
+        return np.concatenate((self.ring[self.ring_pos:], self.ring[:self.ring_pos]))
+
+    def _ring_write(self, samples):
+        n = len(samples)
+        size = len(self.ring)
+        if n >= size:
+            self.ring[:] = samples[-size:]
+            self.ring_pos = 0
+            self.ring_filled = True
+            return
+        end = self.ring_pos + n
+        if end <= size:
+            self.ring[self.ring_pos:end] = samples
+        else:
+            first = size - self.ring_pos
+            self.ring[self.ring_pos:] = samples[:first]
+            self.ring[:n - first] = samples[first:]
+        if end >= size:
+            self.ring_filled = True
+        self.ring_pos = end % size
+
+    def _capture_loop(self):
+        while self.running:
+            try:
+                data = np.frombuffer(self.stream.read(self.chunk, exception_on_overflow=False), dtype=np.int16)
+            except Exception as e:
+                print(f"Recorder capture error: {e}")
+                break
+            with self.lock:
+                self._ring_write(data)
+                if self.clip_queue is not None:
+                    self.clip_queue.put(data)
+                    self.clip_frames_left -= len(data)
+                    if self.clip_frames_left <= 0:
+                        self.clip_queue.put(None)
+                        self.clip_queue = None
+
+    # ---- writer side ----
+
+    def _writer_loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                self._write_clip(job)
+            except Exception as e:
+                print(f"Recorder write error: {e}")
+
+    def _write_clip(self, job):
+        stamp = job["time"].strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.clip_dir, f"clip_{stamp}_{job['freq']:.6f}")
+        if shutil.which("ffmpeg"):
+            path = base + ".flac"
+            sink = _FlacSink(path, self.rate)
+        else:
+            path = base + ".wav.gz"
+            sink = _GzipWavSink(path, self.rate)
+
+        frames = 0
+        sink.write(job["pre"])
+        frames += len(job["pre"])
+        while True:
+            data = job["live"].get()
+            if data is None:
+                break
+            sink.write(data)
+            frames += len(data)
+        sink.close()
+
+        new_file = not os.path.exists(self.index_file)
+        with open(self.index_file, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["DateTime", "Frequency", "S-Meter", "Duration", "File"])
+            writer.writerow([job["time"].strftime("%Y-%m-%d %H:%M:%S"), f"{job['freq']:.6f}",
+                             job["s_val"], f"{frames / self.rate:.1f}", os.path.basename(path)])
+        print(f"Recorder: saved {path} ({frames / self.rate:.1f}s)")
+
+
+class _FlacSink:
+    # Encodes raw s16le through ffmpeg (same tool the decoder uses to read MP3s)
+    def __init__(self, path, rate):
+        cmd = ['ffmpeg', '-loglevel', 'error', '-y',
+               '-f', 's16le', '-ac', '1', '-ar', str(rate), '-i', 'pipe:0',
+               '-c:a', 'flac', path]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, samples):
+        self.process.stdin.write(samples.tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+class _GzipWavSink:
+    # Fallback when ffmpeg isn't installed. gzip streams can't seek back to patch
+    # the WAV header, so the (short) clip is collected first and written on close.
+    def __init__(self, path, rate):
+        self.path = path
+        self.rate = rate
+        self.parts = []
+
+    def write(self, samples):
+        self.parts.append(samples.tobytes())
+
+    def close(self):
+        data = b"".join(self.parts)
+        with gzip.open(self.path, "wb", compresslevel=6) as gz:
+            with wave.open(gz, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.rate)
+                wav.setnframes(len(data) // 2)
+                wav.writeframes(data)
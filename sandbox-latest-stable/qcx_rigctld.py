@@ -0,0 +1,325 @@
+# qcx_rigctld.py
+# Hamlib rigctld-compatible TCP bridge onto the app's single CAT connection
+# WSJT-X, loggers and other Hamlib programs connect with "Hamlib NET rigctl" to
+# 127.0.0.1:4532 instead of opening the serial port themselves. Every client's
+# requests go through the one CATWorker; reads (frequency, PTT, split, S-meter)
+# are answered from the radio state cache when it is fresh (the poll scheduler and
+# auto-information keep it current), so several programs can poll without adding
+# round trips to the radio.
+#
+# Supported: f F m M v V t T s S i I l (STRENGTH) q, \dump_state, \chk_vfo,
+# \get_powerstat, long names (\get_freq ...) and the '+' extended response form.
+
+import asyncio
+import sys
+import threading
+
+RIGCTLD_PORT = 4532
+CACHE_AGE = 1.0             # seconds a cached value may be served as-is
+
+RIG_OK = 0
+RIG_EINVAL = -1
+RIG_ENIMPL = -4
+RIG_ETIMEOUT = -5
+RIG_ENAVAIL = -11
+
+# Kenwood MD <-> Hamlib mode names
+MODES = {1: "LSB", 2: "USB", 3: "CW", 4: "FM", 5: "AM", 6: "RTTY", 7: "CWR", 9: "RTTYR"}
+MODE_CODES = {name: code for code, name in MODES.items()}
+MODE_CODES.update({"PKTUSB": 2, "PKTLSB": 1})
+PASSBAND = {"CW": 500, "CWR": 500, "RTTY": 500, "RTTYR": 500}
+
+LONG_NAMES = {
+    "get_freq": "f", "set_freq": "F", "get_mode": "m", "set_mode": "M", "get_vfo": "v", "set_vfo": "V",
+    "get_ptt": "t", "set_ptt": "T", "get_split_vfo": "s", "set_split_vfo": "S",
+    "get_split_freq": "i", "set_split_freq": "I", "get_level": "l", "quit": "q",
+}
+ARGS = {"F": 1, "M": 2, "V": 1, "T": 1, "S": 2, "I": 1, "l": 1}
+# Labels for the '+' extended response form
+VALUE_LABELS = {"f": ["Frequency"], "m": ["Mode", "Passband"], "v": ["VFO"], "t": ["PTT"],
+                "s": ["Split", "TX VFO"], "i": ["TX Frequency"], "l": ["Level Value"]}
+
+# Capabilities for \dump_state (protocol 0): 100 kHz-30 MHz, CW/USB/LSB/PKTUSB, VFO A/B
+DUMP_STATE = """0
+2
+2
+100000.000000 30000000.000000 0x80e -1 -1 0x3 0x1
+0 0 0 0 0 0 0
+100000.000000 30000000.000000 0x80e 100 5000 0x3 0x1
+0 0 0 0 0 0 0
+0x80e 10
+0 0
+0x2 500
+0x80c 2400
+0 0
+9990
+0
+0
+0
+0
+0
+0x0
+0x0
+0x40000000
+0x0
+0x0
+0x0
+"""
+
+
+class RigError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class RigctlBridge:
+    def __init__(self, state, host="127.0.0.1", port=RIGCTLD_PORT, tx_timeout=60.0):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.tx_timeout = tx_timeout
+        self.cat = None
+        self.scheduler = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.clients = 0
+        self.mode = None            # (name, passband) once read or set
+        self.tx_handle = None
+        self.tx_owner = None        # writer of the client that keyed TX
+
+    # ---- lifecycle ----
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="rigctld", daemon=True)
+        self.thread.start()
+        try:
+            self.server = asyncio.run_coroutine_threadsafe(
+                asyncio.start_server(self._handle, self.host, self.port), self.loop).result(5)
+        except Exception:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            raise
+        if self.port == 0:
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        if not self.loop:
+            return
+
+        async def shutdown():
+            if self.tx_handle:
+                await self._ptt(False)
+            self.server.close()
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+
+    def attach(self, cat, scheduler=None):
+        self.cat = cat
+        self.scheduler = scheduler
+        self.mode = None
+
+    # ---- connections ----
+
+    async def _handle(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors="replace").strip()
+                if not line:
+                    continue
+                reply = await self._line(line, writer)
+                if reply is None:
+                    break
+                writer.write(reply.encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            if self.tx_owner is writer:
+                # Don't leave the rig transmitting when a keyed client goes away
+                try:
+                    await self._ptt(False)
+                except Exception as e:
+                    print(f"rigctld: TX off failed: {e}")
+            writer.close()
+
+    async def _line(self, line, client=None):
+        # One request line -> response text (None to close the connection)
+        extended = line.startswith("+")
+        if extended:
+            line = line[1:]
+        words = line.split()
+        if not words:
+            return f"RPRT {RIG_EINVAL}\n"
+        cmd = words[0]
+        if cmd.startswith("\\"):
+            cmd = cmd[1:]
+            if cmd == "dump_state":
+                return DUMP_STATE
+            if cmd == "chk_vfo":
+                return "0\n"
+            if cmd == "get_powerstat":
+                return "1\n"
+            cmd = LONG_NAMES.get(cmd, "\\" + cmd)
+        if cmd == "q":
+            return None
+
+        # Short commands may be packed without spaces ("F14074000")
+        if len(cmd) > 1 and cmd[0] in ARGS and not cmd.startswith("\\"):
+            words = [cmd[0], cmd[1:]] + words[1:]
+            cmd = cmd[0]
+        args = words[1:]
+        try:
+            if len(args) < ARGS.get(cmd, 0):
+                raise RigError(RIG_EINVAL)
+            values = await self._command(cmd, args, client)
+            code = RIG_OK
+        except RigError as e:
+            values, code = None, e.code
+        except (ValueError, IndexError):
+            values, code = None, RIG_EINVAL
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            values, code = None, RIG_ETIMEOUT
+
+        if extended:
+            name = next((long for long, short in LONG_NAMES.items() if short == cmd), cmd)
+            out = f"{name}: {' '.join(args)}\n"
+            for label, value in zip(VALUE_LABELS.get(cmd, []), values or []):
+                out += f"{label}: {value}\n"
+            return out + f"RPRT {code}\n"
+        if values is not None:
+            return "".join(f"{v}\n" for v in values)
+        return f"RPRT {code}\n"
+
+    # ---- commands ----
+
+    async def _cat(self, coro):
+        if self.cat is None:
+            coro.close()
+            raise RigError(RIG_ENAVAIL)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.cat.loop))
+
+    async def _fresh(self, field, query):
+        # Cached state value, re-read from the radio only when it has gone stale
+        age = self.state.age(field)
+        if age is None or age > CACHE_AGE:
+            self.state.apply_frame(await self._cat(self.cat.client.query(query)) or "")
+        value = self.state.get(field)
+        if value is None:
+            raise RigError(RIG_ETIMEOUT)
+        return value
+
+    async def _command(self, cmd, args, client=None):
+        # Returns the list of values to print, or None for a plain RPRT 0
+        if cmd == "f":
+            vfo_b = self.state.get('split') == 1
+            return [await self._fresh('vfo_b', 'FB') if vfo_b else await self._fresh('vfo_a', 'FA')]
+        if cmd == "F":
+            freq_hz = int(float(args[0]))
+            vfo = "B" if self.state.get('split') == 1 else "A"
+            await self._cat(self.cat.client.set_freq(freq_hz, vfo))
+            self.state.set('vfo_b' if vfo == "B" else 'vfo_a', freq_hz)
+            if self.scheduler:
+                self.scheduler.boost()
+            return None
+        if cmd == "m":
+            if self.mode is None:
+                resp = await self._cat(self.cat.client.query('MD'))
+                if not resp or not resp.startswith('MD') or not resp[2:].isdigit():
+                    raise RigError(RIG_ENAVAIL)
+                name = MODES.get(int(resp[2:]), "CW")
+                self.mode = (name, PASSBAND.get(name, 2400))
+            return list(self.mode)
+        if cmd == "M":
+            name = args[0].upper()
+            if name not in MODE_CODES:
+                raise RigError(RIG_EINVAL)
+            await self._cat(self.cat.client.write(f'MD{MODE_CODES[name]}'))
+            passband = int(args[1]) if len(args) > 1 and args[1].lstrip("-").isdigit() and int(args[1]) > 0 else 0
+            self.mode = (name, passband or PASSBAND.get(name, 2400))
+            return None
+        if cmd == "v":
+            return ["VFOB" if self.state.get('split') == 1 else "VFOA"]
+        if cmd == "V":
+            vfo = args[0].upper()
+            if vfo not in ("VFOA", "VFOB", "CURRVFO"):
+                raise RigError(RIG_EINVAL)
+            if vfo != "CURRVFO":
+                split = 1 if vfo == "VFOB" else 0
+                await self._cat(self.cat.client.set_split(split))
+                self.state.set('split', split)
+            return None
+        if cmd == "t":
+            return [1 if await self._fresh('tx', 'IF') else 0]
+        if cmd == "T":
+            await self._ptt(args[0] not in ("0", "OFF"), client)
+            return None
+        if cmd == "s":
+            split = await self._fresh('split', 'FT')
+            return [1, "VFOB"] if split == 2 else [0, "VFOA"]
+        if cmd == "S":
+            split = 2 if args[0] == "1" else 0
+            await self._cat(self.cat.client.set_split(split))
+            self.state.set('split', split)
+            return None
+        if cmd == "i":
+            return [await self._fresh('vfo_b', 'FB')]
+        if cmd == "I":
+            freq_hz = int(float(args[0]))
+            await self._cat(self.cat.client.set_freq(freq_hz, "B"))
+            self.state.set('vfo_b', freq_hz)
+            return None
+        if cmd == "l":
+            if args[0].upper() != "STRENGTH":
+                raise RigError(RIG_ENAVAIL)
+            # dB relative to S9, 6 dB per S unit
+            return [(await self._fresh('s_meter', 'IF') - 9) * 6]
+        raise RigError(RIG_ENIMPL)
+
+    async def _ptt(self, on, client=None):
+        # Same safety limit as the main window's tx_on
+        if self.tx_handle:
+            self.tx_handle.cancel()
+            self.tx_handle = None
+        self.tx_owner = client if on else None
+        await self._cat(self.cat.client.set_tx(on))
+        self.state.set('tx', on)
+        if on:
+            self.tx_handle = self.loop.call_later(self.tx_timeout, lambda: asyncio.ensure_future(self._ptt(False)))
+
+
+def _serve(port, listen_port):
+    # Standalone bridge: python qcx_rigctld.py COM3|replay:trace.ndjson [listen_port]
+    import qcx_cat_client
+    import qcx_cat_replay
+    from qcx_radio_state import RadioState
+
+    replay = qcx_cat_replay.parse_port(port)
+    cat = qcx_cat_replay.open_replay(*replay) if replay else qcx_cat_client.open_serial(port)
+    bridge = RigctlBridge(RadioState(), port=listen_port)
+    bridge.attach(cat)
+    bridge.start()
+    print(f"rigctld bridge on {bridge.host}:{bridge.port} -> {port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+        cat.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python qcx_rigctld.py PORT [listen_port]")
+        sys.exit(1)
+    _serve(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else RIGCTLD_PORT)
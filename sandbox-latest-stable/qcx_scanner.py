@@ -0,0 +1,387 @@
+# qcx_scanner.py
+# Fast band scan engine with adaptive dwell
+# Each step tunes, waits a short settle time and then actively queries IF (and TB)
+# instead of sleeping a fixed delay and reading whatever the poller last saw.
+# Quiet channels get only the settle time; channels with a signal get a longer
+# dwell; channels that have been quiet for several sweeps in a row are skipped
+# until their hold-off expires; a sweep where every channel is held off waits for
+# the first one to come due and returns None instead of a row. MemoryScanner walks a priority channel list
+# instead of a grid.
+
+import csv
+import os
+import time
+
+import qcx_cat_client
+
+
+class ChannelInfo:
+    def __init__(self):
+        self.last_s = 0
+        self.last_visit = 0.0
+        self.quiet_count = 0
+
+
+class ScanEngine:
+    def __init__(self, cat, state=None, threshold=3, settle=0.08, active_dwell=2.0,
+                 sample_interval=0.2, quiet_sweeps=3, quiet_holdoff=30.0):
+        # cat: qcx_cat_client.CATWorker, state: qcx_radio_state.RadioState (optional)
+        self.cat = cat
+        self.state = state
+        self.threshold = threshold
+        self.settle = settle
+        self.active_dwell = active_dwell
+        self.sample_interval = sample_interval
+        self.quiet_sweeps = quiet_sweeps
+        self.quiet_holdoff = quiet_holdoff
+        self.channels = {}
+        self.fresh = 0              # channels actually measured in the current sweep
+        self.running = False
+
+        # Optional hooks
+        self.on_step = None         # (freq_hz) before tuning
+        self.on_activity = None     # (freq_hz, s_val, text) when a channel is active
+        self.on_sample = None       # (freq_hz, s_val, audio_db, text) for every fresh measurement
+        self.activity_hook = None   # () -> bool, extra activity source (e.g. pushed TB)
+
+    def stop(self):
+        self.running = False
+
+    def _measure(self):
+        # One pipelined IF + TB round trip; returns (s_val, decoded text)
+        results = self.cat.poll(('IF', 'TB'))
+        s_val = 0
+        text = ""
+        for parsed in results.values():
+            if self.state and parsed:
+                self.state.apply(parsed)
+            if isinstance(parsed, qcx_cat_client.IFStatus):
+                s_val = parsed.s_meter
+            elif isinstance(parsed, qcx_cat_client.DecodeText):
+                text = parsed.text
+        return s_val, text
+
+    def _skip(self, info, now):
+        return info.quiet_count >= self.quiet_sweeps and now - info.last_visit < self.quiet_holdoff
+
+    def _wait_due(self, freqs_hz):
+        # Sleep until the first held-off channel comes due (or the scan stops)
+        due = min(self.channels[f].last_visit + self.quiet_holdoff for f in freqs_hz if f in self.channels)
+        while self.running and time.time() < due:
+            time.sleep(min(0.25, max(0.0, due - time.time())))
+
+    def _sweep_result(self, row, freqs_hz):
+        # None when nothing was measured, so callers don't publish a stale row
+        if self.fresh or not freqs_hz:
+            return row
+        self._wait_due(freqs_hz)
+        return None
+
+    def scan_channel(self, freq_hz):
+        # Returns the S-value for this channel (the remembered one if skipped)
+        info = self.channels.setdefault(freq_hz, ChannelInfo())
+        now = time.time()
+        if self._skip(info, now):
+            return info.last_s
+
+        if self.on_step:
+            self.on_step(freq_hz)
+        self.cat.call(self.cat.client.set_freq(freq_hz))
+        time.sleep(self.settle)
+        s_val, text = self._measure()
+        self.fresh += 1
+
+        active = s_val > self.threshold or bool(text) or (self.activity_hook and self.activity_hook())
+        if active:
+            # Signal present: stay a while and keep the strongest reading
+            if self.on_activity:
+                self.on_activity(freq_hz, s_val, text)
+            end = time.time() + self.active_dwell
+            while self.running and time.time() < end:
+                time.sleep(self.sample_interval)
+                s, t = self._measure()
+                s_val = max(s_val, s)
+            info.quiet_count = 0
+        else:
+            info.quiet_count += 1
+
+        info.last_s = s_val
+        info.last_visit = time.time()
+        if self.on_sample:
+            self.on_sample(freq_hz, s_val, None, text)
+        return s_val
+
+    def sweep(self, freqs_hz):
+        # One pass over the channel list; returns the row of S-values, or None if
+        # every channel was still held off
+        row = []
+        self.fresh = 0
+        for freq_hz in freqs_hz:
+            if not self.running:
+                break
+            row.append(self.scan_channel(freq_hz))
+        return self._sweep_result(row, freqs_hz)
+
+
+def scan_grid(center_mhz, width_khz, step_khz):
+    # Frequencies (Hz) for a +/- width_khz sweep around center_mhz
+    steps = int((width_khz * 2) / step_khz) + 1
+    return [int(center_mhz * 1e6 + (i - steps // 2) * step_khz * 1000) for i in range(steps)]
+
+
+class AudioCapture:
+    # Blocking reads of short blocks from the radio's audio input
+    def __init__(self, device_index=None, rate=48000):
+        import qcx_audio_devices
+        self.rate = rate
+        self.stream = qcx_audio_devices.open_input(device_index, rate, 1024)
+
+    def read(self, frames):
+        import numpy as np
+        # Drop audio buffered from before the retune, then take a fresh block
+        stale = self.stream.get_read_available()
+        if stale:
+            self.stream.read(stale, exception_on_overflow=False)
+        return np.frombuffer(self.stream.read(frames, exception_on_overflow=False), dtype=np.int16)
+
+    def close(self):
+        import qcx_audio_devices
+        qcx_audio_devices.close(self.stream)
+
+
+class AudioScanEngine(ScanEngine):
+    # Wideband scan: each step captures a short audio block and splits the receiver
+    # passband into bins with the qcx_graphs FFT, so one step covers ~2.4 kHz of
+    # spectrum instead of one S-meter digit. Audio is assumed to be upper-sideband
+    # (RF = dial + audio frequency).
+    def __init__(self, cat, capture, state=None, block=4096, audio_lo=300, audio_hi=2700,
+                 bin_hz=200, db_per_s=6.0, **kwargs):
+        super().__init__(cat, state, **kwargs)
+        self.capture = capture
+        self.block = block
+        self.audio_lo = audio_lo
+        self.audio_hi = audio_hi
+        self.bin_hz = bin_hz
+        self.db_per_s = db_per_s
+        self.bins_per_step = (audio_hi - audio_lo) // bin_hz
+        self.last_bins = {}       # dial freq -> per-bin power (dB) from the last visit
+        self.floors = {}          # dial freq -> qcx_cw_engine.NoiseFloor over its recent visits
+
+    @property
+    def span_hz(self):
+        return self.bins_per_step * self.bin_hz
+
+    def grid(self, center_mhz, width_khz):
+        # Dial frequencies stepping by one passband so the bins tile the range
+        span = self.span_hz
+        steps = int(width_khz * 2000 / span) + 1
+        start = int(center_mhz * 1e6 - (steps * span) / 2 - self.audio_lo)
+        return [start + i * span for i in range(steps)]
+
+    def column_freqs(self, dial_freqs):
+        # RF centre of every waterfall column produced by sweep()
+        return [f + self.audio_lo + (k + 0.5) * self.bin_hz
+                for f in dial_freqs for k in range(self.bins_per_step)]
+
+    def scan_channel(self, freq_hz):
+        import numpy as np
+        import qcx_graphs
+
+        info = self.channels.setdefault(freq_hz, ChannelInfo())
+        now = time.time()
+        if self._skip(info, now) and freq_hz in self.last_bins:
+            return self._to_s(self.last_bins[freq_hz], self.floors[freq_hz].floor)
+
+        if self.on_step:
+            self.on_step(freq_hz)
+        self.cat.call(self.cat.client.set_freq(freq_hz))
+        time.sleep(self.settle)
+        powers = qcx_graphs.bin_powers(self.capture.read(self.block), self.capture.rate,
+                                       self.audio_lo, self.audio_lo + self.span_hz, self.bin_hz)
+        self.fresh += 1
+        s_vals = self._to_s(powers, self._floor(freq_hz, powers))
+        peak = int(np.max(s_vals))
+        if peak > self.threshold:
+            if self.on_activity:
+                self.on_activity(freq_hz + self.audio_lo + (int(np.argmax(s_vals)) + 0.5) * self.bin_hz, peak, "")
+            info.quiet_count = 0
+        else:
+            info.quiet_count += 1
+        self.last_bins[freq_hz] = powers
+        info.last_s = peak
+        info.last_visit = time.time()
+        if self.on_sample:
+            for k, (s, db) in enumerate(zip(s_vals, powers)):
+                self.on_sample(int(freq_hz + self.audio_lo + (k + 0.5) * self.bin_hz), s, float(db), None)
+        return s_vals
+
+    def _floor(self, freq_hz, powers):
+        # Per-bin floor (dB) from this step's last few visits
+        if freq_hz not in self.floors:
+            import qcx_cw_engine
+            self.floors[freq_hz] = qcx_cw_engine.NoiseFloor(len(powers), depth=8, percentile=25,
+                                                            update_every=1, rayleigh=False)
+        return self.floors[freq_hz].update(powers)
+
+    def _to_s(self, powers, floor):
+        # dB above the noise, in S-units (0..9) for the waterfall. The noise is each
+        # bin's own floor, capped at the block median so a first visit (or a bin
+        # that has been busy every visit) still shows against the rest of the block
+        import numpy as np
+        rel = (powers - np.minimum(floor, np.median(powers))) / self.db_per_s
+        return np.clip(np.round(rel), 0, 9).astype(int).tolist()
+
+    def sweep(self, freqs_hz):
+        row = []
+        self.fresh = 0
+        for freq_hz in freqs_hz:
+            if not self.running:
+                break
+            row.extend(self.scan_channel(freq_hz))
+        return self._sweep_result(row, freqs_hz)
+
+
+class MemoryChannel:
+    def __init__(self, freq_hz, priority=1, label="", source="user"):
+        self.freq_hz = int(freq_hz)
+        self.priority = max(1, int(priority))
+        self.label = label
+        self.source = source
+        self.credit = 0
+        self.quiet_count = 0
+        self.locked_until = 0.0
+        self.last_s = 0
+
+
+class MemoryScanner:
+    # Memory-scan mode: cycles through a priority list instead of a linear grid.
+    # Channels come from radio presets (PS), the user's memory_channels.csv and
+    # frequencies where the activity DB recently saw signals. Higher priority
+    # channels are visited proportionally more often (smooth weighted round
+    # robin); a channel that stays quiet lockout_after visits in a row is locked
+    # out for lockout_time seconds, and lockouts persist in the skip list file.
+    def __init__(self, engine, lockout_after=5, lockout_time=600.0,
+                 channels_file="memory_channels.csv", skip_file="scan_skiplist.csv"):
+        self.engine = engine
+        self.lockout_after = lockout_after
+        self.lockout_time = lockout_time
+        self.channels_file = channels_file
+        self.skip_file = skip_file
+        self.channels = {}
+        self.skip = {}          # freq_hz -> locked until (0 = permanent, set by hand)
+        # The memory scanner does its own lockouts
+        engine.quiet_sweeps = 10 ** 9
+        self._load_skip_list()
+
+    # ---- channel list ----
+
+    def add_channel(self, freq_hz, priority=1, label="", source="user"):
+        freq_hz = int(freq_hz)
+        ch = self.channels.get(freq_hz)
+        if ch:
+            ch.priority = max(ch.priority, int(priority))
+        else:
+            self.channels[freq_hz] = MemoryChannel(freq_hz, priority, label, source)
+
+    def load_presets(self, priority=2):
+        try:
+            presets = self.engine.cat.call(self.engine.cat.client.read_presets())
+        except Exception as e:
+            print(f"Preset read error: {e}")
+            presets = []
+        for freq_hz in presets:
+            self.add_channel(freq_hz, priority, source="preset")
+        return len(presets)
+
+    def load_user_channels(self):
+        # CSV columns: Frequency (MHz), Priority, Label
+        if not os.path.exists(self.channels_file):
+            return 0
+        count = 0
+        with open(self.channels_file, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    self.add_channel(round(float(row["Frequency"]) * 1e6), row.get("Priority") or 3, row.get("Label", ""))
+                    count += 1
+                except (KeyError, ValueError):
+                    continue
+        return count
+
+    def load_recent_activity(self, activity_db, band, hours=24, priority=2):
+        hot = activity_db.hot_frequencies(band, hours=hours)
+        for freq_hz, hits in hot:
+            self.add_channel(freq_hz, priority + (1 if hits > 10 else 0), source="activity")
+        return len(hot)
+
+    # ---- skip list ----
+
+    def _load_skip_list(self):
+        if not os.path.exists(self.skip_file):
+            return
+        now = time.time()
+        with open(self.skip_file, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    until = float(row.get("Until") or 0)
+                    if until == 0 or until > now:
+                        self.skip[round(float(row["Frequency"]) * 1e6)] = until
+                except (KeyError, ValueError):
+                    continue
+
+    def _save_skip_list(self):
+        with open(self.skip_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Frequency", "Until"])
+            for freq_hz, until in sorted(self.skip.items()):
+                writer.writerow([f"{freq_hz / 1e6:.6f}", f"{until:.0f}"])
+
+    def _skipped(self, ch, now):
+        until = self.skip.get(ch.freq_hz)
+        if until is None:
+            return False
+        if until == 0 or until > now:
+            return True
+        del self.skip[ch.freq_hz]
+        return False
+
+    # ---- scanning ----
+
+    def next_channel(self):
+        now = time.time()
+        live = [ch for ch in self.channels.values() if not self._skipped(ch, now)]
+        if not live:
+            return None
+        total = 0
+        for ch in live:
+            ch.credit += ch.priority
+            total += ch.priority
+        best = max(live, key=lambda ch: ch.credit)
+        best.credit -= total
+        return best
+
+    def step(self):
+        # Visit one channel; returns it (or None if every channel is locked out)
+        ch = self.next_channel()
+        if ch is None:
+            return None
+        ch.last_s = self.engine.scan_channel(ch.freq_hz)
+        info = self.engine.channels.get(ch.freq_hz)
+        if info and info.quiet_count == 0:
+            ch.quiet_count = 0
+        else:
+            ch.quiet_count += 1
+            if ch.quiet_count >= self.lockout_after:
+                ch.quiet_count = 0
+                self.skip[ch.freq_hz] = time.time() + self.lockout_time
+                self._save_skip_list()
+        return ch
+
+    def cycle(self):
+        # One visit per channel on average; returns the S-values in frequency order
+        for _ in range(len(self.channels)):
+            if not self.engine.running:
+                break
+            if self.step() is None:
+                time.sleep(0.5)
+                break
+        return [self.channels[f].last_s for f in sorted(self.channels)]
@@ -0,0 +1,84 @@
+# qcx_text_pane.py
+# Bounded, batched text pane for long-running output (decoder, TB buffer, debug)
+# A drop-in ScrolledText whose append() can be called from any thread. Appends are
+# queued and inserted once per UI frame; the widget keeps only the last max_lines
+# lines and max_chars characters (trimmed in batches so Tk isn't deleting on every
+# insert; the character bound covers panes fed words with no newlines), while the
+# full history lives in a compact in-memory ring and, optionally, a file on disk.
+
+import queue
+import tkinter as tk
+from collections import deque
+from tkinter import scrolledtext
+
+FRAME_MS = 50
+
+
+class BoundedTextPane(scrolledtext.ScrolledText):
+    def __init__(self, master=None, max_lines=1000, trim_batch=200, max_chars=100000, trim_chars=20000,
+                 history_chunks=20000, history_file=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.max_lines = max_lines
+        self.trim_batch = trim_batch
+        self.max_chars = max_chars
+        self.trim_chars = trim_chars
+        self.chars = 0              # characters inserted since the last exact count
+        self.history = deque(maxlen=history_chunks)
+        self.history_file = open(history_file, "a", encoding="utf-8") if history_file else None
+        self.pending = queue.SimpleQueue()
+        self.flush_id = None
+        self.autoscroll = True
+        self.bind("<Destroy>", self._on_destroy, add="+")
+
+    def append(self, text):
+        # Thread-safe; shows up on the next UI frame
+        self.pending.put(text)
+        if self.flush_id is None:
+            try:
+                self.flush_id = self.after(FRAME_MS, self._flush)
+            except (RuntimeError, tk.TclError):
+                # Called from a worker thread before/after the main loop: flushed next time
+                self.flush_id = None
+
+    def _flush(self):
+        self.flush_id = None
+        parts = []
+        while True:
+            try:
+                parts.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        if not parts:
+            return
+        text = "".join(parts)
+        self.history.append(text)
+        if self.history_file:
+            self.history_file.write(text)
+            self.history_file.flush()
+
+        self.insert(tk.END, text)
+        lines = int(self.index("end-1c").split(".")[0])
+        if lines > self.max_lines + self.trim_batch:
+            self.delete("1.0", f"{lines - self.max_lines + 1}.0")
+        self.chars += len(text)
+        if self.chars > self.max_chars + self.trim_chars:
+            self.chars = (self.count("1.0", "end-1c", "chars") or (0,))[0]
+            if self.chars > self.max_chars:
+                self.delete("1.0", f"1.0 + {self.chars - self.max_chars} chars")
+                self.chars = self.max_chars
+        if self.autoscroll:
+            self.see(tk.END)
+
+    def history_text(self):
+        # Everything still held in the in-memory ring (older text is on disk, if enabled)
+        return "".join(self.history)
+
+    def clear(self):
+        self.delete("1.0", tk.END)
+        self.chars = 0
+        self.history.clear()
+
+    def _on_destroy(self, event):
+        if event.widget is self and self.history_file:
+            self.history_file.close()
+            self.history_file = None
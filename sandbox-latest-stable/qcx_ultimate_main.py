@@ -2,23 +2,63 @@
 # QCX-mini / QMX / QMX+ ULTIMATE CAT CONTROL by AJ6BC + Grok
 # Main window: All controls, CAT, scanning, messages, FT8 launch, etc.
 # Graphs are in separate file qcx_graphs.py
+# The graphs, CW decoder and recorder (numpy / scipy / pyaudio) are
+# imported when their windows are first opened, so the CAT window comes up fast.
+#   python qcx_ultimate_main.py [--port COM3] [--import-times]
 
-import serial
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
 import time
 import subprocess
 import platform
-import pyaudio
-import csv
+import sys
 from datetime import datetime
 
-# Import graphs module
-import qcx_graphs
+# Shared pipelined CAT connection
+import qcx_cat_client
 
-# Import the CW decoder window
-import qcx_cw_decoder
+# Radio state model (labels update only on change)
+import qcx_radio_state
+
+# Per-field adaptive polling
+import qcx_poll_scheduler
+
+# Push-mode updates where the firmware supports auto-information
+import qcx_auto_info
+
+# Adaptive-dwell scan engine
+import qcx_scanner
+
+# Persistent band activity history
+import qcx_activity_db
+
+# CAT traffic trace (ring buffer + NDJSON file)
+import qcx_cat_trace
+
+# Recorded traces standing in for the radio ("replay:<file>" as the port)
+import qcx_cat_replay
+
+# WebSocket API for remote front-ends
+import qcx_ws_server
+
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+
+# rigctld-protocol bridge so WSJT-X and loggers share our CAT connection
+import qcx_rigctld
+
+# Extra radios (own CAT worker / scheduler / state each) and coordinated scans
+import qcx_multi_radio
+
+# Indexed append-only QSO log
+import qcx_logbook
+
+# Callsign spotting in the decode stream
+import qcx_callsign
+
+# Bounded, batched text panes
+import qcx_text_pane
 
 class QCXUltimateGUI:
     def __init__(self, root):
@@ -49,13 +89,22 @@ class QCXUltimateGUI:
 
         frame = self.main_frame
 
-        self.ser = None
+        self.cat = None
+        self.radio_state = qcx_radio_state.RadioState()
+        self.radio_state.subscribe(self.on_state_change)
+        self.scheduler = None
+        self.auto_info = None
         self.tx_timer = None
         self.debug_window = None
         self.debug_active = False
+        self.cat_trace = qcx_cat_trace.TraceRecorder()
+        self.api = None
+        self.rigctld = None
+        self.radio_manager = None
         self.poll_interval = 1000
         self.scanning = False
         self.scan_thread = None
+        self.scan_engine = None
         self.activity_detected = False
         self.waterfall_data = []
         self.max_waterfall_rows = 50
@@ -67,12 +116,20 @@ class QCXUltimateGUI:
         self.continuous_waterfall = False
         self.continuous_thread = None
 
+        self.recorder = None
+        self.audio_input = ""       # radio audio input chosen in the decoder / graphs window
+        self.activity_db = qcx_activity_db.ActivityDB()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.device_var = tk.StringVar(value="QCX")
         self.variant_var = tk.StringVar(value="Low")
 
         # QSL logging
         self.qsl_log_file = "qsl_log.csv"
+        self.logbook = qcx_logbook.Logbook(self.qsl_log_file)
         self.last_decoded_call = ""  # Auto-fill from decoder
+        # One recognizer per text source, so TB and audio characters don't interleave
+        self.call_recognizers = {}
 
         # Disclaimer
         disclaimer = tk.Label(frame, text="This is an experimental CAT interface; use at your own risk. I am 100% indemnified from any damages whatsoever.",
@@ -101,6 +158,15 @@ class QCXUltimateGUI:
         self.debug_var = tk.BooleanVar()
         tk.Checkbutton(top_frame, text="Debug Console", variable=self.debug_var, command=self.toggle_debug,
                        bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT, padx=20)
+        self.trace_var = tk.BooleanVar()
+        tk.Checkbutton(top_frame, text="Trace CAT", variable=self.trace_var, command=self.toggle_trace,
+                       bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT)
+        self.api_var = tk.BooleanVar()
+        tk.Checkbutton(top_frame, text="Network API", variable=self.api_var, command=self.toggle_api,
+                       bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT, padx=10)
+        self.rigctld_var = tk.BooleanVar()
+        tk.Checkbutton(top_frame, text="Rig Bridge", variable=self.rigctld_var, command=self.toggle_rigctld,
+                       bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT)
 
         tk.Label(top_frame, text="Polling:", fg="cyan", bg="#1a1a1a", font=("Arial", 12)).pack(side=tk.LEFT, padx=10)
         self.poll_label = tk.Label(top_frame, text="1.0 s", fg="white", bg="#1a1a1a", font=("Arial", 12))
@@ -213,8 +279,10 @@ class QCXUltimateGUI:
         # CW Decode Buffer
         tb_frame = tk.LabelFrame(frame, text="CW DECODE BUFFER (TB)", fg="cyan", bg="#1a1a1a")
         tb_frame.pack(pady=10, fill=tk.BOTH, expand=True, padx=20)
-        self.tb_text = scrolledtext.ScrolledText(tb_frame, height=8, font=("Courier", 12), bg="#000000", fg="#00ff00")
+        self.tb_text = qcx_text_pane.BoundedTextPane(tb_frame, max_lines=500, height=8, font=("Courier", 12), bg="#000000", fg="#00ff00")
         self.tb_text.pack(fill=tk.BOTH, expand=True)
+        self.call_label = tk.Label(tb_frame, text="Last call: -", fg="white", bg="#1a1a1a", font=("Arial", 12, "bold"))
+        self.call_label.pack(anchor="w")
 
         # CW Scan
         scan_frame = tk.LabelFrame(frame, text="CW SCAN (Listen for activity)", fg="cyan", bg="#1a1a1a")
@@ -222,12 +290,12 @@ class QCXUltimateGUI:
         tk.Label(scan_frame, text="Band:", fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
         self.scan_band_var = tk.StringVar(value="40m")
         ttk.Combobox(scan_frame, textvariable=self.scan_band_var, values=bands, width=6).pack(side=tk.LEFT, padx=5)
-        tk.Label(scan_frame, text="Delay (s):", fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
+        tk.Label(scan_frame, text="Dwell (s):", fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
         self.scan_delay_var = tk.DoubleVar(value=2.0)
         tk.Spinbox(scan_frame, from_=0.1, to=10.0, increment=0.1, textvariable=self.scan_delay_var, width=5).pack(side=tk.LEFT, padx=5)
         tk.Label(scan_frame, text="Width:", fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
         self.scan_width_var = tk.StringVar(value="±50 kHz")
-        ttk.Combobox(scan_frame, textvariable=self.scan_width_var, values=["±10 kHz", "±50 kHz", "±100 kHz", "Full Band"], width=10).pack(side=tk.LEFT, padx=5)
+        ttk.Combobox(scan_frame, textvariable=self.scan_width_var, values=["±10 kHz", "±50 kHz", "±100 kHz", "Full Band", "Memory"], width=10).pack(side=tk.LEFT, padx=5)
         tk.Label(scan_frame, text="Step (kHz):", fg="white", bg="#1a1a1a").pack(side=tk.LEFT, padx=10)
         self.scan_step_var = tk.StringVar(value="5")
         ttk.Combobox(scan_frame, textvariable=self.scan_step_var, values=["1", "2", "5", "10"], width=4).pack(side=tk.LEFT, padx=5)
@@ -238,6 +306,12 @@ class QCXUltimateGUI:
         self.scan_button.pack(side=tk.LEFT, padx=20)
         self.scan_status_label = tk.Label(scan_frame, text="Scan stopped", fg="gray", bg="#1a1a1a", font=("Arial", 12))
         self.scan_status_label.pack(side=tk.LEFT)
+        self.audio_scan_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(scan_frame, text="Audio (wideband)", variable=self.audio_scan_var,
+                       bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT, padx=10)
+        self.record_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(scan_frame, text="Record Activity", variable=self.record_var, command=self.toggle_recorder,
+                       bg="#1a1a1a", fg="yellow", selectcolor="#333333").pack(side=tk.LEFT, padx=10)
 
         # Continuous Waterfall Button
         self.cont_waterfall_btn = tk.Button(frame, text="CONTINUOUS WATERFALL", command=self.toggle_continuous_waterfall,
@@ -259,6 +333,11 @@ class QCXUltimateGUI:
                                bg="#00ff00", fg="black", font=("Arial", 14, "bold"), height=2)
         graphs_btn.pack(pady=10, fill=tk.X, padx=50)
 
+        # Multi-Radio Button
+        multi_btn = tk.Button(frame, text="MULTI-RADIO (Dashboard + Coordinated Scan)", command=self.open_multi_radio_window,
+                              bg="#aa00ff", fg="white", font=("Arial", 14, "bold"), height=2)
+        multi_btn.pack(pady=10, fill=tk.X, padx=50)
+
         # FT8 Section
         ft8_frame = tk.LabelFrame(frame, text="FT8 / DIGITAL MODES (WSJT-X)", fg="cyan", bg="#1a1a1a")
         ft8_frame.pack(pady=15, fill=tk.X, padx=20)
@@ -266,8 +345,6 @@ class QCXUltimateGUI:
                  fg="yellow", bg="#1a1a1a", justify=tk.LEFT, font=("Arial", 11)).pack(pady=5)
         tk.Button(ft8_frame, text="LAUNCH WSJT-X", command=self.launch_wsjtx, bg="#00aaff", fg="white", font=("Arial", 14, "bold")).pack(pady=10)
 
-        self.poll_status()
-
     def open_qsl_log_window(self):
         log_win = tk.Toplevel(self.root)
         log_win.title("QSL Log Entry")
@@ -312,25 +389,38 @@ class QCXUltimateGUI:
                 "RST Sent": rst_sent.get(),
                 "RST Received": rst_rcvd.get()
             }
-            with open(self.qsl_log_file, "a", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=entry.keys())
-                if f.tell() == 0:
-                    writer.writeheader()
-                writer.writerow(entry)
-            messagebox.showinfo("QSL Logged", "Entry saved to qsl_log.csv")
+            dupe = self.logbook.append(entry)
+            for recognizer in self.call_recognizers.values():
+                recognizer.add_worked(entry["Callsign"])
+            note = "\n(DUPE: already worked on this band/mode)" if dupe else ""
+            messagebox.showinfo("QSL Logged", f"Entry saved to {self.qsl_log_file}{note}")
             log_win.destroy()
 
+        def check_call(event=None):
+            call = call_entry.get().strip()
+            if call and self.logbook.worked_before(call):
+                worked_label.config(text=f"Worked before ({len(self.logbook.by_call[call.upper()])} QSOs)", fg="#ff8800")
+            else:
+                worked_label.config(text="", fg="#00ff00")
+
+        worked_label = tk.Label(log_win, text="", fg="#00ff00", bg="#1a1a1a", font=("Arial", 11))
+        worked_label.pack()
+        call_entry.bind("<KeyRelease>", check_call)
+        check_call()
+
         tk.Button(log_win, text="Save QSL Log", command=save_log, bg="#00ff00", fg="black", font=("Arial", 12, "bold")).pack(pady=20)
 
         # View recent logs
         view_btn = tk.Button(log_win, text="View Last 10 Logs", command=self.view_qsl_logs, bg="#0088ff", fg="white")
         view_btn.pack(pady=10)
+        tk.Button(log_win, text="Export ADIF", command=self.export_adif, bg="#0088ff", fg="white").pack(pady=5)
 
     def view_qsl_logs(self):
         try:
-            with open(self.qsl_log_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()[-10:]  # last 10
-            log_text = "".join(lines)
+            rows = self.logbook.tail(10)
+            if not rows:
+                raise FileNotFoundError(self.qsl_log_file)
+            log_text = ",".join(qcx_logbook.FIELDS) + "\n" + "".join(",".join(r.get(k, "") for k in qcx_logbook.FIELDS) + "\n" for r in rows)
             log_win = tk.Toplevel(self.root)
             log_win.title("Recent QSL Logs")
             log_win.geometry("600x400")
@@ -340,6 +430,13 @@ class QCXUltimateGUI:
         except Exception as e:
             messagebox.showerror("Error", f"No log file or error reading: {e}")
 
+    def export_adif(self):
+        path = filedialog.asksaveasfilename(defaultextension=".adi", filetypes=[("ADIF", "*.adi")])
+        if not path:
+            return
+        count = self.logbook.export_adif(path)
+        messagebox.showinfo("ADIF Export", f"Exported {count} QSOs to {path}")
+
     def on_device_change(self, event=None):
         device = self.device_var.get()
         if device == "QMX+":
@@ -350,28 +447,56 @@ class QCXUltimateGUI:
             self.update_bands()
 
     def open_graphs_window(self):
+        # Graphs module (numpy / scipy / pyaudio) is loaded on first use
+        import qcx_graphs
         qcx_graphs.open_graphs(self)
 
+    def open_multi_radio_window(self):
+        qcx_multi_radio.open_multi_radio(self)
+
     def open_cw_decoder_window(self):
+        # CW decoder window (numpy / pyaudio) is loaded on first use
+        import qcx_cw_decoder
         qcx_cw_decoder.open_cw_decoder(self)
 
     def connect(self):
-        if self.ser:
-            self.ser.close()
+        if self.auto_info:
+            self.auto_info.stop()
+            self.auto_info = None
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler = None
+        if self.cat:
+            self.cat.close()
+            self.cat = None
         try:
             baud = 38400
-            self.ser = serial.Serial(self.port_var.get(), baud, timeout=1)
-            self.status_label.config(text="CONNECTED", fg="#00ff00")
+            replay = qcx_cat_replay.parse_port(self.port_var.get())
+            if replay:
+                self.cat = qcx_cat_replay.open_replay(*replay)
+            else:
+                self.cat = qcx_cat_client.open_serial(self.port_var.get(), baud)
+            self.cat.client.trace = self.cat_trace
+            self.status_label.config(text="REPLAY" if replay else "CONNECTED", fg="#00ff00")
             self.send_cmd('QU1')
             self.send_cmd('TB1')
+            self.scheduler = qcx_poll_scheduler.PollScheduler(self.cat, self.radio_state, on_poll=self.on_poll)
+            self.scheduler.set_scale(self.poll_interval / 1000)
+            self.scheduler.start()
+            if self.api:
+                self.api.attach(self.cat, self.scheduler)
+            if self.rigctld:
+                self.rigctld.attach(self.cat, self.scheduler)
+            self.auto_info = qcx_auto_info.AutoInfoReader(self.cat, self.radio_state, self.scheduler)
+            if self.auto_info.start():
+                self.status_label.config(text="REPLAY (AI)" if replay else "CONNECTED (AI)", fg="#00ff00")
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
     def send_cmd(self, cmd):
-        if not self.ser: return "?"
+        if not self.cat: return "?"
         try:
-            self.ser.write((cmd + ';').encode())
-            resp = self.ser.read_until(b';').decode().strip()
+            resp = self.cat.send_cmd(cmd)
             self.debug_print(f"> {cmd};   ← {resp}")
             return resp
         except Exception as e:
@@ -382,56 +507,82 @@ class QCXUltimateGUI:
         interval = self.poll_var.get()
         self.poll_interval = int(interval * 1000)
         self.poll_label.config(text=f"{interval:.1f} s")
-        if hasattr(self, 'poll_id'):
-            self.root.after_cancel(self.poll_id)
-        self.poll_status()
+        if self.scheduler:
+            self.scheduler.set_scale(interval)
 
     def poll_status(self):
-        if self.ser:
-            fa_resp = self.send_cmd('FA')
-            if fa_resp.startswith('FA'):
-                vfoa = int(fa_resp[2:13]) / 1e6
-                self.vfoa_label.config(text=f"VFO A: {vfoa:.6f} MHz")
-
-            fb_resp = self.send_cmd('FB')
-            if fb_resp.startswith('FB'):
-                vfob = int(fb_resp[2:13]) / 1e6
-                self.vfob_label.config(text=f"VFO B: {vfob:.6f} MHz")
-
-            if_resp = self.send_cmd('IF')
-            if if_resp.startswith('IF') and len(if_resp) >= 32:
-                rit = int(if_resp[18:23]) if if_resp[18:23].strip() else 0
-                self.rit_label.config(text=f"RIT: {rit:+} Hz")
-
-            s_meter = if_resp[29] if len(if_resp) > 29 and if_resp[29].isdigit() else "0"
-            self.s_meter_label.config(text=f"S-Meter: S{s_meter}")
-
-            ft_resp = self.send_cmd('FT')
-            if ft_resp == 'FT0':
+        # Ask the scheduler for an immediate refresh of every field
+        if self.scheduler:
+            self.scheduler.poll_now()
+
+    def on_poll(self, results):
+        # Called on the scheduler thread after each batch
+        if self.debug_active:
+            line = "> " + "; ".join(f"{q}={'-' if r is None else r}" for q, r in results.items())
+            self.root.after(0, lambda: self.debug_print(line))
+
+    def on_state_change(self, field, value):
+        # Widgets only change when the radio state does; updates from worker
+        # threads are handed to the Tk thread
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, lambda: self.on_state_change(field, value))
+            return
+        if field == 'vfo_a':
+            self.vfoa_label.config(text=f"VFO A: {value / 1e6:.6f} MHz")
+        elif field == 'vfo_b':
+            self.vfob_label.config(text=f"VFO B: {value / 1e6:.6f} MHz")
+        elif field == 'rit':
+            self.rit_label.config(text=f"RIT: {value:+} Hz")
+        elif field == 's_meter':
+            self.s_meter_label.config(text=f"S-Meter: S{value}")
+        elif field == 'split':
+            if value == 0:
                 self.mode_label.config(text="Mode: VFO A", fg="#00ff00")
-            elif ft_resp == 'FT1':
+            elif value == 1:
                 self.mode_label.config(text="Mode: VFO B", fg="#ff8800")
-            elif ft_resp == 'FT2':
+            elif value == 2:
                 self.mode_label.config(text="Mode: SPLIT", fg="#ff0000")
-
-            tb_resp = self.send_cmd('TB')
-            if tb_resp.startswith('TB') and len(tb_resp) > 4:
-                decoded = tb_resp[2:].strip()
-                if decoded and decoded != "000" and not decoded.isdigit():
-                    self.tb_text.insert(tk.END, decoded + " ")
-                    self.tb_text.see(tk.END)
-                    if self.scanning:
-                        self.activity_detected = True
-
-        self.poll_id = self.root.after(self.poll_interval, self.poll_status)
+        elif field == 'tb_text':
+            if self.radio_state.vfo_a:
+                self.activity_db.add(self.radio_state.vfo_a, self.radio_state.s_meter, text=value)
+            self.tb_text.append(value + " ")
+            self.on_decoded_text(value)
+            if self.scanning:
+                self.activity_detected = True
+
+    def on_decoded_text(self, text, source="TB"):
+        # Decoded characters from TB or the audio decoder (any thread)
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, lambda: self.on_decoded_text(text, source))
+            return
+        if self.api:
+            self.api.publish_decode(text, source)
+        band = qcx_activity_db.band_for(self.radio_state.vfo_a) if self.radio_state.vfo_a else None
+        recognizer = self.call_recognizers.get(source)
+        if recognizer is None:
+            recognizer = self.call_recognizers[source] = qcx_callsign.CallsignRecognizer(self.logbook)
+        for event in recognizer.feed(text, band):
+            self.last_decoded_call = event.call
+            if event.dupe:
+                status, color = "DUPE", "#888888"
+            elif event.needed:
+                status, color = "NEEDED", "#ff00ff"
+            elif event.worked:
+                status, color = "worked", "#ffff00"
+            else:
+                status, color = "NEW", "#00ff00"
+            entity = f" ({event.entity})" if event.entity else ""
+            self.call_label.config(text=f"Last call: {event.call}{entity}  {status}  [{event.context.upper()}]", fg=color)
 
     def toggle_scan(self):
         if self.scanning:
             self.scanning = False
+            if self.scan_engine:
+                self.scan_engine.stop()
             self.scan_button.config(text="START SCAN", bg="#00ff88")
             self.scan_status_label.config(text="Scan stopped", fg="gray")
         else:
-            if not self.ser:
+            if not self.cat:
                 messagebox.showwarning("Not connected", "Connect to radio first!")
                 return
             self.scanning = True
@@ -446,6 +597,10 @@ class QCXUltimateGUI:
         center_freq = self.band_freqs.get(band, 7.030)
         width_str = self.scan_width_var.get()
 
+        if width_str == "Memory":
+            self.memory_scan_loop(band)
+            return
+
         if width_str == "Full Band" and band == "40m":
             center_freq = 7.150
             width_khz = 150
@@ -455,47 +610,113 @@ class QCXUltimateGUI:
             width_khz = int(width_str.replace("±", "").replace(" kHz", ""))
 
         step_khz = int(self.scan_step_var.get())
-        steps = int((width_khz * 2) / step_khz) + 1
-        delay = self.scan_delay_var.get()
         threshold = self.activity_threshold_var.get()
+        dwell = self.scan_delay_var.get()
+        capture = None
+
+        if self.audio_scan_var.get():
+            # Each step covers the whole audio passband; the waterfall gets one
+            # column per FFT bin
+            try:
+                capture = qcx_scanner.AudioCapture(self.audio_input_index())
+            except Exception as e:
+                self.root.after(0, lambda err=e: messagebox.showerror("Audio Error", f"Cannot open audio input:\n{err}"))
+                self.root.after(0, self.toggle_scan)
+                return
+            engine = qcx_scanner.AudioScanEngine(self.cat, capture, self.radio_state,
+                                                 threshold=threshold, active_dwell=dwell)
+            freqs = engine.grid(center_freq, width_khz)
+            cols = engine.column_freqs(freqs)
+            self.scan_center = (cols[0] + cols[-1]) / 2e6
+            self.scan_steps = len(cols)
+            self.scan_step_khz = engine.bin_hz / 1000
+        else:
+            freqs = qcx_scanner.scan_grid(center_freq, width_khz, step_khz)
+            self.scan_center = center_freq
+            self.scan_steps = len(freqs)
+            self.scan_step_khz = step_khz
+
+            # Dwell is spent only on channels with a signal; quiet ones get a short settle
+            engine = qcx_scanner.ScanEngine(self.cat, self.radio_state,
+                                            threshold=threshold, active_dwell=dwell)
+        engine.on_step = self.on_scan_step
+        engine.on_activity = self.on_scan_activity
+        engine.on_sample = self.activity_db.add
+        engine.activity_hook = lambda: self.activity_detected
+        engine.running = True
+        self.scan_engine = engine
 
-        self.scan_center = center_freq
-        self.scan_steps = steps
-        self.scan_step_khz = step_khz
+        while self.scanning:
+            scan_s_values = engine.sweep(freqs)
+            self.root.after(0, lambda: self.scan_status_label.config(text="Scanning...", fg="#00ff00"))
+            if scan_s_values:
+                self.add_waterfall_row(scan_s_values, self.scan_center * 1e6 - (self.scan_steps // 2) * self.scan_step_khz * 1000,
+                                       self.scan_step_khz * 1000)
+        if capture:
+            capture.close()
+
+    def memory_scan_loop(self, band):
+        engine = qcx_scanner.ScanEngine(self.cat, self.radio_state,
+                                        threshold=self.activity_threshold_var.get(),
+                                        active_dwell=self.scan_delay_var.get())
+        engine.on_step = self.on_scan_step
+        engine.on_activity = self.on_scan_activity
+        engine.on_sample = self.activity_db.add
+        engine.activity_hook = lambda: self.activity_detected
+        engine.running = True
+        self.scan_engine = engine
+
+        memory = qcx_scanner.MemoryScanner(engine)
+        memory.load_presets()
+        memory.load_user_channels()
+        memory.load_recent_activity(self.activity_db, band)
+        if not memory.channels:
+            self.root.after(0, lambda: messagebox.showinfo("Memory Scan", "No channels: add some to memory_channels.csv\n(Frequency,Priority,Label) or run a band scan first."))
+            self.root.after(0, self.toggle_scan)
+            return
+        self.scan_steps = 0
 
         while self.scanning:
-            scan_s_values = []
-            for i in range(steps):
-                if not self.scanning: break
-                self.activity_detected = False
-                offset = (i - steps // 2) * step_khz * 1000
-                freq_hz = int(center_freq * 1e6 + offset)
-                cmd = f'FA{str(freq_hz).zfill(11)}'
-                self.send_cmd(cmd)
-                self.root.after(0, lambda f=freq_hz/1e6: self.freq_entry.delete(0, tk.END) or self.freq_entry.insert(0, f"{f:.6f}"))
-                time.sleep(delay)
-                s_text = self.s_meter_label.cget("text")
-                if "S-Meter: S" in s_text:
-                    s_str = s_text.split("S-Meter: S")[1].strip()
-                    s_val = int(s_str) if s_str.isdigit() else 0
-                else:
-                    s_val = 0
-                scan_s_values.append(s_val)
-                if s_val > threshold or self.activity_detected:
-                    self.scan_status_label.config(text="Activity detected! Pausing...", fg="#ff8800")
-                    time.sleep(10)
-                    self.scan_status_label.config(text="Scanning...", fg="#00ff00")
+            scan_s_values = memory.cycle()
+            self.root.after(0, lambda: self.scan_status_label.config(text=f"Memory scan ({len(memory.channels)} ch, {len(memory.skip)} skipped)", fg="#00ff00"))
             if scan_s_values:
-                self.waterfall_data.append(scan_s_values)
-                if len(self.waterfall_data) > self.max_waterfall_rows:
-                    self.waterfall_data.pop(0)
+                # Memory channels aren't evenly spaced
+                self.add_waterfall_row(scan_s_values, min(memory.channels), 0.0)
+
+    def on_scan_step(self, freq_hz):
+        self.activity_detected = False
+        self.root.after(0, lambda f=freq_hz/1e6: self.freq_entry.delete(0, tk.END) or self.freq_entry.insert(0, f"{f:.6f}"))
+
+    def on_scan_activity(self, freq_hz, s_val, text):
+        self.root.after(0, lambda: self.scan_status_label.config(text="Activity detected! Listening...", fg="#ff8800"))
+        if self.recorder:
+            self.recorder.trigger(freq_hz / 1e6, s_val)
+
+    def toggle_recorder(self):
+        if self.record_var.get():
+            try:
+                import qcx_recorder
+                self.recorder = qcx_recorder.ActivityRecorder(self.audio_input_index())
+                self.recorder.start()
+            except Exception as e:
+                self.recorder = None
+                self.record_var.set(False)
+                messagebox.showerror("Recorder Error", f"Cannot open audio input:\n{e}")
+        elif self.recorder:
+            self.recorder.stop()
+            self.recorder = None
+
+    def audio_input_index(self):
+        # PortAudio index of the radio's audio input (None = system default)
+        import qcx_audio_devices
+        return qcx_audio_devices.find(self.audio_input) if self.audio_input else None
 
     def toggle_continuous_waterfall(self):
         if self.continuous_waterfall:
             self.continuous_waterfall = False
             self.cont_waterfall_btn.config(text="CONTINUOUS WATERFALL", bg="#00aa00")
         else:
-            if not self.ser:
+            if not self.cat:
                 messagebox.showwarning("Not connected", "Connect to radio first!")
                 return
             self.continuous_waterfall = True
@@ -506,19 +727,28 @@ class QCXUltimateGUI:
 
     def continuous_waterfall_loop(self):
         while self.continuous_waterfall:
-            if not self.ser:
+            if not self.cat:
                 break
-            if_resp = self.send_cmd('IF')
-            if if_resp.startswith('IF') and len(if_resp) >= 32:
-                s_meter = if_resp[29] if if_resp[29].isdigit() else "0"
-                s_val = int(s_meter)
-                self.waterfall_data.append([s_val])
-                if len(self.waterfall_data) > self.max_waterfall_rows:
-                    self.waterfall_data.pop(0)
+            info = qcx_cat_client.parse_frame(self.send_cmd('IF'))
+            if isinstance(info, qcx_cat_client.IFStatus):
+                self.radio_state.apply(info)
+                s_val = info.s_meter
+                self.activity_db.add(info.freq_hz, s_val)
+                self.add_waterfall_row([s_val], info.freq_hz, 0.0)
+                if self.recorder and s_val > self.activity_threshold_var.get():
+                    self.recorder.trigger(info.freq_hz / 1e6, s_val)
             time.sleep(0.5)
 
+    def add_waterfall_row(self, row, start_hz, step_hz):
+        # One waterfall row (S-values by column) for the graphs window and API clients
+        self.waterfall_data.append(row)
+        if len(self.waterfall_data) > self.max_waterfall_rows:
+            self.waterfall_data.pop(0)
+        if self.api:
+            self.api.publish_waterfall(row, start_hz, step_hz)
+
     def vfo_bump(self, hz):
-        if not self.ser:
+        if not self.cat:
             messagebox.showwarning("Not connected", "Connect to radio first!")
             return
         vfo = self.vfo_select_var.get()
@@ -527,25 +757,27 @@ class QCXUltimateGUI:
         else:
             cmd = f'RD{abs(hz):04d}'
         self.send_cmd(cmd)
+        if self.scheduler:
+            self.scheduler.boost()
         self.root.after(100, self.poll_status)
 
     def set_vfo(self, vfo):
         if vfo == "A":
             self.send_cmd('FT0')
-            self.mode_label.config(text="Mode: VFO A", fg="#00ff00")
+            self.radio_state.set('split', 0)
         elif vfo == "B":
             self.send_cmd('FT1')
-            self.mode_label.config(text="Mode: VFO B", fg="#ff8800")
+            self.radio_state.set('split', 1)
         self.root.after(100, self.poll_status)
 
     def toggle_split(self):
         current = self.send_cmd('FT')
         if current == 'FT2':
             self.send_cmd('FT0')
-            self.mode_label.config(text="Mode: VFO A", fg="#00ff00")
+            self.radio_state.set('split', 0)
         else:
             self.send_cmd('FT2')
-            self.mode_label.config(text="Mode: SPLIT", fg="#ff0000")
+            self.radio_state.set('split', 2)
         self.root.after(100, self.poll_status)
 
     def toggle_practice(self):
@@ -577,6 +809,8 @@ class QCXUltimateGUI:
             vfo = self.vfo_select_var.get()
             cmd = f'FA{str(freq_hz).zfill(11)}' if vfo == "A" else f'FB{str(freq_hz).zfill(11)}'
             self.send_cmd(cmd)
+            if self.scheduler:
+                self.scheduler.boost()
         except: pass
 
     def rit_adjust(self, step):
@@ -621,7 +855,7 @@ class QCXUltimateGUI:
                 self.debug_window = tk.Toplevel(self.root)
                 self.debug_window.title("Debug Console")
                 self.debug_window.geometry("800x400")
-                self.debug_text = scrolledtext.ScrolledText(self.debug_window, font=("Courier", 10), bg="#000000", fg="#00ff00")
+                self.debug_text = qcx_text_pane.BoundedTextPane(self.debug_window, max_lines=2000, font=("Courier", 10), bg="#000000", fg="#00ff00")
                 self.debug_text.pack(fill=tk.BOTH, expand=True)
             self.debug_active = True
         else:
@@ -630,27 +864,79 @@ class QCXUltimateGUI:
                 self.debug_window = None
             self.debug_active = False
 
+    def toggle_api(self):
+        if self.api_var.get():
+            try:
+                self.api = qcx_ws_server.APIServer(self.radio_state, API_HOST, API_PORT)
+                self.api.start()
+                self.api.attach(self.cat, self.scheduler)
+                self.debug_print(f"Network API on ws://{API_HOST}:{API_PORT}")
+            except OSError as e:
+                self.api = None
+                self.api_var.set(False)
+                messagebox.showerror("Network API", f"Cannot start the API server:\n{e}")
+        elif self.api:
+            self.api.stop()
+            self.api = None
+
+    def toggle_trace(self):
+        # Traffic always goes to the in-memory ring; this adds the NDJSON file
+        if self.trace_var.get():
+            path = f"cat_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ndjson"
+            self.cat_trace.open(path)
+            self.debug_print(f"CAT trace -> {path}")
+        else:
+            self.cat_trace.stop_file()
+            self.debug_print(qcx_cat_trace.format_histograms(self.cat_trace.histograms))
+
     def debug_print(self, text):
         if self.debug_active and self.debug_window:
-            self.debug_text.insert(tk.END, text + "\n")
-            self.debug_text.see(tk.END)
+            self.debug_text.append(text + "\n")
 
     def update_bands(self):
-        device = self.device_var.get()
-        if device == "QMX+":
-            self.supported_bands = list(self.band_freqs.keys())
-        elif device == "QMX":
-            variant = self.variant_var.get()
-            if variant == "Low":
-                self.supported_bands = ["80m", "60m", "40m", "30m", "20m"]
-            elif variant == "Mid":
-                self.supported_bands = ["60m", "40m", "30m", "20m", "17m", "15m"]
-            elif variant == "High":
-                self.supported_bands = ["20m", "17m", "15m", "12m", "11m", "10m"]
-        else:
-            self.supported_bands = list(self.band_freqs.keys())
+        self.supported_bands = qcx_multi_radio.device_bands(self.device_var.get(), self.variant_var.get())
+
+    def on_close(self):
+        self.scanning = False
+        self.continuous_waterfall = False
+        if self.recorder:
+            self.recorder.stop()
+        self.activity_db.close()
+        self.logbook.close()
+        if self.cat:
+            self.cat.close()
+        self.cat_trace.close()
+        if self.api:
+            self.api.stop()
+        if self.rigctld:
+            self.rigctld.stop()
+        if self.radio_manager:
+            self.radio_manager.stop_all()
+        self.root.destroy()
+
+    def toggle_rigctld(self):
+        if self.rigctld_var.get():
+            try:
+                self.rigctld = qcx_rigctld.RigctlBridge(self.radio_state)
+                self.rigctld.start()
+                self.rigctld.attach(self.cat, self.scheduler)
+                self.debug_print(f"rigctld bridge on {self.rigctld.host}:{self.rigctld.port}")
+            except Exception as e:
+                self.rigctld = None
+                self.rigctld_var.set(False)
+                messagebox.showerror("Rig Bridge", f"Cannot start the rigctld bridge:\n{e}")
+        elif self.rigctld:
+            self.rigctld.stop()
+            self.rigctld = None
 
     def launch_wsjtx(self):
+        # WSJT-X talks to the radio through the bridge instead of opening the serial port
+        if not self.rigctld:
+            self.rigctld_var.set(True)
+            self.toggle_rigctld()
+        if self.rigctld:
+            messagebox.showinfo("WSJT-X", "In WSJT-X Settings > Radio choose Rig \"Hamlib NET rigctl\", "
+                                f"Network Server {self.rigctld.host}:{self.rigctld.port}, PTT Method CAT.")
         try:
             if platform.system() == "Windows":
                 subprocess.Popen(["wsjtx"])
@@ -661,7 +947,31 @@ class QCXUltimateGUI:
         except Exception as e:
             messagebox.showerror("Launch Error", f"Could not launch WSJT-X: {e}\nInstall WSJT-X and ensure it's in PATH.")
 
+def import_report(modules=("qcx_ultimate_main", "qcx_graphs", "qcx_cw_decoder", "qcx_recorder"), top=25):
+    # -X importtime breakdown, measured in a fresh interpreter so nothing is cached
+    for module in modules:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              capture_output=True, text=True)
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+        failed = proc.returncode != 0 and (proc.stderr.strip().splitlines() or ["?"])[-1]
+        total = next((r[0] for r in rows if r[2].strip() == module), sum(r[1] for r in rows))
+        print(f"import {module}: {total / 1000:.1f} ms" + (f"  ({failed})" if failed else ""))
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+            print(f"  {cumulative_us / 1000:9.1f} ms cumulative {self_us / 1000:8.1f} ms self  {name}")
+
+
 if __name__ == "__main__":
+    if "--import-times" in sys.argv:
+        import_report()
     root = tk.Tk()
     app = QCXUltimateGUI(root)
+    if "--port" in sys.argv:
+        # Connect as soon as the window is up
+        app.port_var.set(sys.argv[sys.argv.index("--port") + 1])
+        root.after(0, app.connect)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,441 @@
+# qcx_ws_server.py
+# Local network API: radio state, decoded text, waterfall rows and spectrum frames
+# over WebSocket (plain asyncio, no extra packages)
+# One server per station shares the app's CAT connection and DSP: every update is
+# encoded and framed once and fanned out to all subscribers, each through its own
+# bounded queue so a slow client only drops its own frames. Text frames carry JSON;
+# array data (waterfall rows, spectra) goes in binary frames:
+#
+#   header  <BBHdddI  kind (1 = waterfall row, 2 = spectrum), encoding (0 = float32,
+#                     1 = qcx_frame_codec), sequence, time, first column Hz, column
+#                     spacing Hz (0 = irregular), column count
+#   payload count float32 values (S units for waterfall rows, dB for spectra), or
+#           one qcx_frame_codec frame (uint8 deltas + zlib, ~5x smaller) for clients
+#           that subscribed with "encoding": "codec"
+#
+# Client -> server (JSON text frames, optional "id" is echoed in the reply):
+#   {"cmd": "subscribe", "topics": ["state", "decode", "waterfall", "spectrum"],
+#    "encoding": "float32" | "codec"}
+#   {"cmd": "snapshot"}
+#   {"cmd": "set_freq", "freq_hz": 7030000, "vfo": "A"}
+#   {"cmd": "KY", "text": "CQ CQ DE AJ6BC K"}
+#   {"cmd": "TQ", "on": true}      TX is dropped after tx_timeout (60 s) like tx_on,
+#                                  or when the client that keyed it disconnects
+#
+#   python qcx_ws_server.py watch [host] [port]    print what a server sends
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE = 1 << 20
+CLIENT_QUEUE = 256
+
+TOPICS = ("state", "decode", "waterfall", "spectrum")
+ARRAY_HEADER = struct.Struct("<BBHdddI")
+KIND_WATERFALL = 1
+KIND_SPECTRUM = 2
+ENC_FLOAT32 = 0
+ENC_CODEC = 1
+ENCODINGS = {"float32": ENC_FLOAT32, "codec": ENC_CODEC}
+
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+# ---- WebSocket framing (RFC 6455) ----
+
+def frame(opcode, payload, mask=False):
+    n = len(payload)
+    head = bytearray([0x80 | opcode])
+    bit = 0x80 if mask else 0
+    if n < 126:
+        head.append(bit | n)
+    elif n < 65536:
+        head.append(bit | 126)
+        head += struct.pack(">H", n)
+    else:
+        head.append(bit | 127)
+        head += struct.pack(">Q", n)
+    if mask:
+        key = os.urandom(4)
+        return bytes(head) + key + _unmask(payload, key)
+    return bytes(head) + payload
+
+
+def _unmask(data, key):
+    n = len(data)
+    if not n:
+        return b""
+    stream = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")).to_bytes(n, "little")
+
+
+async def read_message(reader, writer=None):
+    # Returns (opcode, payload) for the next text/binary message, None on close.
+    # Pings are answered here when a writer is given.
+    parts = []
+    first_op = None
+    while True:
+        b1, b2 = await reader.readexactly(2)
+        opcode = b1 & 0x0F
+        n = b2 & 0x7F
+        if n == 126:
+            n = struct.unpack(">H", await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack(">Q", await reader.readexactly(8))[0]
+        if n > MAX_MESSAGE:
+            raise ValueError("message too large")
+        key = await reader.readexactly(4) if b2 & 0x80 else None
+        payload = await reader.readexactly(n)
+        if key:
+            payload = _unmask(payload, key)
+        if opcode == OP_CLOSE:
+            return None
+        if opcode == OP_PING:
+            if writer:
+                writer.write(frame(OP_PONG, payload))
+            continue
+        if opcode == OP_PONG:
+            continue
+        if opcode != OP_CONT:
+            first_op = opcode
+        parts.append(payload)
+        if b1 & 0x80:
+            return first_op, b"".join(parts)
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+async def _read_headers(reader):
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def pack_array(kind, seq, start_hz, step_hz, values, encoding=ENC_FLOAT32, payload=None):
+    if payload is None:
+        if hasattr(values, "astype"):
+            payload = values.astype("<f4").tobytes()     # numpy arrays from the DSP side
+        else:
+            payload = struct.pack(f"<{len(values)}f", *values)
+    return ARRAY_HEADER.pack(kind, encoding, seq & 0xFFFF, time.time(), start_hz, step_hz, len(values)) + payload
+
+
+def unpack_array(data):
+    kind, encoding, seq, ts, start_hz, step_hz, count = ARRAY_HEADER.unpack_from(data)
+    payload = data[ARRAY_HEADER.size:]
+    values = list(struct.unpack(f"<{count}f", payload)) if encoding == ENC_FLOAT32 else payload
+    return {"kind": kind, "encoding": encoding, "seq": seq, "ts": ts, "start_hz": start_hz,
+            "step_hz": step_hz, "count": count, "values": values}
+
+
+# ---- server ----
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.topics = set(TOPICS)
+        self.encoding = ENC_FLOAT32
+        self.queue = asyncio.Queue(CLIENT_QUEUE)
+        self.dropped = 0
+
+    def offer(self, data):
+        # Never blocks the fan-out: a full queue loses its oldest frame
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+
+class APIServer:
+    def __init__(self, state, host="127.0.0.1", port=8765, tx_timeout=60.0):
+        # state: qcx_radio_state.RadioState; CAT is attached (and re-attached on
+        # reconnect) with attach()
+        self.state = state
+        self.host = host
+        self.port = port
+        self.tx_timeout = tx_timeout
+        self.cat = None
+        self.scheduler = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.clients = set()
+        self.seq = 0
+        self.encoders = {}          # kind -> qcx_frame_codec.FrameEncoder, made on first use
+        self.tx_handle = None
+        self.tx_owner = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="api-server", daemon=True)
+        self.thread.start()
+        try:
+            self.server = asyncio.run_coroutine_threadsafe(
+                asyncio.start_server(self._handle, self.host, self.port), self.loop).result(5)
+        except Exception:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            raise
+        if self.port == 0:
+            self.port = self.server.sockets[0].getsockname()[1]
+        self.state.subscribe(self.publish_state)
+
+    def stop(self):
+        self.state.unsubscribe(self.publish_state)
+        if not self.loop:
+            return
+
+        async def shutdown():
+            if self.tx_owner:
+                await self._tx_off("server stopped")
+            self.server.close()
+            for client in list(self.clients):
+                client.writer.close()
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+
+    def attach(self, cat, scheduler=None):
+        self.cat = cat
+        self.scheduler = scheduler
+
+    # ---- publishing (any thread) ----
+
+    def publish_state(self, field, value):
+        if not self.clients:
+            return
+        self._publish("state", frame(OP_TEXT, json.dumps({"type": "state", "field": field, "value": value}).encode()))
+
+    def publish_decode(self, text, source="TB"):
+        if not self.clients:
+            return
+        self._publish("decode", frame(OP_TEXT, json.dumps({"type": "decode", "source": source, "text": text}).encode()))
+
+    def publish_waterfall(self, row, start_hz=0.0, step_hz=0.0):
+        self._publish_array("waterfall", KIND_WATERFALL, row, start_hz, step_hz)
+
+    def publish_spectrum(self, db_values, start_hz=0.0, step_hz=0.0):
+        self._publish_array("spectrum", KIND_SPECTRUM, db_values, start_hz, step_hz)
+
+    def _publish_array(self, topic, kind, values, start_hz, step_hz):
+        if not self.clients:
+            return
+        self.seq += 1
+        # Each encoding is built once, and only if some subscriber wants it
+        encodings = {client.encoding for client in tuple(self.clients) if topic in client.topics}
+        if ENC_FLOAT32 in encodings:
+            self._publish(topic, frame(OP_BINARY, pack_array(kind, self.seq, start_hz, step_hz, values)), ENC_FLOAT32)
+        if ENC_CODEC in encodings:
+            payload = self._encoder(kind).encode(values)
+            self._publish(topic, frame(OP_BINARY, pack_array(kind, self.seq, start_hz, step_hz, values,
+                                                             ENC_CODEC, payload)), ENC_CODEC)
+
+    def _encoder(self, kind):
+        if kind not in self.encoders:
+            import qcx_frame_codec
+            if kind == KIND_WATERFALL:
+                # Rows come seconds apart, so resynchronise after fewer of them
+                self.encoders[kind] = qcx_frame_codec.FrameEncoder(*qcx_frame_codec.WATERFALL_SCALE, keyframe_interval=5)
+            else:
+                self.encoders[kind] = qcx_frame_codec.FrameEncoder(*qcx_frame_codec.SPECTRUM_SCALE)
+        return self.encoders[kind]
+
+    def _publish(self, topic, data, encoding=None):
+        if self.clients and self.loop:
+            self.loop.call_soon_threadsafe(self._fan_out, topic, data, encoding)
+
+    def _fan_out(self, topic, data, encoding=None):
+        for client in self.clients:
+            if topic in client.topics and (encoding is None or client.encoding == encoding):
+                client.offer(data)
+
+    # ---- connections ----
+
+    async def _handle(self, reader, writer):
+        try:
+            request, headers = await _read_headers(reader)
+            if headers.get("upgrade", "").lower() != "websocket" or "sec-websocket-key" not in headers:
+                writer.write(b"HTTP/1.1 426 Upgrade Required\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+                writer.close()
+                return
+            writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n").encode())
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        client = _Client(writer)
+        self.clients.add(client)
+        client.offer(frame(OP_TEXT, json.dumps({"type": "snapshot", "state": self.state.snapshot()}).encode()))
+        sender = asyncio.ensure_future(self._sender(client))
+        try:
+            while True:
+                message = await read_message(reader, writer)
+                if message is None:
+                    break
+                opcode, payload = message
+                if opcode == OP_TEXT:
+                    reply = await self._command(client, payload)
+                    client.offer(frame(OP_TEXT, json.dumps(reply).encode()))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            if self.tx_owner is client:
+                await self._tx_off("client disconnected")
+            try:
+                writer.write(frame(OP_CLOSE, b""))
+                writer.close()
+            except (ConnectionError, RuntimeError):
+                pass
+
+    async def _sender(self, client):
+        try:
+            while True:
+                client.writer.write(await client.queue.get())
+                await client.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    # ---- commands ----
+
+    async def _cat(self, coro):
+        # Runs a CATClient coroutine on the CAT worker's own loop
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.cat.loop))
+
+    async def _command(self, client, payload):
+        try:
+            msg = json.loads(payload)
+            cmd = msg.get("cmd")
+        except (ValueError, AttributeError):
+            return {"type": "reply", "ok": False, "error": "bad JSON"}
+        reply = {"type": "reply", "id": msg.get("id"), "cmd": cmd, "ok": True}
+        try:
+            if cmd == "subscribe":
+                encoding = msg.get("encoding", "float32")
+                if encoding not in ENCODINGS:
+                    raise ValueError(f"unknown encoding {encoding!r}")
+                client.topics = set(msg.get("topics", TOPICS)) & set(TOPICS)
+                client.encoding = ENCODINGS[encoding]
+            elif cmd == "snapshot":
+                reply["state"] = self.state.snapshot()
+            elif self.cat is None:
+                raise RuntimeError("not connected")
+            elif cmd == "set_freq":
+                await self._cat(self.cat.client.set_freq(int(msg["freq_hz"]), msg.get("vfo", "A")))
+                if self.scheduler:
+                    self.scheduler.boost()
+            elif cmd == "KY":
+                await self._cat(self.cat.client.send_text(str(msg["text"])))
+            elif cmd == "TQ":
+                if msg.get("on"):
+                    await self._tx_on(client)
+                else:
+                    await self._tx_off("client")
+            else:
+                raise ValueError(f"unknown command {cmd!r}")
+        except Exception as e:
+            reply.update(ok=False, error=str(e))
+        return reply
+
+    async def _tx_on(self, client):
+        await self._cat(self.cat.client.set_tx(True))
+        if self.tx_handle:
+            self.tx_handle.cancel()
+        self.tx_owner = client
+        self.tx_handle = self.loop.call_later(self.tx_timeout,
+                                              lambda: asyncio.ensure_future(self._tx_off("safety timeout")))
+        self._fan_out("state", frame(OP_TEXT, json.dumps({"type": "tx", "on": True, "timeout": self.tx_timeout}).encode()))
+
+    async def _tx_off(self, reason):
+        if self.tx_handle:
+            self.tx_handle.cancel()
+            self.tx_handle = None
+        self.tx_owner = None
+        if self.cat:
+            await self._cat(self.cat.client.set_tx(False))
+        self._fan_out("state", frame(OP_TEXT, json.dumps({"type": "tx", "on": False, "reason": reason}).encode()))
+
+
+# ---- minimal client (tests, command line) ----
+
+class APIClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.decoders = {}          # kind -> qcx_frame_codec.FrameDecoder
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET / HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        status, headers = await _read_headers(reader)
+        if " 101 " not in status or headers.get("sec-websocket-accept") != accept_key(key):
+            writer.close()
+            raise ConnectionError(f"handshake failed: {status}")
+        return cls(reader, writer)
+
+    async def send(self, msg):
+        self.writer.write(frame(OP_TEXT, json.dumps(msg).encode(), mask=True))
+        await self.writer.drain()
+
+    async def receive(self):
+        # JSON dict for text frames, unpack_array() dict for binary frames, None when closed
+        message = await read_message(self.reader)
+        if message is None:
+            return None
+        opcode, payload = message
+        if opcode == OP_TEXT:
+            return json.loads(payload)
+        msg = unpack_array(payload)
+        if msg["encoding"] == ENC_CODEC:
+            # values is None until the first keyframe (or the next one after a lost frame)
+            if msg["kind"] not in self.decoders:
+                import qcx_frame_codec
+                self.decoders[msg["kind"]] = qcx_frame_codec.FrameDecoder()
+            msg["values"] = self.decoders[msg["kind"]].decode(msg["values"])
+        return msg
+
+    async def close(self):
+        self.writer.write(frame(OP_CLOSE, b"", mask=True))
+        self.writer.close()
+
+
+async def _watch(host, port):
+    client = await APIClient.connect(host, port)
+    while True:
+        msg = await client.receive()
+        if msg is None:
+            break
+        if "values" in msg:
+            msg = dict(msg, values=f"[{msg['count']} values]")
+        print(msg)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "watch":
+        print("usage: python qcx_ws_server.py watch [host] [port]")
+        sys.exit(1)
+    asyncio.run(_watch(sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1",
+                       int(sys.argv[3]) if len(sys.argv) > 3 else 8765))